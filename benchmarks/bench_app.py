@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""End-to-end benchmark of the portal that needs no network: boots the real app (app.main) in-process, with
+a throwaway configuration pointing at local stand-ins for everything external (benchmarks/fakes.py and
+benchmarks/fake_acli.sh), and drives realistic workloads through it: Jira account signups, email
+verifications and reviews, mailing list creations, queue polling and the public data feed.
+Reports throughput and p50/p95/p99 latency per workload, and can store them as JSON and compare them
+with an earlier run. Requests go through Quart's test client, so that sessions (committer, PMC member,
+root, role account) can be set up without OAuth.
+LDAP is pointed at a closed port (the project list is seeded instead), and Postgres and MySQL are left
+unconfigured, so Jira and Confluence user lookups fall back to (fake) ACLI.
+Run from the top of the source tree:
+    python3 benchmarks/bench_app.py [--requests 200] [--concurrency 16] [--acli-delay 1.0]
+        [--service-delay 0.05] [--output results.json] [--baseline previous.json] [--tolerance 0.2]"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.extend(("benchmarks",))
+
+import fakes
+import loadgen
+
+SOURCE_DIR = os.path.realpath(".")
+ROLE_ACCOUNT = {"uid": "mailreq", "roleaccount": True}
+ROOT = {"uid": "benchroot", "fullname": "Bench Root", "isRoot": True, "pmcs": ["infra"], "projects": ["infra"]}
+PMC_MEMBER = {"uid": "benchpmc", "fullname": "Bench PMC", "pmcs": fakes.PROJECTS[:5], "projects": fakes.PROJECTS[:5]}
+
+
+def unused_port() -> int:
+    """A local port that nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_config(workdir: str, services: fakes.FakeServices):
+    """Lays out a portal instance in `workdir`: the static files, a config.yaml for the fakes, and storage"""
+    shutil.copytree(os.path.join(SOURCE_DIR, "htdocs"), os.path.join(workdir, "htdocs"))
+    os.makedirs(os.path.join(workdir, "server"))
+    roleaccounts = os.path.join(workdir, "roleaccounts.txt")
+    with open(roleaccounts, "w") as f:
+        f.write("mailreq:benchmark\n")
+    urls = services.urls
+    config = {
+        "server": {
+            "bind": "127.0.0.1",
+            "port": 8000,
+            "error_reporting": "show",
+            "max_form_size": "5mb",
+            "rate_limit_per_ip": 0,
+            "trace_log": "off",
+        },
+        "ldap": {
+            "uri": f"ldap://127.0.0.1:{unused_port()}",
+            "userbase": "uid=%s,ou=people,dc=apache,dc=org",
+            "groupbase": "cn=%s,ou=project,ou=groups,dc=apache,dc=org",
+            "servicebase": "cn=%s,ou=groups,ou=services,dc=apache,dc=org",
+            "ldapbase": "dc=apache,dc=org",
+            "roleaccounts": roleaccounts,
+        },
+        "storage": {
+            "queue_dir": os.path.join(workdir, "queue"),
+            "db_dir": os.path.join(workdir, "database"),
+        },
+        "messaging": {
+            "sender": "ASF Self-serve Portal <no-reply@apache.org>",
+            "template_dir": os.path.join(SOURCE_DIR, "server", "email_templates"),
+            "mail_relay": urls["mail_relay"],
+            "slack_url": urls["slack_url"],
+        },
+        "acli_cmd": os.path.join(SOURCE_DIR, "benchmarks", "fake_acli.sh"),
+        "infrareports_userid_url": urls["infrareports_userid_url"],
+        "whimsy_committee_url": urls["whimsy_committee_url"],
+        "webmod_list_url": urls["webmod_list_url"],
+    }
+    with open(os.path.join(workdir, "server", "config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+
+
+async def drive(name: str, clients: list, requests: list, concurrency: int) -> dict:
+    """Runs a list of requests (coroutine functions taking a test client and returning a response)
+    from `concurrency` workers, spread over the given clients"""
+    pending = list(reversed(requests))
+    latencies: list = []
+    errors = 0
+
+    async def worker(n: int):
+        nonlocal errors
+        client = clients[n % len(clients)]
+        while pending:
+            request = pending.pop()
+            start = time.perf_counter()
+            response = await request(client)
+            body = await response.get_data()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400 or b'"success":false' in body.replace(b" ", b""):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    result = loadgen.summarize(latencies, time.perf_counter() - start, errors)
+    print(f"{name:12} {result}")
+    return result
+
+
+async def run_workloads(args, application, services: fakes.FakeServices) -> dict:
+    import asfquart
+    from app.lib import config
+    from app.endpoints import jiraaccount
+
+    # What the LDAP and Whimsy refreshes would have found
+    config.projects[:] = sorted(fakes.PROJECTS + ["infra"])
+    config.messaging.mail_mappings = {project: f"{project}.apache.org" for project in config.projects}
+    config.update_public_data()
+
+    async def clients(session, count: int = 4) -> list:
+        """Test clients with the given (or no) login session"""
+        made = []
+        for _ in range(count):
+            client = application.test_client()
+            if session:
+                async with client.session_transaction() as cookie:
+                    cookie[asfquart.APP.app_id] = {**session, "uts": time.time()}
+            made.append(client)
+        return made
+
+    n = args.requests
+    usernames = [f"bench{i:05}" for i in range(n)]
+    results = {}
+
+    results["public"] = await drive(
+        "public", await clients(None), [lambda client: client.get("/api/public")] * (n * 5), args.concurrency
+    )
+
+    def signup(i: int, username: str):
+        return lambda client: client.post(
+            "/api/jira-account",
+            json={
+                "username": username,
+                "realname": f"Bench User {username}",
+                "email": f"{username}@example.org",
+                "project": fakes.PROJECTS[i % len(fakes.PROJECTS)],
+                "why": "I would like to report a bug I found while benchmarking.",
+            },
+        )
+
+    results["signup"] = await drive("signup", await clients(None), [signup(i, username) for i, username in enumerate(usernames)], args.concurrency)
+
+    tokens = [(jiraaccount.JIRA_DB.fetchone("pending", userid=username) or {}).get("token") for username in usernames]
+    results["verify"] = await drive(
+        "verify",
+        await clients(None),
+        [lambda client, token=token: client.get("/api/jira-account", query_string={"token": token}) for token in tokens],
+        args.concurrency,
+    )
+    results["review"] = await drive(
+        "review",
+        await clients(ROOT),
+        [
+            lambda client, token=token: client.post("/api/jira-account-review", json={"token": token, "action": "approve"})
+            for token in tokens
+        ],
+        args.concurrency,
+    )
+
+    def create_list(i: int):
+        return lambda client: client.post(
+            "/api/mailinglist",
+            json={
+                "listpart": f"bench{i:05}",
+                "domainpart": f"{PMC_MEMBER['pmcs'][i % len(PMC_MEMBER['pmcs'])]}.apache.org",
+                "moderators": ["moderator@example.org"],
+                "muopts": "mu",
+                "private": False,
+                "trailer": False,
+            },
+        )
+
+    results["mailinglist"] = await drive("mailinglist", await clients(PMC_MEMBER), [create_list(i) for i in range(n)], args.concurrency)
+    results["queue"] = await drive(
+        "queue", await clients(ROLE_ACCOUNT), [lambda client: client.get("/api/queue")] * (n * 2), args.concurrency
+    )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lists the workloads that got slower (p95) or lost throughput by more than `tolerance` (a fraction)"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if before["p95"] and result["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 went from {before['p95']} ms to {result['p95']} ms")
+        if before["throughput"] and result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput went from {before['throughput']}/s to {result['throughput']}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per write workload (read workloads do more)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--acli-delay", type=float, default=1.0, help="Seconds each (fake) ACLI call takes")
+    parser.add_argument("--service-delay", type=float, default=0.05, help="Seconds each fake HTTP service takes to respond")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results with those of an earlier run (JSON file)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    services = fakes.FakeServices(delay=args.service_delay).start()
+    os.environ["FAKE_ACLI_DELAY"] = str(args.acli_delay)
+    with tempfile.TemporaryDirectory(prefix="selfserve-bench-") as workdir:
+        write_config(workdir, services)
+        # The portal finds its configuration and static files relative to the working directory
+        os.chdir(os.path.join(workdir, "server"))
+        sys.path.insert(0, os.path.join(SOURCE_DIR, "server"))
+        import app
+
+        application = app.main()
+
+        async def run():
+            async with application.test_app():
+                return await run_workloads(args, application, services)
+
+        results = asyncio.run(run())
+        os.chdir(SOURCE_DIR)
+
+    report = {
+        "timestamp": int(time.time()),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+        "calls_to_fakes": dict(services.counts),
+    }
+    print(f"Calls to the fake services: {services.counts}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
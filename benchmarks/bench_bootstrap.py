@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Page-ready time of the Jira project creation page, which needs the session, the projects and the Jira
+schemes, before and after /api/bootstrap:
+    before:        /api/auth, then /api/public, then /api/jira-project-schemes, one after the other
+    first load:    /api/bootstrap, then the versioned datasets together
+    repeat load:   /api/bootstrap only, the browser still has the versioned datasets
+The requests are served by the real app (see bench_app.py), and each round trip adds --rtt seconds
+of network latency, so a page is ready after the sum, over its rounds of requests, of the latency
+plus the slowest response in the round.
+Run from the top of the source tree: python3 benchmarks/bench_bootstrap.py [--rtt 0.05]"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.extend(("benchmarks",))
+
+import bench_app
+import fakes
+
+ITERATIONS = 200
+
+
+async def timed(client, url: str) -> float:
+    start = time.perf_counter()
+    response = await client.get(url)
+    await response.get_data()
+    assert response.status_code == 200, f"{url} returned {response.status_code}"
+    return time.perf_counter() - start
+
+
+async def page_ready(client, rounds: list, rtt: float) -> float:
+    """Seconds until a page making the given rounds of requests has all of its data"""
+    elapsed = 0.0
+    for urls in rounds:
+        elapsed += rtt + max([await timed(client, url) for url in urls])
+    return elapsed
+
+
+async def run(application, rtt: float):
+    import asfquart
+    from app.lib import config
+
+    config.projects[:] = sorted(fakes.PROJECTS + ["infra"])
+    config.messaging.mail_mappings = {project: f"{project}.apache.org" for project in config.projects}
+    config.update_public_data()
+    client = application.test_client()
+    async with client.session_transaction() as cookie:
+        cookie[asfquart.APP.app_id] = {**bench_app.PMC_MEMBER, "uts": time.time()}
+
+    versions = (await (await client.get("/api/bootstrap")).get_json())["versions"]
+    flows = {
+        "before": [["/api/auth"], ["/api/public"], ["/api/jira-project-schemes"]],
+        "first load": [
+            ["/api/bootstrap"],
+            [
+                f"/api/public?v={versions['public']}",
+                f"/api/blocked-projects?v={versions['blocked']}",
+                f"/api/jira-project-schemes?v={versions['schemes']}",
+            ],
+        ],
+        "repeat load": [["/api/bootstrap"]],
+    }
+    for name, rounds in flows.items():
+        times = [await page_ready(client, rounds, rtt) for _ in range(ITERATIONS)]
+        print(f"{name:12} {len(rounds)} round trip(s), page ready after {statistics.median(times) * 1000:7.1f} ms (median)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt", type=float, default=0.05, help="Network round trip time, in seconds")
+    args = parser.parse_args()
+
+    services = fakes.FakeServices().start()
+    with tempfile.TemporaryDirectory(prefix="selfserve-bench-") as workdir:
+        bench_app.write_config(workdir, services)
+        os.chdir(os.path.join(workdir, "server"))
+        sys.path.insert(0, os.path.join(bench_app.SOURCE_DIR, "server"))
+        import app
+
+        application = app.main()
+
+        async def serve():
+            async with application.test_app():
+                await run(application, args.rtt)
+
+        asyncio.run(serve())
+        os.chdir(bench_app.SOURCE_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Microbenchmark of request input handling: asfquart.utils.formdata() plus hand-written checks versus a
+declared form (lib/forms.py), for a query string request and a mailing list creation (JSON body), and
+what an oversized body costs either way.
+Run from the top of the source tree: python3 benchmarks/bench_forms.py"""
+
+import asyncio
+import re
+import sys
+import time
+
+sys.path.extend(("server/app/lib",))
+
+import quart
+import asfquart.utils
+import forms
+
+REQUESTS = 2000
+VALID_LISTPART_RE = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
+LIST = {
+    "listpart": "dev",
+    "domainpart": "example.apache.org",
+    "moderators": ["moderator@example.org", "other@example.org"],
+    "muopts": "mu",
+    "private": False,
+    "trailer": True,
+    "expedited": False,
+}
+
+LIST_FORM = forms.Form(
+    sources=("form", "json"),
+    listpart=forms.Field(required=True, pattern=VALID_LISTPART_RE, message="Invalid list name"),
+    domainpart=forms.Field(required=True),
+    moderators=forms.Field(list, required=True, min_length=1),
+    muopts=forms.Field(required=True, choices=("mu", "Mu", "mU")),
+    private=forms.Field(bool, default=False),
+    trailer=forms.Field(bool, default=False),
+    expedited=forms.Field(bool, default=False),
+)
+TOKEN_FORM = forms.Form(token=forms.Field(required=True, pattern=r"[a-f0-9]{32}"))
+
+app = quart.Quart(__name__)
+app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024  # The max_form_size of the portal
+
+
+@app.route("/old/list", methods=["POST"])
+async def list_old():
+    form_data = await asfquart.utils.formdata()
+    listpart = form_data.get("listpart")
+    assert listpart and VALID_LISTPART_RE.match(listpart), "Invalid list name"
+    assert form_data.get("domainpart"), "Missing domain"
+    assert isinstance(form_data.get("moderators"), list) and form_data["moderators"], "Missing moderators"
+    assert form_data.get("muopts") in ("mu", "Mu", "mU"), "Invalid muopts"
+    return {"success": True, "private": bool(form_data.get("private")), "trailer": bool(form_data.get("trailer"))}
+
+
+@app.route("/new/list", methods=["POST"])
+@forms.accepts(LIST_FORM)
+async def list_new(form_data: dict):
+    return {"success": True, "private": form_data["private"], "trailer": form_data["trailer"]}
+
+
+@app.route("/old/token")
+async def token_old():
+    form_data = await asfquart.utils.formdata()
+    assert re.fullmatch(r"[a-f0-9]{32}", form_data.get("token", "")), "Invalid token"
+    return {"success": True}
+
+
+@app.route("/new/token")
+@forms.accepts(TOKEN_FORM)
+async def token_new(form_data: dict):
+    return {"success": True}
+
+
+async def run(label: str, method: str, path: str, requests: int = REQUESTS, **kwargs):
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(requests):
+        resp = await client.open(path, method=method, **kwargs)
+        await resp.get_data()
+    elapsed = time.perf_counter() - start
+    print(f"{label:28} {path:11} {elapsed / requests * 1e6:9.1f} µs/request, {resp.status_code}")
+
+
+async def main():
+    token = {"token": "0123456789abcdef0123456789abcdef"}
+    oversized = {**LIST, "moderators": ["moderator@example.org"] * 100_000}  # ~2.5MB
+    for version in ("old", "new"):
+        await run("query string", "GET", f"/{version}/token", query_string=token)
+        await run("JSON body", "POST", f"/{version}/list", json=LIST)
+        await run("oversized JSON body", "POST", f"/{version}/list", requests=20, json=oversized)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Microbenchmark of the cost of recording metrics, per event.
+Run from the top of the source tree: python3 benchmarks/bench_metrics.py"""
+
+import sys
+import time
+
+sys.path.extend(("server/app/lib",))
+
+import metrics
+
+EVENTS = 1_000_000
+
+
+def run(name: str, record):
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        record()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {elapsed / EVENTS * 1e9:8.0f} ns/event")
+
+
+def main():
+    registry = metrics.Registry()
+    counter = registry.counter("requests_total", "Requests", ("endpoint", "method", "status"))
+    histogram = registry.histogram("request_duration_seconds", "Request duration", ("endpoint", "method"))
+    run("baseline (empty call)", lambda: None)
+    run("counter.inc, 3 labels", lambda: counter.inc("/api/jira-account", "POST", "200"))
+    run("histogram.observe, 2 labels", lambda: histogram.observe(0.0123, "/api/jira-account", "POST"))
+
+    def timed():
+        with histogram.time("/api/jira-account", "POST"):
+            pass
+
+    run("with histogram.time(), 2 labels", timed)
+    for _ in range(100):
+        counter.inc(f"/api/endpoint{_}", "GET", "200")
+        histogram.observe(0.1, f"/api/endpoint{_}", "GET")
+    start = time.perf_counter()
+    text = metrics.render(metrics.merge([registry.dump()] * 4))
+    print(f"render of 4 merged workers ({len(text)} bytes): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
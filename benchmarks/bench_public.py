@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Microbenchmark of /api/public: per-request JSON encoding versus the pre-serialized snapshot.
+Run from the top of the source tree: python3 benchmarks/bench_public.py"""
+
+import asyncio
+import sys
+import time
+
+sys.path.extend(("server/app/lib",))
+
+import quart
+import asfquart.utils
+import snapshot
+
+REQUESTS = 2000
+
+# Roughly the size of the real feed: ~350 projects, each with a mail domain
+PROJECTS = sorted(f"project{i:03}" for i in range(350))
+MAIL_MAPPINGS = {project: f"{project}.apache.org" for project in PROJECTS}
+PUBLIC_DATA = snapshot.JSONSnapshot({"projects": PROJECTS, "mail_domains": MAIL_MAPPINGS})
+
+app = quart.Quart(__name__)
+
+
+@app.route("/old")
+async def public_old():
+    """The previous implementation: parse form data, re-encode everything per request"""
+    _form_data = await asfquart.utils.formdata()
+    return {"projects": PROJECTS, "mail_domains": MAIL_MAPPINGS}
+
+
+@app.route("/new")
+async def public_new():
+    status, headers, body = PUBLIC_DATA.response(
+        if_none_match=quart.request.headers.get("If-None-Match", ""),
+        accept_encoding=quart.request.headers.get("Accept-Encoding", ""),
+    )
+    return quart.Response(status=status, response=body, headers=headers)
+
+
+async def run(path: str, headers: dict):
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        resp = await client.get(path, headers=headers)
+        await resp.get_data()
+    elapsed = time.perf_counter() - start
+    print(f"{path:5} {str(headers):60} {elapsed / REQUESTS * 1e6:8.1f} µs/request, {resp.status_code}, {len(await resp.get_data())} bytes")
+
+
+async def main():
+    await run("/old", {})
+    await run("/new", {})
+    await run("/new", {"Accept-Encoding": "gzip"})
+    await run("/new", {"If-None-Match": f'"{PUBLIC_DATA.etag}"'})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Microbenchmark of the rate limiter's per-request cost, in memory and with the shared sqlite store.
+Run from the top of the source tree: python3 benchmarks/bench_ratelimit.py"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.extend(("server/app/lib",))
+
+import ratelimit
+
+REQUESTS = 200_000
+
+
+def run(name: str, limiter: ratelimit.RateLimiter, clients: int, requests: int = REQUESTS):
+    keys = [f"check_user_exists:10.0.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    start = time.perf_counter()
+    now = time.time()
+    for i in range(requests):
+        limiter.hit(keys[i % clients], now=now)
+    elapsed = time.perf_counter() - start
+    print(f"{name:40} {clients:>7} clients: {elapsed / requests * 1e6:6.2f} µs/request")
+
+
+def main():
+    policy = ratelimit.Policy(limit=100, window=86400)
+    for clients in (1, 1000, 100_000):
+        run("memory", ratelimit.RateLimiter(policy, ratelimit.MemoryStore()), clients)
+    # Memory is bounded: with more clients than max_keys, the least recently seen are evicted
+    run("memory (max_keys=10000, evicting)", ratelimit.RateLimiter(policy, ratelimit.MemoryStore(10_000)), 100_000)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ratelimit.SQLiteStore(os.path.join(tmpdir, "ratelimits.db"))
+        for clients in (1, 1000):
+            run("sqlite (shared between workers)", ratelimit.RateLimiter(policy, store), clients, REQUESTS // 10)
+
+
+if __name__ == "__main__":
+    main()
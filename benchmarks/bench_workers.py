@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Measures throughput scaling across hypercorn worker counts.
+Starts the portal (from server/, using its config.yaml) with 1, 2, 4... workers up to the number of cores,
+and drives the read-only endpoints with the load generator. Run from the top of the source tree:
+    python3 benchmarks/bench_workers.py [--port 8123] [--duration 10] [--concurrency 128]"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.extend(("benchmarks",))
+
+import loadgen
+
+ENDPOINTS = ("/api/public", "/api/bootstrap")
+
+
+def wait_for(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Portal did not come up at {url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=128)
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    worker_counts = [n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+    for workers in worker_counts:
+        server = subprocess.Popen(
+            (sys.executable, "-m", "hypercorn", "--workers", str(workers), "--bind", f"127.0.0.1:{args.port}", "server:application"),
+            cwd="server",
+        )
+        try:
+            wait_for(base + "/api/public")
+            result = asyncio.run(loadgen.hammer([base + path for path in ENDPOINTS], args.concurrency, args.duration))
+            print(f"{workers:>2} workers: {result}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
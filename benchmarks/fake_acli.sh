@@ -0,0 +1,46 @@
+#!/usr/bin/env bash
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Stand-in for /opt/latest-cli/acli.sh, for benchmarks and local testing.
+# Takes FAKE_ACLI_DELAY seconds (default 1, about what the real one spends starting its JVM),
+# then succeeds at whatever it was asked to do. Users never exist, so account requests go through.
+
+sleep "${FAKE_ACLI_DELAY:-1}"
+
+action=""
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--action" ]; then
+        action="$2"
+    fi
+    shift
+done
+
+case "$action" in
+    getUser)
+        echo "Remote error: User not found." >&2
+        exit 1
+        ;;
+    getWorkflowSchemeList|getPermissionSchemeList|getNotificationSchemeList)
+        echo "[]"
+        ;;
+    getSpacePermissionList)
+        echo '[{"idType": "user", "id": "humbedooh"}, {"idType": "group", "id": "confluence-users"}]'
+        ;;
+    *)
+        echo "Action $action completed successfully."
+        ;;
+esac
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Local stand-ins for the external services of the portal: infra-reports, Whimsy, webmod (like
+docker-config/webmod/webmod_server.py) and Slack over HTTP, plus an SMTP sink that speaks just enough
+SMTP (with STARTTLS, as asfpy.messaging insists on it) to swallow emails.
+They run on their own event loop in a background thread, because the portal sends emails with blocking
+smtplib calls, which would otherwise wait forever for a sink on the same event loop.
+Run from the top of the source tree to use them by hand: python3 benchmarks/fakes.py"""
+
+import asyncio
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+import aiohttp.web
+
+PROJECTS = [f"project{i:03}" for i in range(350)]
+
+
+class FakeServices:
+    def __init__(self, delay: float = 0.05, host: str = "127.0.0.1"):
+        self.delay = delay  # Seconds each HTTP response takes, roughly what the real services take
+        self.host = host
+        self.http_port = 0
+        self.smtp_port = 0
+        self.counts = {"infra-reports": 0, "whimsy": 0, "webmod": 0, "slack": 0, "smtp": 0}
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="selfserve-fakes-")
+
+    @property
+    def urls(self) -> dict:
+        base = f"http://{self.host}:{self.http_port}"
+        return {
+            "infrareports_userid_url": f"{base}/api/userid",
+            "whimsy_committee_url": f"{base}/public/committee-info.json",
+            "webmod_list_url": f"{base}/lists",
+            "slack_url": f"{base}/slack",
+            "mail_relay": f"{self.host}:{self.smtp_port}",
+        }
+
+    async def respond(self, service: str, payload):
+        self.counts[service] += 1
+        await asyncio.sleep(self.delay)
+        return aiohttp.web.json_response(payload)
+
+    async def userid(self, _request):
+        return await self.respond("infra-reports", {"exists": False})
+
+    async def committees(self, _request):
+        return await self.respond("whimsy", {"committees": {project: {"mail_list": project} for project in PROJECTS}})
+
+    async def lists(self, _request):
+        return await self.respond("webmod", [f"{name}@{project}.apache.org" for project in PROJECTS for name in ("dev", "users", "private")])
+
+    async def slack(self, _request):
+        return await self.respond("slack", {"ok": True})
+
+    def tls_context(self) -> ssl.SSLContext:
+        """A throwaway self-signed certificate, the same way docker-config/start.sh makes one"""
+        cert = os.path.join(self.tmpdir.name, "cert.pem")
+        key = os.path.join(self.tmpdir.name, "key.pem")
+        subprocess.run(
+            ("openssl", "req", "-x509", "-newkey", "rsa:2048", "-keyout", key, "-out", cert, "-days", "1", "-nodes", "-subj", "/CN=localhost"),
+            check=True,
+            capture_output=True,
+        )
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+        return context
+
+    async def smtp_session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 localhost fake SMTP sink")
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith("EHLO"):
+                    await reply("250-localhost\r\n250-STARTTLS\r\n250 8BITMIME")
+                elif command.startswith("HELO"):
+                    await reply("250 localhost")
+                elif command == "STARTTLS":
+                    await reply("220 Ready to start TLS")
+                    await writer.start_tls(self.tls)
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.counts["smtp"] += 1
+                    await reply("250 OK: queued")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:  # MAIL FROM, RCPT TO, RSET, NOOP
+                    await reply("250 OK")
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.tls = self.tls_context()
+        app = aiohttp.web.Application()
+        app.router.add_get("/api/userid", self.userid)
+        app.router.add_get("/public/committee-info.json", self.committees)
+        app.router.add_get("/lists", self.lists)
+        app.router.add_post("/slack", self.slack)
+        runner = aiohttp.web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = aiohttp.web.TCPSite(runner, self.host, 0)
+        await site.start()
+        self.http_port = site._server.sockets[0].getsockname()[1]
+        smtp = await asyncio.start_server(self.smtp_session, self.host, 0)
+        self.smtp_port = smtp.sockets[0].getsockname()[1]
+        self.ready.set()
+        await asyncio.Event().wait()  # Until the thread is done with
+
+    def start(self) -> "FakeServices":
+        """Starts the fakes in a (daemon) thread, returning once they are accepting connections"""
+        threading.Thread(target=self.loop.run_until_complete, args=(self.serve(),), daemon=True).start()
+        assert self.ready.wait(30), "The fake services did not start"
+        return self
+
+
+if __name__ == "__main__":
+    fakes = FakeServices().start()
+    for name, url in fakes.urls.items():
+        print(f"{name}: {url}")
+    while True:
+        time.sleep(60)
+        print(fakes.counts)
@@ -89,6 +89,44 @@ const PROMOTE = (url, options) => GET(url, options, 'PROMOTE');
 const PUT = (url, options) => GET(url, options, 'PUT');
 const VERIFY = (url, options) => GET(url, options, 'VERIFY');
 
+// Page bootstrap data: the current session (if any) plus the versions of the public datasets
+// (projects and mail domains, blocked projects and Jira schemes). Fetched at most once per page load.
+let bootstrap_response = null;
+function bootstrap_fetch() {
+  if (!bootstrap_response) bootstrap_response = GET('/api/bootstrap');
+  return bootstrap_response;
+}
+
+// Fetches a public dataset by version. The browser keeps each version for good, so it is only
+// downloaded again once it has changed.
+async function dataset_fetch(url, version) {
+  const resp = await GET(`${url}?v=${encodeURIComponent(version)}`);
+  return resp.json();
+}
+
+// The session and all public datasets, as {session: ..., public: {projects, mail_domains, blocked, schemes}}
+let bootstrap_data = null;
+async function bootstrap_load() {
+  const resp = await bootstrap_fetch();
+  const data = await resp.clone().json();
+  const [pubdata, blocked, schemes] = await Promise.all([
+    dataset_fetch('/api/public', data.versions.public),
+    dataset_fetch('/api/blocked-projects', data.versions.blocked),
+    data.versions.schemes ? dataset_fetch('/api/jira-project-schemes', data.versions.schemes) : null,
+  ]);
+  return {session: data.session, public: {...pubdata, blocked, schemes}};
+}
+
+function bootstrap() {
+  if (!bootstrap_data) bootstrap_data = bootstrap_load();
+  return bootstrap_data;
+}
+
+// Logs the time it took from navigation until the page had all the data it needs
+function page_ready() {
+  log(`Page ready after ${Math.round(performance.now())}ms`);
+}
+
 // OAuth gateway. Ensures OAuth is set up in the client before proceeding
 // If/when OAuth is set up, this calls the original callback with the session data
 // and any URL query string args
@@ -111,8 +149,9 @@ async function OAuthGate(callback) {
       toast(await OAuthResponse.text());
     }
   }
-  const session = await GET('/api/auth');
-  if (session.status === 404) { // No session set for this client yet, run the oauth process
+  const session = await bootstrap_fetch();
+  const preferences = session.status === 200 ? (await session.clone().json()).session : null;
+  if (session.status === 200 && !preferences) { // No session set for this client yet, run the oauth process
     if (sessionStorageSupported()) {
       window.sessionStorage.setItem('asp_origin', document.location.href); // Store where we came from
     }
@@ -120,7 +159,6 @@ async function OAuthGate(callback) {
     let origin = encodeURIComponent(document.location.href);
     document.location.href = `https://${document.location.hostname}/api/auth?login=${origin}`;
   } else if (session.status === 200) { // Found a working session
-    const preferences = await session.json();
     if (callback) callback(preferences, QSDict);
   } else { // Something went wrong on the backend, spit out the error msg
     toast(await session.text());
@@ -165,8 +203,7 @@ async function jira_seed_project_list() {
   const qsProject = new URLSearchParams(document.location.search).get('project')
   // Seeds the dropdown with current projects
   const projectlist = document.getElementById('project');
-  const pubresp = await GET("/api/public");
-  const pubdata = await pubresp.json();
+  const pubdata = (await bootstrap()).public;
   for (project of pubdata.projects) {
     const opt = document.createElement("option");
     opt.text = project;
@@ -174,12 +211,12 @@ async function jira_seed_project_list() {
     opt.selected = project == qsProject;
     projectlist.appendChild(opt);
   }
+  page_ready();
 }
 
 async function jira_check_project(project_name) {
-  const apiresp = await POST("/api/jira-project-blocked", {json: {"project": project_name}});
-  const apidata = await apiresp.json();
-  if (apidata.blocked === true) {
+  const pubdata = (await bootstrap()).public;
+  if (pubdata.blocked.jira.includes(project_name)) {
     toast(`The project you have selected does not use Jira for issue tracking. Please contact the project at dev@${project_name}.apache.org to find out where to submit issues.`);
     jira_account_inputs_state("disabled");
   } else {
@@ -332,7 +369,7 @@ async function jira_account_reactivate_submit(form) {
     return false
   }
   const container = document.getElementById('form_submit');
-  container.innerText = "Your request to re-activate your Jira account has been logged. Please check your email addresss for a confirmation email, and confirm your identity by clicking on the link provided in the email."
+  container.innerText = result.message || "Your request to re-activate your Jira account has been logged. Please check your email addresss for a confirmation email, and confirm your identity by clicking on the link provided in the email."
   return false
 }
 
@@ -363,8 +400,7 @@ async function confluence_seed_project_list() {
   const qsProject = new URLSearchParams(document.location.search).get('project')
   // Seeds the dropdown with current projects
   const projectlist = document.getElementById('project');
-  const pubresp = await GET("/api/public");
-  const pubdata = await pubresp.json();
+  const pubdata = (await bootstrap()).public;
   for (project of pubdata.projects) {
     const opt = document.createElement("option");
     opt.text = project;
@@ -372,12 +408,12 @@ async function confluence_seed_project_list() {
     opt.selected = project == qsProject;
     projectlist.appendChild(opt);
   }
+  page_ready();
 }
 
 async function confluence_check_project(project_name) {
-  const apiresp = await POST("/api/confluence-project-blocked", {json: {"project": project_name}});
-  const apidata = await apiresp.json();
-  if (apidata.blocked === true) {
+  const pubdata = (await bootstrap()).public;
+  if (pubdata.blocked.confluence.includes(project_name)) {
     toast(`The project you have selected does not use Confluence. Please contact the project at dev@${project_name}.apache.org to find out where they use a wiki.`);
     confluence_account_inputs_state("disabled");
   } else {
@@ -488,7 +524,7 @@ async function confluence_account_reactivate_submit(form) {
     return false
   }
   const container = document.getElementById('form_submit');
-  container.innerText = "Your request to re-activate your Confluence account has been logged. Please check your email addresss for a confirmation email, and confirm your identity by clicking on the link provided in the email."
+  container.innerText = result.message || "Your request to re-activate your Confluence account has been logged. Please check your email addresss for a confirmation email, and confirm your identity by clicking on the link provided in the email."
   return false
 }
 
@@ -516,8 +552,7 @@ async function confluence_account_reactivate_verify_email(token) {
 async function mailinglist_seed_domain_list(prefs) {
   // Seeds the dropdown with current mailing list domains
   const domainlist = document.getElementById('domainpart');
-  const pubresp = await GET("/api/public");
-  const pubdata = await pubresp.json();
+  const pubdata = (await bootstrap()).public;
   for (const [project, domain] of Object.entries(pubdata.mail_domains)) {
     // Only add domain if user can request lists for it. Either by being root, or by being on a PMC
     if (prefs.isRoot || prefs.committees.includes(project)) {
@@ -548,6 +583,7 @@ async function mailinglist_new(prefs) {
     const admindiv = document.getElementById('admin_div');
     admindiv.style.display = "block";
   }
+  page_ready();
 }
 
 async function mailinglist_new_submit(form) {
@@ -653,10 +689,9 @@ async function confluence_create(form) {
 
 async function jira_seed_schemes() {
   // Seeds the appropriate dropdowns with current schemes
-  const pubresp = await GET("/api/jira-project-schemes");
-  const pubdata = await pubresp.json();
+  const pubdata = (await bootstrap()).public;
 
-  for (const [schemename, schemelist] of Object.entries(pubdata)) {
+  for (const [schemename, schemelist] of Object.entries(pubdata.schemes || {})) {
     const scheme_obj = document.getElementById(`${schemename}_scheme`);
     if (scheme_obj) {
       for (const entry of schemelist) {
@@ -694,7 +729,6 @@ async function jira_create(form) {
 }
 
 async function jira_create_prime() {
-  await jira_seed_project_list();
-  await jira_seed_schemes();
+  await Promise.all([jira_seed_project_list(), jira_seed_schemes()]);
 }
 
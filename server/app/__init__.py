@@ -21,7 +21,7 @@ import secrets
 import asfquart
 import asfquart.generics
 import quart
-from .lib import config, log, middleware
+from .lib import config, email, log, middleware, loopmonitor, metrics
 import os
 import hashlib
 import base64
@@ -45,6 +45,11 @@ def file_to_sri(filepath: str):
         return f"sha384-{b64_digest}"
 
 
+def report_stall(blocked: float, stack: str):
+    metrics.LOOP_STALLS.inc()
+    loopmonitor.print_stall(blocked, stack)
+
+
 def main():
     asfquart.construct(__name__, oauth="/api/auth")
     asfquart.APP.secret_key = secrets.token_hex()  # For session management
@@ -54,6 +59,9 @@ def main():
     asfquart.APP.url_map.converters[
         "filename"
     ] = middleware.FilenameConverter  # Special converter for filename-style vars
+    # Request duration/count metrics for all endpoints
+    asfquart.APP.before_request(middleware.start_request_timer)
+    asfquart.APP.after_request(middleware.record_request)
 
     # Static files (or index.html if requesting a dir listing)
     @asfquart.APP.route("/<path:path>")
@@ -100,12 +108,25 @@ def main():
             from . import endpoints
             from .lib import tokens
 
-            # Regularly update the list of projects from LDAP
-            asfquart.APP.add_background_task(config.get_projects_from_ldap)
-            # Reset rate limits daily
-            asfquart.APP.add_background_task(middleware.reset_rate_limits)
+            # Regularly update the list of projects from LDAP. With multiple workers, only one worker
+            # does the refresh, and the others pick up the result from the shared state.
+            asfquart.APP.add_background_task(
+                config.shared.leader_only("projects", follow=config.follow_projects)(config.get_projects_from_ldap)
+            )
             # Fetch mailing lists hourly
-            asfquart.APP.add_background_task(config.fetch_valid_lists)
+            asfquart.APP.add_background_task(
+                config.shared.leader_only("mailing-lists", follow=config.follow_valid_lists)(config.fetch_valid_lists)
+            )
+            # Post slack notifications queued by the endpoints
+            asfquart.APP.add_background_task(log.slack_dispatcher)
+            # Send the notification digests of projects in digest mode (from one worker, the outbox is shared)
+            asfquart.APP.add_background_task(config.shared.leader_only("email-digest")(email.send_digests))
+            # Watch for code blocking the event loop, logging where it is stuck
+            asfquart.APP.add_background_task(loopmonitor.LoopMonitor(
+                threshold=config.server.loop_stall_ms / 1000,
+                on_lag=metrics.LOOP_LAG.observe,
+                on_stall=report_stall,
+            ).run)
 
     @asfquart.APP.after_serving
     async def shutdown():
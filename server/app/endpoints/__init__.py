@@ -10,4 +10,10 @@ from . import (
     confluence_create,
     jira_create,
     jira_activate_account,
+    bootstrap,
+    metrics,
+    acli_audit,
+    profiler,
+    project_bootstrap,
+    pending_requests,
 )
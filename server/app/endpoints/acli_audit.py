@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handler for the ACLI audit log: recent ACLI invocations, for infra to look into failures and latency"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asfquart
+import asfquart.auth
+import asfquart.utils
+from asfquart.auth import Requirements as R
+from ..lib import acli
+import asyncio
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@asfquart.APP.route(
+    "/api/acli-audit",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require(any_of={R.root})
+async def recent_acli_calls():
+    """Lists the most recent ACLI invocations (newest first), optionally filtered by product, action, actor or
+    request ID, by outcome (failed=true), or by duration (min_duration, in milliseconds)"""
+    form_data = await asfquart.utils.formdata()
+    try:
+        limit = int(form_data.get("limit", DEFAULT_LIMIT))
+        min_duration = float(form_data.get("min_duration", 0))
+    except ValueError:
+        return {"success": False, "message": "limit and min_duration must be numbers"}, 400
+    limit = max(1, min(limit, MAX_LIMIT))
+    wanted = {key: form_data[key] for key in ("product", "action", "actor", "request_id") if form_data.get(key)}
+    failed_only = form_data.get("failed") in ("true", "1", "yes")
+
+    def match(entry: dict) -> bool:
+        if any(entry.get(key) != value for key, value in wanted.items()):
+            return False
+        if failed_only and entry.get("returncode") == 0:
+            return False
+        return entry.get("duration_ms", 0) >= min_duration
+
+    # Include what this worker has not written out yet. Other workers write theirs within a second.
+    await asyncio.to_thread(acli.AUDIT_LOG.flush)
+    entries = await asyncio.to_thread(acli.AUDIT_LOG.recent, limit, match)
+    return {"success": True, "entries": entries}
+
+
+asfquart.APP.add_background_task(acli.AUDIT_LOG.writer)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handler for the consolidated page bootstrap payload"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+from ..lib import config, middleware, snapshot
+from . import jiraaccount, confluenceaccount, jira_create
+import asfquart
+import asfquart.session
+import time
+
+# The blocked project lists are only ever edited in the databases by hand, so re-reading them once a
+# minute is plenty
+BLOCKED_PROJECTS_TTL = 60
+
+
+class BlockedProjects:
+    """The projects that do not use Jira or Confluence, as a pre-serialized snapshot"""
+
+    def __init__(self, ttl: float = BLOCKED_PROJECTS_TTL):
+        self.ttl = ttl
+        self.checked = 0.0
+        self._snapshot = snapshot.JSONSnapshot(cache_control="public, max-age=60, must-revalidate")
+
+    def snapshot(self) -> snapshot.JSONSnapshot:
+        now = time.monotonic()
+        if now - self.checked >= self.ttl:
+            self.checked = now
+            self._snapshot.update(
+                {"jira": jiraaccount.blocked_projects(), "confluence": confluenceaccount.blocked_projects()}
+            )
+        return self._snapshot
+
+
+BLOCKED_PROJECTS = BlockedProjects()
+
+
+@asfquart.APP.route(
+    "/api/bootstrap",
+    methods=[
+        "GET",
+    ],
+)
+async def process_bootstrap():
+    """Returns what a page needs to get going: the current session (if any), and the versions of the
+    public datasets it may use (projects and mail domains, blocked projects, and the Jira schemes for
+    logged-in users). Those are fetched from their own endpoints with ?v=<version>, so browsers can
+    reuse them until they change, and only this small per-user part is sent on every page load."""
+    session = await asfquart.session.read()
+    versions = {
+        "public": config.public_data.etag,
+        "blocked": BLOCKED_PROJECTS.snapshot().etag,
+    }
+    if session:  # Schemes are only of use to (and only shown to) logged-in users
+        versions["schemes"] = jira_create.JIRA_SCHEMES.snapshot().etag
+    return {"session": session, "versions": versions}
+
+
+@asfquart.APP.route(
+    "/api/blocked-projects",
+    methods=[
+        "GET",
+    ],
+)
+async def process_blocked_projects():
+    """Lists the projects that do not use Jira or Confluence"""
+    return middleware.snapshot_response(BLOCKED_PROJECTS.snapshot())
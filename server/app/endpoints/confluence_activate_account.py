@@ -16,14 +16,13 @@
 # specific language governing permissions and limitations
 # under the License.
 """Selfserve Portal for the Apache Software Foundation"""
-import uuid
 
 """Handler for confluence account creation"""
 
-from ..lib import config, email
+from ..lib import config, email, forms, tokenstore, acli, metrics
 import asfquart
-import asfquart.utils
 import asyncio
+import os
 import aiomysql
 import quart
 
@@ -32,11 +31,22 @@ ONE_DAY = 86400  # A day in seconds
 # Mappings dict for userid<->email
 CONFLUENCE_EMAIL_MAPPINGS = {}
 
-# Reactivation queue. No real need for permanent storage here, all requests can be ephemeral.
-CONFLUENCE_REACTIVATION_QUEUE = {}
+# Reactivation tokens. Kept on disk, so they are visible to all workers and survive restarts, and expire after a day.
+CONFLUENCE_REACTIVATION_QUEUE = tokenstore.TokenStore(os.path.join(config.storage.db_dir, "tokens.db"), "confluence-reactivation")
+
+# Answer to repeat requests while the confirmation email that already went out cannot be sent again yet
+ALREADY_SENT_MESSAGE = (
+    "A confirmation link was emailed to you a few minutes ago. Please check your inbox (and spam folder) for it, "
+    "or try again in a little while to have it sent once more."
+)
+
+REACTIVATION_FORM = forms.Form(
+    sources=("args", "form", "json"),
+    username=forms.Field(required=True, max_length=255, message="Please enter your Confluence username"),
+    email=forms.Field(required=True, max_length=255, message="Please enter the email address your Confluence account was registered with"),
+)
+CONFIRMATION_FORM = forms.Form(sources=("args", "form", "json"), token=forms.Field(max_length=64))
 
-# ACLI command - TODO: Add to yaml??
-ACLI_CMD = "/opt/latest-cli/acli.sh"
 
 APP = asfquart.APP
 
@@ -46,69 +56,76 @@ async def update_confluence_email_map():
     pool = await aiomysql.create_pool(**config.cwikimysql.yaml)
     while True:
         print("Updating Confluence email mappings dict")
-        try:
-            tmp_dict = {}
-            async with pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute("SELECT lower_user_name, email_address from cwd_user WHERE directory_id != 10000")
-                    async for row in cur:
-                        if all(x and isinstance(x, str) for x in row):  # Ensure we have actual (non-empty) strings here
-                            tmp_dict[row[0]] = row[1]
-
-            # Clear and refresh mappings
-            CONFLUENCE_EMAIL_MAPPINGS.clear()
-            CONFLUENCE_EMAIL_MAPPINGS.update(tmp_dict)
-        except aiomysql.OperationalError as e:
-            print(f"Operational error while querying Confluence MYSQL: {e}")
-            print("Retrying later...")
+        with metrics.Refresh("confluence-mysql") as refresh:
+            try:
+                tmp_dict = {}
+                async with pool.acquire() as conn:
+                    async with conn.cursor() as cur:
+                        await cur.execute("SELECT lower_user_name, email_address from cwd_user WHERE directory_id != 10000")
+                        async for row in cur:
+                            if all(x and isinstance(x, str) for x in row):  # Ensure we have actual (non-empty) strings here
+                                tmp_dict[row[0]] = row[1]
+
+                # Clear and refresh mappings
+                CONFLUENCE_EMAIL_MAPPINGS.clear()
+                CONFLUENCE_EMAIL_MAPPINGS.update(tmp_dict)
+                config.shared.publish("confluence_email_mappings", tmp_dict)
+            except aiomysql.OperationalError as e:
+                refresh.failed()
+                print(f"Operational error while querying Confluence MYSQL: {e}")
+                print("Retrying later...")
         await asyncio.sleep(ONE_DAY)  # Wait a day...
 
 
+async def follow_confluence_email_map():
+    """Picks up the confluence userid<->email mappings from the worker that refreshes them"""
+    changed, value = config.shared.read_if_changed("confluence_email_mappings")
+    if changed:
+        CONFLUENCE_EMAIL_MAPPINGS.clear()
+        CONFLUENCE_EMAIL_MAPPINGS.update(value)
+
+
 async def activate_account(username: str):
     """Activates an account through ACLI"""
     email_address = CONFLUENCE_EMAIL_MAPPINGS[username]
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "-v",
-            "--action",
-            "updateUser",
-            "--userId",
-            username,
-            "--userEmail",
-            email_address,
-            "--activate",
-        ),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    proc = await acli.run(
+        "confluence",
+        "-v",
+        "--action",
+        "updateUser",
+        "--userId",
+        username,
+        "--userEmail",
+        email_address,
+        "--activate",
     )
-    stdout, stderr = await proc.communicate()
     if proc.returncode != 0:  # If any errors show up in acli, bork
         # Test for ACLI whining but having done the job due to privacy redactions in Jira (email addresses being blank)
-        good_bit = '"active":true'  # If the ACLI JSON output has this, it means the update worked, despite ACLI complaining.
-        if good_bit in stdout or good_bit in stderr:
+        good_bit = b'"active":true'  # If the ACLI JSON output has this, it means the update worked, despite ACLI complaining.
+        if good_bit in proc.stdout or good_bit in proc.stderr:
             return  # all good, ignore!
-        print(f"Could not reactivate Confluence account '{username}': {stderr}")
+        print(f"Could not reactivate Confluence account '{username}': {proc.stderr.decode()}")
         raise AssertionError("Confluence account reactivation failed due to an internal server error.")
 
 
 @APP.route("/api/confluence-account-activate", methods=["GET", "POST"])
-async def process_reactivation_request_cwiki():
+@forms.accepts(REACTIVATION_FORM)
+async def process_reactivation_request_cwiki(formdata: dict):
     """Initial processing of an account re-activation request:
     - Check that username and email match
     - Send confirmation link to email address
     - Wait for confirmation...
     """
-    formdata = await asfquart.utils.formdata()
-    confluence_username = formdata.get("username")
-    confluence_email = formdata.get("email")
+    confluence_username = formdata["username"]
+    confluence_email = formdata["email"]
     if confluence_email.lower().endswith("@apache.org"):  # This is LDAP operated, don't touch!
         return {"success": False, "message": "Reactivation of internal ASF accounts cannot be done through this tool."}
     if confluence_username and confluence_username in CONFLUENCE_EMAIL_MAPPINGS:
         if CONFLUENCE_EMAIL_MAPPINGS[confluence_username].lower() == confluence_email.lower():  # We have a match!
-            # Generate and send confirmation link
-            token = str(uuid.uuid4())
+            # Generate and send confirmation link. Repeat requests get the same token, sent out again only after a while.
+            token, send = CONFLUENCE_REACTIVATION_QUEUE.issue(confluence_username, confluence_username)
+            if not send:
+                return {"success": True, "message": ALREADY_SENT_MESSAGE}
             verify_url = f"https://{quart.request.host}/confluence-account-reactivate.html?{token}"
             email.from_template(
                 "confluence_account_reactivate.txt",
@@ -119,20 +136,19 @@ async def process_reactivation_request_cwiki():
                 thread_start=True,
                 thread_key=f"confluence-activate-{token}",
             )
-            # Store marker in our temp dict
-            CONFLUENCE_REACTIVATION_QUEUE[token] = confluence_username
             return {"success": True}
     return {"success": False, "message": "We were unable to find the account based on the information provided. Either your Confluence account username, or the email address you registered it with, is incorrect."}
 
 
 @APP.route("/api/confluence-account-activate-confirm", methods=["GET", "POST"])
-async def process_confirm_reactivation_cwiki():
+@forms.accepts(CONFIRMATION_FORM)
+async def process_confirm_reactivation_cwiki(formdata: dict):
     """Processes confirmation link handling (and actual reactivation of an account)"""
-    formdata = await asfquart.utils.formdata()
-    token = formdata.get("token")
-    if token and token in CONFLUENCE_REACTIVATION_QUEUE:  # Verify token
-        username = CONFLUENCE_REACTIVATION_QUEUE[token]
-        del CONFLUENCE_REACTIVATION_QUEUE[token]  # Remove right away, before entering the async wait
+    token = formdata["token"]
+    # Verify token. It is removed right away, before entering the async wait, so it can only be used once.
+    # Expired tokens are not accepted.
+    username = CONFLUENCE_REACTIVATION_QUEUE.claim(token) if token else None
+    if username:
         if username in CONFLUENCE_EMAIL_MAPPINGS:
             try:
                 await activate_account(username)
@@ -144,4 +160,9 @@ async def process_confirm_reactivation_cwiki():
 
 
 # Schedule background updater of email mappings
-APP.add_background_task(update_confluence_email_map)
+APP.add_background_task(
+    config.shared.leader_only("confluence-email-map", follow=follow_confluence_email_map)(update_confluence_email_map)
+)
+
+# Schedule background removal of expired reactivation tokens
+APP.add_background_task(config.shared.leader_only("confluence-reactivation-sweep")(CONFLUENCE_REACTIVATION_QUEUE.sweeper))
@@ -21,17 +21,19 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware, email, log
+from ..lib import middleware, email, forms, log, acli, config, jobs, provisioning, tracing
+from .confluence_create import change_permissions
 import asfquart
 import asfquart.session
 import asfquart.auth
 from asfquart.auth import Requirements as R
+import quart
+import asyncio
 import json
 import re
-import asyncio
+import typing
 
 RE_VALID_SPACE = re.compile(r"^[A-Z0-9]+$")
-ACLI_CMD = "/opt/latest-cli/acli.sh"
 
 # Protected from archiving
 PROTECTED_SPACES = (
@@ -43,47 +45,48 @@ PROTECTED_SPACES = (
 CONFLUENCE_ERROR = "Confluence action failed due to an internal server error."
 INVALID_NAME = "Invalid space name!"
 
+# Bulk archiving (retiring a project to the Attic means archiving all of its spaces)
+MAX_BULK_SPACES = 100
+BULK_ARCHIVE_CONCURRENCY = 3  # Spaces archived at a time, each running up to provisioning.DEFAULT_CONCURRENCY ACLI calls
+BULK_ARCHIVE_JOBS = jobs.JobTracker(config.shared, "confluence-archive-jobs")
+BULK_ARCHIVE_FORM = forms.Form(
+    sources=("args", "json"),
+    spaces=forms.Field(list, max_length=MAX_BULK_SPACES, message=f"Please specify a list of up to {MAX_BULK_SPACES} spaces"),
+    job=forms.Field(pattern=r"[0-9a-f]{16}", message="Invalid job ID"),
+)
+
 async def set_archived_status(space: str):
     """Mark a confluence space as archived"""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "-v",
-            "--action",
-            "updateSpace",
-            "--options",
-            "status=archived",
-            "--space",
-            space,
-        ),
+    proc = await acli.run(
+        "confluence",
+        "-v",
+        "--action",
+        "updateSpace",
+        "--options",
+        "status=archived",
+        "--space",
+        space,
+        capture=False,
     )
-    await proc.wait()
     assert proc.returncode == 0, CONFLUENCE_ERROR
 
 
 async def get_space_owners(space: str):
     """Gets the list of users and groups with access to a confluence space"""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "getSpacePermissionList",
-            "--outputType",
-            "json",
-            "--space",
-            space,
-            "--quiet",
-        ),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    proc = await acli.run(
+        "confluence",
+        "--action",
+        "getSpacePermissionList",
+        "--outputType",
+        "json",
+        "--space",
+        space,
+        "--quiet",
     )
-    stdout, _stderr = await proc.communicate()
-    assert stdout, "Could not find this confluence space"
-    js = json.loads(stdout)
+    assert proc.stdout, "Could not find this confluence space"
+    js = json.loads(proc.stdout)
     users = set()
     groups = set()
     for entry in js:
@@ -91,96 +94,60 @@ async def get_space_owners(space: str):
             users.add(entry["id"])
         elif entry["idType"] == "group":
             groups.add(entry["id"])
-    await proc.wait()
     assert proc.returncode == 0, CONFLUENCE_ERROR
     return users, groups
 
 
-async def remove_space_access(space: str, userlist=None, grouplist=None):
-    """Removes space access to a list of one or more users"""
+def remove_space_access(
+    workflow: provisioning.Workflow, space: str, userlist=None, grouplist=None, after: typing.Sequence[str] = ()
+) -> list:
+    """Adds steps removing space access for a list of users and a list of groups to a workflow, to run after
+    the `after` steps. Returns their names."""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
+    steps = []
     if userlist:
         if isinstance(userlist, list) or isinstance(userlist, set):
-            userlist = ",".join(userlist)
+            userlist = ",".join(sorted(userlist))
         assert isinstance(userlist, str), "Userlist must be a string or list of strings"
-        proc = await asyncio.create_subprocess_exec(
-            ACLI_CMD,
-            *(
-                "confluence",
-                "--action",
-                "removePermissions",
-                "--permissions",
-                "@all",
-                "--space",
-                space,
-                "--userId",
-                userlist,
-            ),
-        )
-        await proc.wait()
-        assert proc.returncode == 0, CONFLUENCE_ERROR
+        workflow.step("remove-users", change_permissions, "removePermissions", space, "@all", userid=userlist, after=after)
+        steps.append("remove-users")
     if grouplist:
         if isinstance(grouplist, list) or isinstance(grouplist, set):
-            grouplist = ",".join(grouplist)
+            grouplist = ",".join(sorted(grouplist))
         assert isinstance(grouplist, str), "Grouplist must be a string or list of strings"
-        proc = await asyncio.create_subprocess_exec(
-            ACLI_CMD,
-            *(
-                "confluence",
-                "--action",
-                "removePermissions",
-                "--permissions",
-                "@all",
-                "--space",
-                space,
-                "--group",
-                grouplist,
-            ),
-        )
-        await proc.wait()
-        assert proc.returncode == 0, CONFLUENCE_ERROR
-
-
-async def read_only_access(space: str):
-    """Adds read-only access to a space"""
+        workflow.step("remove-groups", change_permissions, "removePermissions", space, "@all", group=grouplist, after=after)
+        steps.append("remove-groups")
+    return steps
+
+
+def read_only_access(workflow: provisioning.Workflow, space: str, after: typing.Sequence[str] = ()):
+    """Adds steps granting read-only access to a space to a workflow, to run after the `after` steps"""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "addPermissions",
-            "--permissions",
-            "VIEWSPACE",
-            "--space",
-            space,
-            "--userId",
-            "Anonymous",
-        ),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    workflow.step(
+        "anonymous", change_permissions, "addPermissions", space, "VIEWSPACE", userid="Anonymous", capture=True, after=after
     )
-    _stdout, _stderr = await proc.communicate()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
-
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "addPermissions",
-            "--permissions",
-            "VIEWSPACE,EXPORTSPACE",
-            "--space",
-            space,
-            "--group",
-            "confluence-users",
-        ),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    workflow.step(
+        "confluence-users",
+        change_permissions,
+        "addPermissions",
+        space,
+        "VIEWSPACE,EXPORTSPACE",
+        group="confluence-users",
+        capture=True,
+        after=after,
     )
-    _stdout, _stderr = await proc.communicate()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
+
+
+async def archive_space(space: str, users: set, groups: set) -> provisioning.Result:
+    """Archives a space, replacing all access to it with read-only access. Access is only touched once the
+    space is marked as archived, so a failure there leaves the space as it was. The read-only access has
+    to be granted after the old access is revoked, or revoking would take it away again if Anonymous or
+    confluence-users had access before."""
+    workflow = provisioning.Workflow(f"archiving confluence space {space}")
+    workflow.step("archived", set_archived_status, space)
+    removals = remove_space_access(workflow, space, userlist=users, grouplist=groups, after=("archived",))
+    read_only_access(workflow, space, after=("archived", *removals))
+    return await workflow.run()
 
 
 @asfquart.APP.route(
@@ -201,14 +168,13 @@ async def process_archive():
         assert spacename not in PROTECTED_SPACES, "You cannot archive this confluence space"
         assert (session.isMember or session.isChair), "Only Members and Chairs may archive Confluence spaces"
         users, groups = await get_space_owners(spacename)
-        await set_archived_status(spacename)
-        await remove_space_access(spacename, userlist=users, grouplist=groups)
-        await read_only_access(spacename)
+        archived = await archive_space(spacename, users, groups)
+        assert archived.success, archived.message
     except AssertionError as e:
         return {"success": False, "message": str(e)}
 
     # Notify
-    await log.slack(
+    log.slack(
         f"The confluence space, `{spacename}`, has been archived as read-only, as requested by {session.uid}@apache.org."
     )
 
@@ -226,3 +192,81 @@ async def process_archive():
         "success": True,
         "message": "Confluence space archived",
     }
+
+
+async def archive_spaces(job: jobs.Job, requester: str):
+    """Archives the spaces of a bulk archive job, a few at a time, then sends one summary of it all"""
+    tracing.start(job.id, "confluence-archive-bulk")  # So that the ACLI audit log entries can be traced to the job
+    semaphore = asyncio.Semaphore(BULK_ARCHIVE_CONCURRENCY)
+
+    async def archive_one(spacename: str):
+        users, groups = await get_space_owners(spacename)
+        archived = await archive_space(spacename, users, groups)
+        assert archived.success, archived.message
+
+    async def run_limited(spacename: str):
+        async with semaphore:
+            await job.run(spacename, archive_one, spacename)
+
+    await asyncio.gather(*(run_limited(spacename) for spacename in job.items))
+    job.complete()
+
+    archived = job.items_with("ok")
+    failed = job.items_with("failed")
+    summary = f"{len(archived)} of {len(job.items)} confluence spaces have been archived as read-only, as requested by {requester}@apache.org"
+    if archived:
+        summary += f": {', '.join(f'`{spacename}`' for spacename in archived)}"
+    if failed:
+        summary += f". Failed: {', '.join(f'`{spacename}`' for spacename in failed)}"
+    log.slack(summary + ".")
+
+    email.from_template(
+        "confluence_archived_bulk.txt",
+        recipient=("private@infra.apache.org", f"{requester}@apache.org"),
+        variables={
+            "archived_count": len(archived),
+            "total": len(job.items),
+            "archived": "\n".join(f"https://cwiki.apache.org/confluence/display/{spacename}" for spacename in archived) or "(none)",
+            "failed": "\n".join(f"{spacename}: {job.items[spacename]['message']}" for spacename in failed) or "(none)",
+            "requester": requester,
+            "job": job.id,
+        },
+    )
+
+
+@asfquart.APP.route(
+    "/api/confluence-archive-bulk",
+    methods=[
+        "GET",  # Progress of a bulk archive job, or the list of recent jobs
+        "POST",  # Archive a list of spaces
+    ],
+)
+@asfquart.auth.require(any_of={R.root})
+@forms.accepts(BULK_ARCHIVE_FORM)
+async def process_archive_bulk(form_data: dict):
+    if quart.request.method == "GET":
+        if form_data["job"]:
+            job = BULK_ARCHIVE_JOBS.get(form_data["job"])
+            if not job:
+                return quart.Response(status=404, response="No such job")
+            return job
+        return {"jobs": BULK_ARCHIVE_JOBS.recent()}
+
+    session = await asfquart.session.read()
+    spaces = form_data["spaces"]
+    try:
+        # Check all spaces up front, so that we archive either all of them or none
+        assert spaces, "Please specify the spaces to archive"
+        for spacename in spaces:
+            assert isinstance(spacename, str) and RE_VALID_SPACE.match(spacename), f"Invalid space name specified: {spacename}"
+            assert spacename not in PROTECTED_SPACES, f"You cannot archive the {spacename} confluence space"
+    except AssertionError as e:
+        return {"success": False, "message": str(e)}
+
+    job = BULK_ARCHIVE_JOBS.create("confluence-archive", session.uid, list(dict.fromkeys(spaces)))
+    asfquart.APP.add_background_task(archive_spaces, job, session.uid)
+    return {
+        "success": True,
+        "message": f"Archiving {len(job.items)} confluence spaces",
+        "job": job.id,
+    }
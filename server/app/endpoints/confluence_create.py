@@ -21,16 +21,15 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware, email, log
+from ..lib import middleware, config, email, forms, keyindex, log, metrics, userdirectory, acli, provisioning
 import asfquart
 import asfquart.auth
 from asfquart.auth import Requirements as R
 import asfquart.session
-import re
 import asyncio
+import re
 
 RE_VALID_SPACE = re.compile(r"^[A-Z0-9]+$")
-ACLI_CMD = "/opt/latest-cli/acli.sh"
 
 # Protected from archiving
 PROTECTED_SPACES = (
@@ -42,112 +41,131 @@ PROTECTED_SPACES = (
 CONFLUENCE_ERROR = "Confluence action failed due to an internal server error."
 INVALID_NAME = "Invalid space name!"
 
+SPACE_FORM = forms.Form(
+    sources=("args", "form", "json"),
+    space=forms.Field(required=True, max_length=255, pattern=RE_VALID_SPACE, message="Invalid space name specified"),
+    admin=forms.Field(
+        required=True, max_length=255, message="Please specify a user to set as initial administrator of the new space"
+    ),
+    description=forms.Field(required=True, max_length=1000, message="Please write a short description of this new space"),
+)
+
+# Keys of existing Confluence spaces, loaded from the Confluence database
+CONFLUENCE_SPACE_KEYS = keyindex.KeyIndex(config.shared, "confluence-space-keys")
+
+SPACE_KEY_FORM = forms.Form(
+    sources=("args",),
+    space=forms.Field(max_length=255),
+    name=forms.Field(max_length=255),  # Of the project, for suggestions
+)
+
+
+async def refresh_space_keys():
+    """Reloads the keys of the existing Confluence spaces every so often"""
+    while True:
+        with metrics.Refresh("confluence-space-keys") as refresh:
+            try:
+                CONFLUENCE_SPACE_KEYS.replace(await config.user_directory.confluence_space_keys())
+            except userdirectory.DirectoryUnavailable as e:
+                refresh.failed()
+                print(f"Could not load the Confluence space keys: {e}")
+        await asyncio.sleep(keyindex.DEFAULT_REFRESH_INTERVAL)
+
+
 async def confluence_user_exists(username: str):
-    """Checks if a confluence user exists"""
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *("confluence", "--action", "getUser", "--userId", username, "--quiet"),
+    """Checks if a confluence user exists (and is active), using the Confluence database, or ACLI if that is unavailable"""
+    await userdirectory.require_active_user(
+        config.user_directory.confluence_user_status,
+        acli_user_exists,
+        username,
+        "Could not find the specified administrator ID in confluence",
+        "The specified administrator's Confluence account has been deactivated",
     )
-    await proc.wait()
-    assert proc.returncode == 0, "Could not find the specified administrator ID in confluence"
+
+
+async def acli_user_exists(username: str) -> bool:
+    proc = await acli.run("confluence", "--action", "getUser", "--userId", username, "--quiet", capture=False)
+    return proc.returncode == 0
 
 
 async def create_space(space: str, description: str):
     """Creates a new, blank confluence space"""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "-v",
-            "--action",
-            "addSpace",
-            "--space",
-            space,
-            "--description",
-            description,
-        ),
+    proc = await acli.run(
+        "confluence",
+        "-v",
+        "--action",
+        "addSpace",
+        "--space",
+        space,
+        "--description",
+        description,
+        capture=False,
     )
-    await proc.wait()
     assert proc.returncode == 0, "Could not create new space, it may already exist"
+    CONFLUENCE_SPACE_KEYS.add(space)
 
 
-async def set_default_space_access(space: str, admin: str):
+async def change_permissions(
+    action: str, space: str, permissions: str, userid: str = None, group: str = None, capture: bool = False
+):
+    """Adds (action addPermissions) or removes (removePermissions) space permissions for one or more users or groups"""
+    assert RE_VALID_SPACE.match(space), INVALID_NAME
+    target = ("--userId", userid) if userid else ("--group", group)
+    proc = await acli.run(
+        "confluence",
+        "--action",
+        action,
+        "--permissions",
+        permissions,
+        "--space",
+        space,
+        *target,
+        capture=capture,
+    )
+    assert proc.returncode == 0, CONFLUENCE_ERROR
+
+
+async def set_default_space_access(space: str, admin: str) -> provisioning.Result:
     """Sets up default permissions for a space"""
     assert RE_VALID_SPACE.match(space), INVALID_NAME
     assert isinstance(admin, str) and admin, "Please specify a valid admin user"
 
+    workflow = provisioning.Workflow(f"default access for confluence space {space}")
     # All permissions for admin
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "addPermissions",
-            "--permissions",
-            "@all",
-            "--space",
-            space,
-            "--userId",
-            admin,
-        ),
-    )
-    await proc.wait()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
-
+    workflow.step("admin", change_permissions, "addPermissions", space, "@all", userid=admin)
     # Anonymous read access
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "addPermissions",
-            "--permissions",
-            "VIEWSPACE",
-            "--space",
-            space,
-            "--userId",
-            "Anonymous",
-        ),
-    )
-    await proc.wait()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
-
+    workflow.step("anonymous", change_permissions, "addPermissions", space, "VIEWSPACE", userid="Anonymous")
     # View+export rights for logged-in users
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "addPermissions",
-            "--permissions",
-            "VIEWSPACE,EXPORTSPACE",
-            "--space",
-            space,
-            "--group",
-            "confluence-users",
-        ),
+    workflow.step(
+        "confluence-users", change_permissions, "addPermissions", space, "VIEWSPACE,EXPORTSPACE", group="confluence-users"
     )
-    await proc.wait()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
+    # Remove infrabot, tut tut. Only once the rest is in place, in case that relies on its access to the space.
+    workflow.step(
+        "infrabot",
+        change_permissions,
+        "removePermissions",
+        space,
+        "@all",
+        userid="infrabot",
+        after=("admin", "anonymous", "confluence-users"),
+    )
+    return await workflow.run()
+
 
-    # Remove infrabot, tut tut
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "confluence",
-            "--action",
-            "removePermissions",
-            "--permissions",
-            "@all",
-            "--space",
-            space,
-            "--userId",
-            "infrabot",
-        ),
+def validate_space(form_data: dict):
+    """Checks that the space of a (parsed) SPACE_FORM request does not exist yet, as far as we know"""
+    space = form_data["space"]
+    assert CONFLUENCE_SPACE_KEYS.available(space) is not False, CONFLUENCE_SPACE_KEYS.unavailable_message(
+        "A Confluence space", space, space
     )
-    await proc.wait()
-    assert proc.returncode == 0, CONFLUENCE_ERROR
+
+
+async def provision_space(space: str, description: str, admin: str):
+    """Creates a new space, with default permissions"""
+    await create_space(space, description)
+    access = await set_default_space_access(space, admin)
+    assert access.success, access.message
 
 
 @asfquart.APP.route(
@@ -158,29 +176,24 @@ async def set_default_space_access(space: str, admin: str):
     ],
 )
 @asfquart.auth.require(any_of={R.member, R.chair})
-async def process_cwiki_space_create():
+@forms.accepts(SPACE_FORM)
+async def process_cwiki_space_create(form_data: dict):
     session = await asfquart.session.read()
-    form_data = await asfquart.utils.formdata()
 
     # Create a confluence space
-    spacename = form_data.get("space")
-    admin = form_data.get("admin")
-    description = form_data.get("description")
+    spacename = form_data["space"]
+    admin = form_data["admin"]
+    description = form_data["description"]
 
     try:
-        assert isinstance(spacename, str) and RE_VALID_SPACE.match(spacename), "Invalid space name specified"
-        assert (
-            isinstance(admin, str) and admin
-        ), "Please specify a user to set as initial administrator of the new space"
-        assert isinstance(description, str) and description, "Please write a short description of this new space"
+        validate_space(form_data)
         await confluence_user_exists(admin)
-        await create_space(spacename, description)
-        await set_default_space_access(spacename, admin)
+        await provision_space(spacename, description, admin)
     except AssertionError as e:
         return {"success": False, "message": str(e)}
 
     # Notify
-    await log.slack(
+    log.slack(
         f"A new confluence space, `{spacename}`, has been created as requested by {session.uid}@apache.org."
     )
 
@@ -198,3 +211,25 @@ async def process_cwiki_space_create():
         "success": True,
         "message": "Confluence space created",
     }
+
+
+@asfquart.APP.route(
+    "/api/confluence-key-available",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require
+@forms.accepts(SPACE_KEY_FORM)
+async def check_confluence_key_available(form_data: dict):
+    """Checks whether a Confluence space key is free, and suggests free keys based on the project name"""
+    space = form_data["space"] or ""
+    if space and not RE_VALID_SPACE.match(space.upper()):
+        return {"success": False, "message": "Invalid space name specified"}
+    return CONFLUENCE_SPACE_KEYS.check(space, form_data["name"] or "")
+
+
+# Keep the index of Confluence space keys up to date
+asfquart.APP.add_background_task(
+    config.shared.leader_only("confluence-space-keys", follow=CONFLUENCE_SPACE_KEYS.follow)(refresh_space_keys)
+)
@@ -21,7 +21,7 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware, config, email, utils
+from ..lib import middleware, config, email, utils, acli, metrics, tracing, pending
 import quart
 import uuid
 import time
@@ -37,7 +37,7 @@ import asfquart.utils
 NOTIFICATION_TARGET = "notifications@infra.apache.org"  # This is to notify infra as well as projects about pending requests
 
 # infra-reports' more extensive userid search which includes user IDs that are not necessarily present in crowd but would cause issues.
-INFRAREPORTS_USERID_CHECK = "https://infra-reports.apache.org/api/userid"
+INFRAREPORTS_USERID_CHECK = config.cfg_yaml.get("infrareports_userid_url", "https://infra-reports.apache.org/api/userid")
 
 # It is expensive to use the ACLI to check for existing user ids
 # This table is pre-populated with existing ids and the app adds new ids on creation
@@ -76,10 +76,7 @@ CREATE TABLE IF NOT EXISTS cwiki_blocked (
 
 CONFLUENCE_USER_DB = os.path.join(config.storage.db_dir, "confluence.db")
 
-CONFLUENCE_DB = asfpy.sqlite.db(CONFLUENCE_USER_DB)
-
-# Log file for ACLI operations
-CONFLUENCE_ACLI_LOG = os.path.join(config.storage.db_dir, "cwiki_acli.log")
+CONFLUENCE_DB = metrics.InstrumentedDB(asfpy.sqlite.db(CONFLUENCE_USER_DB), "confluence", metrics.SQLITE_DURATION, tracing.record)
 
 # Prefixes used the distinguish user and pmc threads
 # include 'confluenceaccount-' as well to avoid possible clash with other modules
@@ -94,6 +91,7 @@ if not CONFLUENCE_DB.table_exists("cwiki_users"):
 if not CONFLUENCE_DB.table_exists("cwiki_pending"):
     print("Creating Confluence pending database")
     CONFLUENCE_DB.runc(CONFLUENCE_CREATE_PENDING_STATEMENT)
+pending.create_index(CONFLUENCE_DB, "cwiki_pending")  # For the review listing, see /api/pending-requests
 
 if not CONFLUENCE_DB.table_exists("cwiki_blocked"):
     print("Creating Confluence blocked projects database")
@@ -121,6 +119,7 @@ async def prune_stale_requests():
         "GET",
     ]
 )
+@middleware.rate_limited
 async def check_user_exists():
     """Checks if a username has already been taken"""
     form_data = await asfquart.utils.formdata()
@@ -129,7 +128,7 @@ async def check_user_exists():
         return {"found": True}
     else:
         # INFRA-25324: Check infra-reports' userid db as well, but only if we couldn't the userid locally
-        async with aiohttp.ClientSession() as client:
+        async with aiohttp.ClientSession(trace_configs=[tracing.http_tracer()]) as client:
             async with client.get(INFRAREPORTS_USERID_CHECK, params={"id": userid}) as resp:
                 if resp.status == 200:
                     result = await resp.json()
@@ -137,6 +136,11 @@ async def check_user_exists():
                 else:
                     return {"success": False, "message": "Your query could not be completed at this point. Please retry later."}
 
+def blocked_projects():
+    """Returns the list of projects that do not use Confluence"""
+    return sorted(row["project"] for row in CONFLUENCE_DB.fetch("cwiki_blocked", limit=None))
+
+
 @asfquart.APP.route(
     "/api/confluence-project-blocked",
     methods=[
@@ -255,16 +259,42 @@ async def process_caccount():
             # Notify project
             record["review_url"] = f"https://{quart.app.request.host}/confluence-account-review.html?token={token}"
             project_private_list = email.project_to_private(record["project"])
-            email.from_template("confluence_account_pending_review.txt",
-                                recipient=[NOTIFICATION_TARGET, project_private_list],
-                                variables=record,
-                                thread_start=True, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
-                                )
+            email.notify_project(record["project"], "confluence_account_pending_review.txt",
+                                 recipient=[NOTIFICATION_TARGET, project_private_list],
+                                 variables=record,
+                                 thread_start=True, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
+                                 )
 
             return {"success": True, "message": "Your email address has been validated.", "ppl": project_private_list}
         else:
             return {"success": False, "message": "Unknown or already validated token sent."}
 
+
+async def create_account(entry: dict):
+    """Creates the Confluence account of a pending request, or raises AssertionError saying why it could not"""
+    acli_arguments = (
+        "confluence",
+        "-v",  # for debugging (output goes to the ACLI audit log)
+        "--action",
+        "addUser",
+        "--userId",
+        entry["userid"],
+        "--userFullName",
+        entry["realname"],
+        "--userEmail",
+        entry["email"],
+    )
+    try:
+        proc = await acli.run(*acli_arguments)
+    except FileNotFoundError as e:
+        raise AssertionError(str(e))
+    # Check for known error messages in stderr:
+    assert b"A user with that username already exists" not in proc.stderr, "An account with this username already exists in Confluence"
+    assert not re.search(b"Client error: User '.+?' is already defined.", proc.stderr), "The Confluence backend was unable to create this account due to a naming conflict. Please contact infrastructure and have them create the account."
+    # Check that call was okay (exit code 0)
+    assert proc.returncode == 0, "Confluence account creation failed due to an internal server error."
+
+
 @asfquart.APP.route(
     "/api/confluence-account-review",
     methods=[
@@ -308,38 +338,8 @@ async def process_review_cwiki():
         action = form_data.get("action")
         if action == "approve":
             try:
-                acli_arguments = (
-                    "confluence",
-                    "-v", # for debugging (output goes to a journal)
-                    "--action",
-                    "addUser",
-                    "--userId",
-                    entry["userid"],
-                    "--userFullName",
-                    entry["realname"],
-                    "--userEmail",
-                    entry["email"],
-                )
-                proc = await asyncio.create_subprocess_exec(
-                    "/opt/latest-cli/acli.sh",
-                    *acli_arguments,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                stdout, stderr = await proc.communicate()
-                # Log things for debug purposes
-                with open(CONFLUENCE_ACLI_LOG, "a") as aclilog:
-                    aclilog.write(f"Ran ACLI with arguments: {' '.join(acli_arguments)}\n")
-                    aclilog.write(f"Process returned code {proc.returncode}\n")
-                    aclilog.write(f"stdout was: \n{stdout.decode()}\n")
-                    aclilog.write(f"stderr was: \n{stderr.decode()}\n")
-                    aclilog.write(f"---------------------------------------------\n\n")
-                # Check for known error messages in stderr:
-                assert b"A user with that username already exists" not in stderr, "An account with this username already exists in Confluence"
-                assert not re.search(b"Client error: User '.+?' is already defined.", stderr or b""), "The Confluence backend was unable to create this account due to a naming conflict. Please contact infrastructure and have them create the account."
-                # Check that call was okay (exit code 0)
-                assert proc.returncode == 0, "Confluence account creation failed due to an internal server error."
-            except (AssertionError, FileNotFoundError) as e:
+                await create_account(entry)
+            except AssertionError as e:
                 return {"success": False, "message": str(e)}
 
             # Remove entry from pending db, append username to list of active confluence users
@@ -356,11 +356,11 @@ async def process_review_cwiki():
             # Notify project via private list
             private_list = email.project_to_private(entry["project"])
             entry["approver"] = session.uid
-            email.from_template("confluence_account_welcome_pmc.txt",
-                                recipient=[NOTIFICATION_TARGET, private_list ],
-                                variables=entry,
-                                thread_start=False, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
-                                )
+            email.notify_project(entry["project"], "confluence_account_welcome_pmc.txt",
+                                 recipient=[NOTIFICATION_TARGET, private_list ],
+                                 variables=entry,
+                                 thread_start=False, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
+                                 )
 
             return {"success": True, "message": "Account created, welcome email has been dispatched."}
 
@@ -380,13 +380,13 @@ async def process_review_cwiki():
             # Notify project via private list
             private_list = email.project_to_private(entry["project"])
             entry["approver"] = session.uid
-            email.from_template("confluence_account_denied_pmc.txt",
-                                recipient=[NOTIFICATION_TARGET, private_list ],
-                                variables=entry,
-                                thread_start=False, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
-                                )
+            email.notify_project(entry["project"], "confluence_account_denied_pmc.txt",
+                                 recipient=[NOTIFICATION_TARGET, private_list ],
+                                 variables=entry,
+                                 thread_start=False, thread_key=f"{CONFLUENCE_PMC_THREAD_PREFIX}-{token}"
+                                 )
 
             return {"success": True, "message": "Account denied, notification dispatched."}
 
 # Add background loop for pruning pending requests db
-asfquart.APP.add_background_task(prune_stale_requests)
+asfquart.APP.add_background_task(config.shared.leader_only("confluence-prune")(prune_stale_requests))
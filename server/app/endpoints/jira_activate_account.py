@@ -16,13 +16,13 @@
 # specific language governing permissions and limitations
 # under the License.
 """Selfserve Portal for the Apache Software Foundation"""
-import uuid
 
 """Handler for jira account creation"""
 
-from ..lib import middleware, config, email
+from ..lib import middleware, config, email, forms, tokenstore, acli, metrics
 import asfquart
 import asyncio
+import os
 import psycopg
 
 ONE_DAY = 86400  # A day in seconds
@@ -33,61 +33,76 @@ JIRA_PGSQL_DSN = psycopg.conninfo.make_conninfo(**config.jirapsql.yaml)
 # Mappings dict for userid<->email
 JIRA_EMAIL_MAPPINGS = {}
 
-# Reactivation queue. No real need for permanent storage here, all requests can be ephemeral.
-JIRA_REACTIVATION_QUEUE = {}
+# Reactivation tokens. Kept on disk, so they are visible to all workers and survive restarts, and expire after a day.
+JIRA_REACTIVATION_QUEUE = tokenstore.TokenStore(os.path.join(config.storage.db_dir, "tokens.db"), "jira-reactivation")
 
-# ACLI command - TODO: Add to yaml??
-ACLI_CMD = "/opt/latest-cli/acli.sh"
+# Answer to repeat requests while the confirmation email that already went out cannot be sent again yet
+ALREADY_SENT_MESSAGE = (
+    "A confirmation link was emailed to you a few minutes ago. Please check your inbox (and spam folder) for it, "
+    "or try again in a little while to have it sent once more."
+)
+
+REACTIVATION_FORM = forms.Form(
+    sources=("args", "form", "json"),
+    username=forms.Field(required=True, max_length=255, message="Please enter your Jira username"),
+    email=forms.Field(required=True, max_length=255, message="Please enter the email address your Jira account was registered with"),
+)
+CONFIRMATION_FORM = forms.Form(sources=("args", "form", "json"), token=forms.Field(max_length=64))
 
 
 async def update_jira_email_map():
     """Updates the jira userid<->email mappings from psql on a daily basis"""
     while True:
         print("Updating Jira email mappings dict")
-        try:
-            tmp_dict = {}
-            async with await psycopg.AsyncConnection.connect(JIRA_PGSQL_DSN) as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute("SELECT lower_user_name, email_address from cwd_user WHERE directory_id != 10000")
-                    async for row in cur:
-                        if all(x and isinstance(x, str) for x in row):  # Ensure we have actual (non-empty) strings here
-                            tmp_dict[row[0]] = row[1]
-
-            # Clear and refresh mappings
-            JIRA_EMAIL_MAPPINGS.clear()
-            JIRA_EMAIL_MAPPINGS.update(tmp_dict)
-        except psycopg.OperationalError as e:
-            print(f"Operational error while querying Jira PSQL: {e}")
-            print("Retrying later...")
+        with metrics.Refresh("jira-psql") as refresh:
+            try:
+                tmp_dict = {}
+                async with await psycopg.AsyncConnection.connect(JIRA_PGSQL_DSN) as conn:
+                    async with conn.cursor() as cur:
+                        await cur.execute("SELECT lower_user_name, email_address from cwd_user WHERE directory_id != 10000")
+                        async for row in cur:
+                            if all(x and isinstance(x, str) for x in row):  # Ensure we have actual (non-empty) strings here
+                                tmp_dict[row[0]] = row[1]
+
+                # Clear and refresh mappings
+                JIRA_EMAIL_MAPPINGS.clear()
+                JIRA_EMAIL_MAPPINGS.update(tmp_dict)
+                config.shared.publish("jira_email_mappings", tmp_dict)
+            except psycopg.OperationalError as e:
+                refresh.failed()
+                print(f"Operational error while querying Jira PSQL: {e}")
+                print("Retrying later...")
         await asyncio.sleep(ONE_DAY)  # Wait a day...
 
 
+async def follow_jira_email_map():
+    """Picks up the jira userid<->email mappings from the worker that refreshes them"""
+    changed, value = config.shared.read_if_changed("jira_email_mappings")
+    if changed:
+        JIRA_EMAIL_MAPPINGS.clear()
+        JIRA_EMAIL_MAPPINGS.update(value)
+
+
 async def activate_account(username: str):
     """Activates an account through ACLI"""
     email_address = JIRA_EMAIL_MAPPINGS[username]
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "jira",
-            "-v",
-            "--action",
-            "updateUser",
-            "--userId",
-            username,
-            "--userEmail",
-            email_address,
-            "--activate",
-        ),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+    proc = await acli.run(
+        "jira",
+        "-v",
+        "--action",
+        "updateUser",
+        "--userId",
+        username,
+        "--userEmail",
+        email_address,
+        "--activate",
     )
-    stdout, stderr = await proc.communicate()
     if proc.returncode != 0:  # If any errors show up in acli, bork
         # Test for ACLI whining but having done the job due to privacy redactions in Jira (email addresses being blank)
-        good_bit = '"active":true'  # If the ACLI JSON output has this, it means the update worked, despite ACLI complaining.
-        if good_bit in stdout or good_bit in stderr:
+        good_bit = b'"active":true'  # If the ACLI JSON output has this, it means the update worked, despite ACLI complaining.
+        if good_bit in proc.stdout or good_bit in proc.stderr:
             return  # all good, ignore!
-        print(f"Could not reactivate Jira account '{username}': {stderr}")
+        print(f"Could not reactivate Jira account '{username}': {proc.stderr.decode()}")
         raise AssertionError("Jira account reactivation failed due to an internal server error.")
 
 
@@ -98,22 +113,23 @@ async def activate_account(username: str):
         "POST",  # Account re-activation request from user
     ],
 )
-async def process_reactivation_request():
+@forms.accepts(REACTIVATION_FORM)
+async def process_reactivation_request(formdata: dict):
     """Initial processing of an account re-activation request:
     - Check that username and email match
     - Send confirmation link to email address
     - Wait for confirmation...
     """
-    formdata = await asfquart.utils.formdata()
-    session = await asfquart.session.read()
-    jira_username = formdata.get("username")
-    jira_email = formdata.get("email")
+    jira_username = formdata["username"]
+    jira_email = formdata["email"]
     if jira_email.lower().endswith("@apache.org"):  # This is LDAP operated, don't touch!
         return {"success": False, "message": "Reactivation of internal ASF accounts cannot be done through this tool."}
     if jira_username and jira_username in JIRA_EMAIL_MAPPINGS:
         if JIRA_EMAIL_MAPPINGS[jira_username].lower() == jira_email.lower():  # We have a match!
-            # Generate and send confirmation link
-            token = str(uuid.uuid4())
+            # Generate and send confirmation link. Repeat requests get the same token, sent out again only after a while.
+            token, send = JIRA_REACTIVATION_QUEUE.issue(jira_username, jira_username)
+            if not send:
+                return {"success": True, "message": ALREADY_SENT_MESSAGE}
             verify_url = f"https://{asfquart.app.request.host}/jira-account-reactivate.html?{token}"
             email.from_template(
                 "jira_account_reactivate.txt",
@@ -124,8 +140,6 @@ async def process_reactivation_request():
                 thread_start=True,
                 thread_key=f"jira-activate-{token}",
             )
-            # Store marker in our temp dict
-            JIRA_REACTIVATION_QUEUE[token] = jira_username
             return {"success": True}
     return {"success": False, "message": "We were unable to find the account based on the information provided. Either your Jira account username, or the email address you registered it with, is incorrect."}
 
@@ -137,14 +151,14 @@ async def process_reactivation_request():
         "POST",  # Account re-activation request from user
     ],
 )
-async def process_confirm_reactivation():
+@forms.accepts(CONFIRMATION_FORM)
+async def process_confirm_reactivation(formdata: dict):
     """Processes confirmation link handling (and actual reactivation of an account)"""
-    formdata = await asfquart.utils.formdata()
-    session = await asfquart.session.read()
-    token = formdata.get("token")
-    if token and token in JIRA_REACTIVATION_QUEUE:  # Verify token
-        username = JIRA_REACTIVATION_QUEUE[token]
-        del JIRA_REACTIVATION_QUEUE[token]  # Remove right away, before entering the async wait
+    token = formdata["token"]
+    # Verify token. It is removed right away, before entering the async wait, so it can only be used once.
+    # Expired tokens are not accepted.
+    username = JIRA_REACTIVATION_QUEUE.claim(token) if token else None
+    if username:
         if username in JIRA_EMAIL_MAPPINGS:
             try:
                 await activate_account(username)
@@ -157,4 +171,9 @@ async def process_confirm_reactivation():
 
 
 # Schedule background updater of email mappings
-asfquart.APP.add_background_task(update_jira_email_map)
+asfquart.APP.add_background_task(
+    config.shared.leader_only("jira-email-map", follow=follow_jira_email_map)(update_jira_email_map)
+)
+
+# Schedule background removal of expired reactivation tokens
+asfquart.APP.add_background_task(config.shared.leader_only("jira-reactivation-sweep")(JIRA_REACTIVATION_QUEUE.sweeper))
@@ -21,7 +21,7 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware, asfuid, email, log, config
+from ..lib import middleware, email, log, config, datasets, forms, keyindex, userdirectory, acli, metrics, provisioning
 import asfquart
 import asfquart.auth
 import asfquart.session
@@ -32,20 +32,76 @@ import os
 import json
 
 RE_VALID_PROJECT_KEY = re.compile(r"^[A-Z0-9]+$")
-ACLI_CMD = "/opt/latest-cli/acli.sh"
 JIRA_SCHEME_FILES = {
     "workflow": "/x1/acli/site/js/jiraworkflowschemes.json",
 }
+# If set, we generate the workflow scheme list from Jira ourselves every N seconds,
+# instead of relying on an external cron job writing the scheme file.
+JIRA_SCHEME_REFRESH_INTERVAL = int(config.cfg_yaml.get("jira_scheme_refresh_interval", 0))
+if JIRA_SCHEME_REFRESH_INTERVAL:
+    JIRA_SCHEME_FILES["workflow"] = os.path.join(config.storage.db_dir, "jiraworkflowschemes.json")
+JIRA_SCHEMES = datasets.DatasetBundle(
+    {key: datasets.FileDataset(filepath) for key, filepath in JIRA_SCHEME_FILES.items()},
+)
+# Keys of existing Jira projects, loaded from the Jira database
+JIRA_PROJECT_KEYS = keyindex.KeyIndex(config.shared, "jira-project-keys")
+
+KEY_FORM = forms.Form(
+    sources=("args",),
+    key=forms.Field(max_length=255),
+    name=forms.Field(max_length=255),  # Of the project, for suggestions
+)
+
+
+async def refresh_schemes_from_jira():
+    """Regularly fetches the list of workflow schemes from Jira and writes it to the scheme file"""
+    while True:
+        with metrics.Refresh("jira-schemes") as refresh:
+            proc = await acli.run("jira", "--action", "getWorkflowSchemeList", "--outputType", "json", "--quiet")
+            try:
+                assert proc.returncode == 0, f"ACLI exited with code {proc.returncode}: {proc.stderr.decode()}"
+                schemes = sorted(
+                    entry.get("Name") or entry.get("name") for entry in json.loads(proc.stdout) if isinstance(entry, dict)
+                )
+                assert schemes, "ACLI returned an empty list of workflow schemes"
+                # Write atomically, so readers never see a half-written file
+                filepath = JIRA_SCHEME_FILES["workflow"]
+                with open(filepath + ".tmp", "w") as f:
+                    json.dump(schemes, f)
+                os.replace(filepath + ".tmp", filepath)
+                JIRA_SCHEMES.datasets["workflow"].invalidate()
+            except (AssertionError, TypeError, ValueError, OSError) as e:
+                refresh.failed()
+                print(f"Could not refresh Jira workflow schemes, retrying later: {e}")
+        await asyncio.sleep(JIRA_SCHEME_REFRESH_INTERVAL)
+
+
+async def refresh_project_keys():
+    """Reloads the keys of the existing Jira projects every so often"""
+    while True:
+        with metrics.Refresh("jira-project-keys") as refresh:
+            try:
+                JIRA_PROJECT_KEYS.replace(await config.user_directory.jira_project_keys())
+            except userdirectory.DirectoryUnavailable as e:
+                refresh.failed()
+                print(f"Could not load the Jira project keys: {e}")
+        await asyncio.sleep(keyindex.DEFAULT_REFRESH_INTERVAL)
 
 
 async def jira_user_exists(username: str):
-    """Checks if a jira user exists"""
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *("jira", "--action", "getUser", "--userId", username, "--quiet"),
+    """Checks if a jira user exists (and is active), using the Jira database, or ACLI if that is unavailable"""
+    await userdirectory.require_active_user(
+        config.user_directory.jira_user_status,
+        acli_user_exists,
+        username,
+        "Could not find the specified project lead ID in Jira",
+        "The specified project lead's Jira account has been deactivated",
     )
-    await proc.wait()
-    assert proc.returncode == 0, "Could not find the specified project lead ID in Jira"
+
+
+async def acli_user_exists(username: str) -> bool:
+    proc = await acli.run("jira", "--action", "getUser", "--userId", username, "--quiet", capture=False)
+    return proc.returncode == 0
 
 
 async def create_jira_project(
@@ -59,79 +115,125 @@ async def create_jira_project(
 ):
     """Creates a new jira project"""
     assert RE_VALID_PROJECT_KEY.match(project_key), "Invalid project key!"
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "jira",
-            "-v",
-            "--action",
-            "createProject",
-            "--project",
-            project_key,
-            "--name",
-            project_name,
-            "--description",
-            description,
-            "--lead",
-            project_lead,
-            "--issueTypeScheme",
-            issue_scheme,
-            "--workflowScheme",
-            workflow_scheme,
-            "--url",
-            homepage_url,
-            "--notificationScheme",
-            "Empty Scheme",
-            "--permissionScheme",
-            "_Default Permission Scheme_",
-        ),
+    proc = await acli.run(
+        "jira",
+        "-v",
+        "--action",
+        "createProject",
+        "--project",
+        project_key,
+        "--name",
+        project_name,
+        "--description",
+        description,
+        "--lead",
+        project_lead,
+        "--issueTypeScheme",
+        issue_scheme,
+        "--workflowScheme",
+        workflow_scheme,
+        "--url",
+        homepage_url,
+        "--notificationScheme",
+        "Empty Scheme",
+        "--permissionScheme",
+        "_Default Permission Scheme_",
+        capture=False,
     )
-    await proc.wait()
     assert proc.returncode == 0, "Could not create new jira project, it may already exist"
+    JIRA_PROJECT_KEYS.add(project_key)
 
 
-async def set_project_access(project_key: str, ldap_project: str):
+async def add_role_actors(project_key: str, role: str, group: str, error: str):
+    """Adds a group to a role in a project"""
+    proc = await acli.run(
+        "jira",
+        "--action",
+        "addProjectRoleActors",
+        "--project",
+        project_key,
+        "--role",
+        role,
+        "--group",
+        group,
+        capture=False,
+    )
+    assert proc.returncode == 0, error
+
+
+async def set_project_access(project_key: str, ldap_project: str) -> provisioning.Result:
     """Sets up default permissions for a project"""
     assert RE_VALID_PROJECT_KEY.match(project_key), "Invalid space name!"
     assert (
         isinstance(ldap_project, str) and ldap_project and ldap_project in config.projects
     ), "Please specify a valid PMC"
 
+    workflow = provisioning.Workflow(f"default access for jira project {project_key}")
     # Admin access for PMC
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "jira",
-            "--action",
-            "addProjectRoleActors",
-            "--project",
-            project_key,
-            "--role",
-            "administrators",
-            "--group",
-            f"{ldap_project}-pmc",
-        ),
+    workflow.step(
+        "administrators",
+        add_role_actors,
+        project_key,
+        "administrators",
+        f"{ldap_project}-pmc",
+        f"Could not assign administrator access to {ldap_project}-pmc",
     )
-    await proc.wait()
-    assert proc.returncode == 0, f"Could not assign administrator access to {ldap_project}-pmc"
-
     # Standard access to project committers
-    proc = await asyncio.create_subprocess_exec(
-        ACLI_CMD,
-        *(
-            "jira",
-            "--action",
-            "addProjectRoleActors",
-            "--project",
-            project_key,
-            "--role",
-            "committers",
-            "--group",
-            ldap_project,
-        ),
+    workflow.step(
+        "committers",
+        add_role_actors,
+        project_key,
+        "committers",
+        ldap_project,
+        f"Could not assign write access to {ldap_project} committers",
     )
-    await proc.wait()
-    assert proc.returncode == 0, f"Could not assign write access to {ldap_project} committers"
+    return await workflow.run()
+
+
+def validate_project(session, form_data: dict):
+    """Checks a Jira project request, and whether the user may make it"""
+    project_key = form_data.get("project_key")
+    project_name = form_data.get("project_name")
+    project_lead = form_data.get("project_lead")
+    ldap_project = form_data.get("ldap_project")
+    issue_scheme = form_data.get("issue_scheme")
+    workflow_scheme = form_data.get("workflow_scheme")
+    homepage_url = form_data.get("homepage_url")
+    description = form_data.get("description")
+
+    assert (session.committees or session.isRoot), "Only members of a (P)PMC may create jira projects"
+    assert isinstance(project_key, str) and RE_VALID_PROJECT_KEY.match(project_key), "Invalid project key specified"
+    assert isinstance(project_name, str) and project_name, "Please specify a title for the new Jira project"
+    assert JIRA_PROJECT_KEYS.available(project_key) is not False, JIRA_PROJECT_KEYS.unavailable_message(
+        "A Jira project", project_key, project_name
+    )
+    assert isinstance(description, str) and description, "Please write a short description of this new project"
+    assert isinstance(project_lead, str) and project_lead, "Please specify a project lead for this project"
+    assert (
+        ldap_project in config.projects
+    ), "Please specify a valid, current apache project to assign this Jira project to"
+    if not session.isRoot:
+        assert ldap_project in session.committees, "You can only create a Jira project for an Apache project you are on the PMC of"
+    assert isinstance(issue_scheme, str) and issue_scheme, "Please specify a valid issue scheme this project"
+    assert (
+        isinstance(workflow_scheme, str) and workflow_scheme
+    ), "Please specify a valid workflow scheme for this project"
+    assert isinstance(homepage_url, str) and homepage_url, "Please specify a homepage URL for this project"
+
+
+async def provision_project(form_data: dict):
+    """Creates a (validated) Jira project, with standard access: admin for PMC, read/write for committers"""
+    await create_jira_project(
+        project_key=form_data["project_key"],
+        project_name=form_data["project_name"],
+        project_lead=form_data["project_lead"],
+        description=form_data["description"],
+        issue_scheme=form_data["issue_scheme"],
+        workflow_scheme=form_data["workflow_scheme"],
+        homepage_url=form_data["homepage_url"],
+    )
+    access = await set_project_access(form_data["project_key"], form_data["ldap_project"])
+    assert access.success, access.message
 
 
 @asfquart.APP.route(
@@ -147,52 +249,17 @@ async def process_jira_space_create():
     # Create a new jira project
 
     project_key = form_data.get("project_key")
-    project_name = form_data.get("project_name")
-    project_lead = form_data.get("project_lead")
     ldap_project = form_data.get("ldap_project")
-    issue_scheme = form_data.get("issue_scheme")
-    workflow_scheme = form_data.get("workflow_scheme")
-    homepage_url = form_data.get("homepage_url")
-    description = form_data.get("description")
-
     try:
-        assert (session.committees or session.isRoot), "Only members of a (P)PMC may create jira projects"
-        assert isinstance(project_key, str) and RE_VALID_PROJECT_KEY.match(project_key), "Invalid project key specified"
-        assert isinstance(project_name, str) and project_name, "Please specify a title for the new Jira project"
-        assert isinstance(description, str) and description, "Please write a short description of this new project"
-        assert isinstance(project_lead, str) and project_lead, "Please specify a project lead for this project"
-        assert (
-            ldap_project in config.projects
-        ), "Please specify a valid, current apache project to assign this Jira project to"
-        if not session.isRoot:
-            assert ldap_project in session.committees, "You can only create a Jira project for an Apache project you are on the PMC of"
-        assert isinstance(issue_scheme, str) and issue_scheme, "Please specify a valid issue scheme this project"
-        assert (
-            isinstance(workflow_scheme, str) and workflow_scheme
-        ), "Please specify a valid workflow scheme for this project"
-        assert isinstance(homepage_url, str) and homepage_url, "Please specify a homepage URL for this project"
-
+        validate_project(session, form_data)
         # Make sure project lead exists in Jira
-        await jira_user_exists(project_lead)
-
-        # Set up the new project
-        await create_jira_project(
-            project_key=project_key,
-            project_name=project_name,
-            project_lead=project_lead,
-            description=description,
-            issue_scheme=issue_scheme,
-            workflow_scheme=workflow_scheme,
-            homepage_url=homepage_url,
-        )
-        # Set standard access: admin for PMC, read/write for committers
-        await set_project_access(project_key, ldap_project)
-
+        await jira_user_exists(form_data["project_lead"])
+        await provision_project(form_data)
     except AssertionError as e:
         return {"success": False, "message": str(e)}
 
     # Notify
-    await log.slack(f"A new Jira project, `{project_key}`, has been created as requested by {session.uid}@apache.org.")
+    log.slack(f"A new Jira project, `{project_key}`, has been created as requested by {session.uid}@apache.org.")
 
     project_email = email.project_to_private(ldap_project)
     email.from_template(
@@ -220,14 +287,34 @@ async def process_jira_space_create():
 @asfquart.auth.require
 async def list_schemes():
     """Lists current valid schemes for Jira"""
-    form_data = await asfquart.utils.formdata()
-    session = await asfquart.session.read()
-    scheme_dict = {}
-    for key, filepath in JIRA_SCHEME_FILES.items():
-        if os.path.isfile(filepath):
-            try:
-                js = json.load(open(filepath))
-                scheme_dict[key] = js
-            except json.JSONDecodeError:  # Bad JSON file? :/
-                scheme_dict[key] = {}
-    return quart.jsonify(scheme_dict)
+    return middleware.snapshot_response(JIRA_SCHEMES.snapshot())
+
+
+@asfquart.APP.route(
+    "/api/jira-key-available",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require
+@forms.accepts(KEY_FORM)
+async def check_jira_key_available(form_data: dict):
+    """Checks whether a Jira project key is free, and suggests free keys based on the project name"""
+    key = form_data["key"] or ""
+    if key and not RE_VALID_PROJECT_KEY.match(key.upper()):
+        return {"success": False, "message": "Invalid project key specified"}
+    return JIRA_PROJECT_KEYS.check(key, form_data["name"] or "")
+
+
+def read_schemes():
+    """Returns the current valid schemes for Jira, as read from the (cached) scheme files"""
+    return JIRA_SCHEMES.get()
+
+
+if JIRA_SCHEME_REFRESH_INTERVAL:
+    asfquart.APP.add_background_task(config.shared.leader_only("jira-schemes")(refresh_schemes_from_jira))
+
+# Keep the index of Jira project keys up to date
+asfquart.APP.add_background_task(
+    config.shared.leader_only("jira-project-keys", follow=JIRA_PROJECT_KEYS.follow)(refresh_project_keys)
+)
@@ -21,15 +21,17 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware, config, asfuid, email, log, utils
+from ..lib import middleware, config, email, forms, log, utils
 import asfquart
 import asfquart.auth
 import asfquart.session
 from asfquart.auth import Requirements as R
 import time
+import hashlib
 import json
 import os
 import re
+import typing
 
 VALID_LISTPART_RE = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
 # These lists are accepted as private (and MUST be private). All other lists should be public unless root.
@@ -44,6 +46,30 @@ VALID_MUOPTS_INFRA = ("mu", "mU", "Mu", "MU")  # Infra can use MU as well
 # List parts cannot end in -default or -owner
 INVALID_ENDINGS = ( "-default", "-owner", )
 
+MAILINGLIST_FORM = forms.Form(
+    sources=("args", "form", "json"),
+    listpart=forms.Field(
+        required=True, pattern=VALID_LISTPART_RE, message="Invalid list name. Must only consist of alphanumerical characters and dashes"
+    ),
+    domainpart=forms.Field(required=True, message="Mailing list domain is not a valid ASF hostname"),
+    moderators=forms.Field(list, required=True, min_length=1, items=str, message="You need to provide a list of moderators"),
+    private=forms.Field(bool, default=False),
+    muopts=forms.Field(required=True, choices=VALID_MUOPTS_INFRA, message="Invalid moderation options given"),
+    trailer=forms.Field(bool, default=False, message="Trailer option must be a boolean value"),
+    expedited=forms.Field(bool, default=False),
+)
+
+# Several lists on one domain, sharing moderators and options. `private` lists which of them are private.
+MAX_BATCH_LISTS = 20
+MAILINGLIST_BATCH_FORM = forms.Form(
+    sources=("form", "json"),
+    listparts=forms.Field(
+        list, required=True, max_length=MAX_BATCH_LISTS, items=str, message=f"Please specify a list of up to {MAX_BATCH_LISTS} mailing list names"
+    ),
+    private=forms.Field(list, default=[], items=str, message="Private lists must be given as a list of names"),
+    **{name: MAILINGLIST_FORM.fields[name] for name in ("domainpart", "moderators", "muopts", "trailer", "expedited")},
+)
+
 
 def can_manage_domain(session, domain: str):
     """Yields true if the user can manage a specific project domain, otherwise False"""
@@ -55,6 +81,85 @@ def can_manage_domain(session, domain: str):
     return False
 
 
+def validate_list(session, form_data: dict):
+    """Checks a (MAILINGLIST_FORM) mailing list request, and whether the user may make it"""
+    listpart = form_data["listpart"]
+    domainpart = form_data["domainpart"]
+    moderators = form_data["moderators"]
+    is_private = form_data["private"]
+    muopts = form_data["muopts"]
+    expedited = form_data["expedited"]
+    assert listpart.endswith("-digest") is False, "A mailing list cannot end in -digest"
+    assert domainpart in config.messaging.mail_mappings.values(), "Mailing list domain is not a valid ASF hostname"
+    assert can_manage_domain(session, domainpart), "You are not authorized to create mailing lists for this domain"
+    assert all(
+        utils.check_email_address(moderator) for moderator in moderators
+    ), "Invalid moderator list provided. Please use valid email addresses only"
+    assert not is_private or (
+        listpart in PRIVATE_LISTS or session.isRoot is True
+    ), "Only private@ or security@ can be made private by default. Please file a ticket with Infrastructure for non-standard private lists"
+    assert is_private or listpart not in PRIVATE_LISTS, "private@ and security@ lists MUST be marked as private"
+    assert muopts in VALID_MUOPTS or (session.isRoot is True and muopts in VALID_MUOPTS_INFRA), "Invalid moderation options given"
+    assert not expedited or session.isRoot, "Only infrastructure can expedite mailing list requests"
+    assert f"{listpart}@{domainpart}" not in config.messaging.mailing_list_index, "This mailing already exists"
+    assert not any(listpart.endswith(bad_ending) for bad_ending in INVALID_ENDINGS), "Invalid list name. Cannot end in a restricted ezmlm keyword"
+
+
+def list_payload(requester: str, form_data: dict) -> dict:
+    """The request for mailreq to create a (validated) mailing list"""
+    request_time = int(time.time())
+    if form_data["expedited"]:  # If expedited request, for backwards compat, we pretend it came in a day earlier.
+        request_time -= 86400
+    return {
+        "type": "mailinglist",
+        "requester": requester,
+        "requested": request_time,
+        "domain": form_data["domainpart"],
+        "list": form_data["listpart"],
+        "muopts": form_data["muopts"],
+        "private": form_data["private"],
+        "mods": form_data["moderators"],
+        "trailer": "t" if form_data["trailer"] else "T",
+        "expedited": form_data["expedited"],
+    }
+
+
+def write_queue_entry(filename: str, payload: dict):
+    """Saves a queue entry. It is written under a temporary name first, so that /api/queue never
+    lists a half-written entry."""
+    filepath = os.path.join(config.storage.queue_dir, filename)
+    with open(filepath + ".tmp", "w") as f:
+        json.dump(payload, f)
+    os.replace(filepath + ".tmp", filepath)
+
+
+def queue_list(requester: str, form_data: dict) -> str:
+    """Queues a (validated) mailing list request for mailreq to pick up. Returns the ID of the request."""
+    # This filename is also the ID of the request.
+    filename = f"mailinglist-{form_data['listpart']}-{form_data['domainpart']}.json"
+    write_queue_entry(filename, {"id": filename, **list_payload(requester, form_data)})
+    return filename
+
+
+def queue_lists(requester: str, requests: typing.List[dict]) -> str:
+    """Queues (validated) requests for several lists on one domain as a single queue entry, for mailreq
+    to create in one go. Returns the ID of the entry."""
+    domainpart = requests[0]["domainpart"]
+    digest = hashlib.sha1(",".join(sorted(request["listpart"] for request in requests)).encode()).hexdigest()[:8]
+    filename = f"mailinglist-batch-{domainpart}-{digest}.json"
+    lists = [list_payload(requester, request) for request in requests]
+    payload = {
+        "type": "mailinglist-batch",
+        "id": filename,
+        "requester": requester,
+        "requested": min(entry["requested"] for entry in lists),
+        "domain": domainpart,
+        "lists": lists,  # Each just like a single mailinglist entry
+    }
+    write_queue_entry(filename, payload)
+    return filename
+
+
 @asfquart.APP.route(
     "/api/mailinglist",
     methods=[
@@ -62,72 +167,24 @@ def can_manage_domain(session, domain: str):
     ],
 )
 @asfquart.auth.require({R.pmc_member})
-async def process_lists():
-    form_data = await asfquart.utils.formdata()
+@forms.accepts(MAILINGLIST_FORM)
+async def process_lists(form_data: dict):
     session = await asfquart.session.read()
     # Creating a new mailing list
 
-    listpart = form_data.get("listpart")
-    domainpart = form_data.get("domainpart")
-    moderators = form_data.get("moderators")
-    is_private = form_data.get("private", False)
-    muopts = form_data.get("muopts")
-    trailer = form_data.get("trailer", False)
-    expedited = form_data.get("expedited")
-    now = int(time.time())
-    # Validate data
+    listpart = form_data["listpart"]
+    domainpart = form_data["domainpart"]
+    is_private = form_data["private"]
     try:
-        assert listpart and VALID_LISTPART_RE.match(
-            listpart
-        ), "Invalid list name. Must only consist of alphanumerical characters and dashes"
-        assert listpart.endswith("-digest") is False, "A mailing list cannot end in -digest"
-        assert domainpart in config.messaging.mail_mappings.values(), "Mailing list domain is not a valid ASF hostname"
-        assert can_manage_domain(session, domainpart), "You are not authorized to create mailing lists for this domain"
-        assert isinstance(moderators, list) and moderators, "You need to provide a list of moderators"
-        assert all(
-            utils.check_email_address(moderator) for moderator in moderators
-        ), "Invalid moderator list provided. Please use valid email addresses only"
-        assert not is_private or (
-            listpart in PRIVATE_LISTS or session.isRoot is True
-        ), "Only private@ or security@ can be made private by default. Please file a ticket with Infrastructure for non-standard private lists"
-        assert is_private or listpart not in PRIVATE_LISTS, "private@ and security@ lists MUST be marked as private"
-        assert muopts in VALID_MUOPTS or (session.isRoot is True and muopts in VALID_MUOPTS_INFRA), "Invalid moderation options given"
-        assert isinstance(trailer, bool), "Trailer option must be a boolean value"
-        assert not expedited or session.isRoot, "Only infrastructure can expedite mailing list requests"
-        assert f"{listpart}@{domainpart}" not in config.messaging.mailing_lists, "This mailing already exists"
-        assert not any(listpart.endswith(bad_ending) for bad_ending in INVALID_ENDINGS), "Invalid list name. Cannot end in a restricted ezmlm keyword"
+        validate_list(session, form_data)
     except AssertionError as e:
         return {"success": False, "message": str(e)}
 
-    # This filename is also the ID of the request.
-    filename = f"mailinglist-{listpart}-{domainpart}.json"
-
-    # Generate the payload for mailreq
-    request_time = now
-    if expedited:  # If expedited request, for backwards compat, we pretend it came in a day earlier.
-        request_time -= 86400
-    payload = {
-        "type": "mailinglist",
-        "id": filename,
-        "requester": session.uid,
-        "requested": request_time,
-        "domain": domainpart,
-        "list": listpart,
-        "muopts": muopts,
-        "private": is_private,
-        "mods": moderators,
-        "trailer": "t" if trailer else "T",
-        "expedited": expedited,
-    }
-
-    # Save payload file
-    filepath = os.path.join(config.storage.queue_dir, filename)
-    with open(filepath, "w") as f:
-        json.dump(payload, f)
+    queue_list(session.uid, form_data)
 
     # Notify of pending request
     visitype = "private" if is_private else "public"
-    await log.slack(
+    log.slack(
         f"A new {visitype} mailing list, `{listpart}@{domainpart}` has been queued for creation, as requested by {session.uid}@apache.org."
     )
 
@@ -146,3 +203,50 @@ async def process_lists():
         "success": True,
         "message": "Request logged. Please allow for up to 24 hours for the request to be processed.",
     }
+
+
+@asfquart.APP.route(
+    "/api/mailinglist-batch",
+    methods=[
+        "POST",  # Create several mailing lists on one domain
+    ],
+)
+@asfquart.auth.require({R.pmc_member})
+@forms.accepts(MAILINGLIST_BATCH_FORM)
+async def process_lists_batch(form_data: dict):
+    session = await asfquart.session.read()
+    domainpart = form_data["domainpart"]
+    requests = []
+    try:
+        assert len(set(form_data["listparts"])) == len(form_data["listparts"]), "Each mailing list can only be requested once"
+        assert set(form_data["private"]) <= set(form_data["listparts"]), "Private lists must be among the lists requested"
+        for listpart in form_data["listparts"]:
+            request = MAILINGLIST_FORM.validate({**form_data, "listpart": listpart, "private": listpart in form_data["private"]})
+            validate_list(session, request)
+            requests.append(request)
+    except AssertionError as e:
+        return {"success": False, "message": str(e)}
+
+    queue_lists(session.uid, requests)
+
+    # Notify of pending request
+    addresses = [f"{request['listpart']}@{domainpart}" for request in requests]
+    log.slack(
+        f"{len(addresses)} new mailing lists, {', '.join(f'`{address}`' for address in addresses)} have been queued for creation, as requested by {session.uid}@apache.org."
+    )
+
+    email.from_template(
+        "mailinglist_create_batch.txt",
+        recipient=("private@infra.apache.org", f"{session.uid}@apache.org"),
+        variables={
+            "count": len(addresses),
+            "domainpart": domainpart,
+            "lists": "\n".join(f"{address} ({'private' if request['private'] else 'public'})" for address, request in zip(addresses, requests)),
+            "requester": session.uid,
+        },
+    )
+
+    return {
+        "success": True,
+        "message": "Request logged. Please allow for up to 24 hours for the request to be processed.",
+    }
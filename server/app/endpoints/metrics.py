@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handler for the Prometheus metrics endpoint"""
+
+from ..lib import config, metrics
+import asfquart
+import asfquart.auth
+from asfquart.auth import Requirements as R
+import asyncio
+import os
+import quart
+
+PUBLISH_INTERVAL = 15  # How often each worker shares its metrics with the others
+MAX_AGE = 60  # Metrics from workers that have not published for this long are considered gone
+
+
+def publish():
+    config.shared.publish(f"metrics:{os.getpid()}", metrics.REGISTRY.dump())
+
+
+async def publish_metrics():
+    """Regularly shares the metrics of this worker, so that whichever worker gets scraped can report on all of them"""
+    while True:
+        publish()
+        await asyncio.sleep(PUBLISH_INTERVAL)
+
+
+@asfquart.APP.route(
+    "/api/metrics",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require(any_of={R.roleacct})
+async def process_metrics():
+    """Serves the metrics of all workers, added up, in the Prometheus text format"""
+    publish()
+    dumps = config.shared.collect("metrics:", max_age=MAX_AGE)
+    return quart.Response(
+        metrics.render(metrics.merge(dumps.values())), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+asfquart.APP.add_background_task(publish_metrics)
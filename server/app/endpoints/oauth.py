@@ -21,7 +21,7 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from ..lib import middleware
+from ..lib import middleware, forms
 import asfquart
 import asfquart.session
 import quart
@@ -32,6 +32,7 @@ import time
 
 OAUTH_URL_INIT = "https://oauth.apache.org/auth?state=%s&redirect_uri=%s"
 OAUTH_URL_CALLBACK = "https://oauth.apache.org/token?code=%s"
+OAUTH_FORM = forms.Form(code=forms.Field(max_length=255), state=forms.Field(max_length=255))
 
 @asfquart.APP.route(
     "/api/oauth",
@@ -39,12 +40,11 @@ OAUTH_URL_CALLBACK = "https://oauth.apache.org/token?code=%s"
         "GET",
     ],
 )
-async def process():
-    form_data = await asfquart.utils.formdata()
-    session = await asfquart.session.read()
+@forms.accepts(OAUTH_FORM)
+async def process(form_data: dict):
     if quart.request.method == "GET":
-        code = form_data.get("code")
-        state = form_data.get("state")
+        code = form_data["code"]
+        state = form_data["state"]
         if not code or not state:  # Presumably first step in OAuth
             state = str(uuid.uuid4())
             callback_url = urllib.parse.urljoin(
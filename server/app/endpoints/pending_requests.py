@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handlers for reviewing the Jira and Confluence account requests awaiting review by the current user:
+listing them, and approving or denying several of them at once"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+from ..lib import email, forms, metrics, pending, provisioning
+from . import jiraaccount, confluenceaccount
+import asfquart
+import asfquart.auth
+import asfquart.session
+import asyncio
+import time
+import typing
+
+MAX_BULK_REVIEW = 50
+
+
+class Service(typing.NamedTuple):
+    name: str
+    db: metrics.InstrumentedDB
+    pending_table: str
+    users_table: str
+    create_account: typing.Callable[[dict], typing.Awaitable]
+    template_prefix: str  # Of the email templates, as in jira_account_welcome.txt
+    user_thread_prefix: str
+    pmc_thread_prefix: str
+    notification_target: str
+
+
+SERVICES = {
+    "jira": Service(
+        "Jira",
+        jiraaccount.JIRA_DB,
+        "pending",
+        "users",
+        jiraaccount.create_account,
+        "jira",
+        jiraaccount.JIRA_USER_THREAD_PREFIX,
+        jiraaccount.JIRA_PMC_THREAD_PREFIX,
+        jiraaccount.NOTIFICATION_TARGET,
+    ),
+    "confluence": Service(
+        "Confluence",
+        confluenceaccount.CONFLUENCE_DB,
+        "cwiki_pending",
+        "cwiki_users",
+        confluenceaccount.create_account,
+        "confluence",
+        confluenceaccount.CONFLUENCE_USER_THREAD_PREFIX,
+        confluenceaccount.CONFLUENCE_PMC_THREAD_PREFIX,
+        confluenceaccount.NOTIFICATION_TARGET,
+    ),
+}
+SERVICE_FIELD = forms.Field(required=True, choices=SERVICES, message="Please specify the service (jira or confluence)")
+
+PENDING_FORM = forms.Form(
+    sources=("args",),
+    service=SERVICE_FIELD,
+    project=forms.Field(),  # Only list the requests for this project
+    after=forms.Field(max_length=200, message="Invalid cursor"),  # The cursor of the page to list
+    limit=forms.Field(int, default=pending.DEFAULT_PAGE_SIZE),
+)
+
+BULK_REVIEW_FORM = forms.Form(
+    sources=("json",),
+    service=SERVICE_FIELD,
+    action=forms.Field(required=True, choices=("approve", "deny"), message="Please specify the action (approve or deny)"),
+    tokens=forms.Field(
+        list, required=True, max_length=MAX_BULK_REVIEW, message=f"Please specify a list of up to {MAX_BULK_REVIEW} request tokens"
+    ),
+    reason=forms.Field(max_length=2000),
+)
+
+
+@asfquart.APP.route(
+    "/api/pending-requests",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require
+@forms.accepts(PENDING_FORM)
+async def process_pending_requests(form_data: dict):
+    """Lists the account requests awaiting review for the projects of the current user (all projects, for
+    infra), a page at a time, with the number of requests per project. Reviewers act on a request with
+    its token, through /api/jira-account-review or /api/confluence-account-review, or on several at once
+    through /api/pending-requests-review."""
+    session = await asfquart.session.read()
+    service = SERVICES[form_data["service"]]
+    projects = None if session.isRoot else sorted(session.projects)
+    try:
+        if form_data["project"]:
+            assert (
+                projects is None or form_data["project"] in projects
+            ), "You can only review account requests related to the projects you are on"
+            projects = [form_data["project"]]
+        requests, cursor = pending.awaiting_review(service.db, service.pending_table, projects, form_data["after"], form_data["limit"])
+        counts = pending.counts(service.db, service.pending_table, projects)
+    except AssertionError as e:
+        return {"success": False, "message": str(e)}
+    return {
+        "success": True,
+        "requests": requests,
+        "counts": counts,
+        "total": sum(counts.values()),
+        "next": cursor,
+    }
+
+
+def reviewable(session, service: Service, action: str, tokens: typing.List[str]) -> typing.Tuple[typing.List[dict], typing.Dict[str, str]]:
+    """Looks up all requests in one go, returning those the current user can act on, and why the others
+    cannot be, by token. The checks are those of the single review endpoints."""
+    placeholders = ", ".join("?" * len(tokens))
+    entries = {
+        entry["token"]: entry
+        for entry in service.db.query(f"SELECT * FROM {service.pending_table} WHERE token IN ({placeholders})", *tokens)
+    }
+    accepted, errors = [], {}
+    for token in tokens:
+        entry = entries.get(token)
+        if not entry:
+            errors[token] = "Could not find the pending account request. It may have already been reviewed."
+        elif entry["validated"] != 1:
+            errors[token] = f"This {service.name} account request has not been verified by the requester yet."
+        elif entry["project"] not in session.projects and not session.isRoot:
+            errors[token] = "You can only review account requests related to the projects you are on"
+        elif action == "deny" and entry["denied_ts"]:
+            errors[token] = "This account request has already been denied. Nothing to do."
+        else:
+            accepted.append(entry)
+    return accepted, errors
+
+
+@asfquart.APP.route(
+    "/api/pending-requests-review",
+    methods=[
+        "POST",
+    ],
+)
+@asfquart.auth.require
+@forms.accepts(BULK_REVIEW_FORM)
+async def process_pending_requests_review(form_data: dict):
+    """Approves or denies a list of account requests. Accounts are created concurrently (a few ACLI runs
+    at a time), the pending table is updated in a single transaction, and all notifications go out over
+    a single SMTP session. The outcome is reported per request token."""
+    session = await asfquart.session.read()
+    service = SERVICES[form_data["service"]]
+    action = form_data["action"]
+    tokens = list(dict.fromkeys(form_data["tokens"]))  # Each request only once
+    try:
+        for token in tokens:
+            assert isinstance(token, str) and len(token) == 36, "Invalid token format"
+    except AssertionError as e:
+        return {"success": False, "message": str(e)}
+
+    entries, errors = reviewable(session, service, action, tokens)
+    if action == "approve":
+        workflow = provisioning.Workflow(f"{service.name} account approvals by {session.uid}")
+        for entry in entries:
+            workflow.step(entry["token"], service.create_account, entry)
+        result = await workflow.run()
+        errors.update({step.name: step.error for step in result.steps if step.status != "ok"})
+        entries = [entry for entry in entries if entry["token"] not in errors]
+        statements = []
+        for entry in entries:  # Remove entries from the pending db, append usernames to the list of active users
+            statements.append((f"DELETE FROM {service.pending_table} WHERE token = ?", (entry["token"],)))
+            statements.append((f"INSERT OR IGNORE INTO {service.users_table} (userid) VALUES (?)", (entry["userid"],)))
+        reason = form_data["reason"] or ""
+    else:
+        denied_ts = int(time.time())  # Mark when denied, for db pruning loop
+        statements = [(f"UPDATE {service.pending_table} SET denied_ts = ? WHERE token = ?", (denied_ts, entry["token"])) for entry in entries]
+        reason = form_data["reason"] or "No reason given."
+    if statements:
+        service.db.transaction(statements)
+
+    # Inform the requesters, and notify the projects via their private lists (or their digests)
+    outcome = "welcome" if action == "approve" else "denied"
+    batch = email.Batch()
+    for entry in entries:
+        token = entry["token"]
+        variables = {**entry, "reason": reason, "approver": session.uid}
+        batch.from_template(
+            f"{service.template_prefix}_account_{outcome}.txt",
+            recipient=entry["email"],
+            variables=variables,
+            thread_start=False, thread_key=f"{service.user_thread_prefix}-{token}", tag=token,
+        )
+        email.notify_project(
+            entry["project"],
+            f"{service.template_prefix}_account_{outcome}_pmc.txt",
+            recipient=[service.notification_target, email.project_to_private(entry["project"])],
+            variables=variables,
+            thread_start=False, thread_key=f"{service.pmc_thread_prefix}-{token}", batch=batch, tag=token,
+        )
+    unsent = await asyncio.to_thread(batch.send)
+
+    reviewed = "Account created" if action == "approve" else "Account denied"
+    results = {}
+    for token in tokens:
+        if token in errors:
+            results[token] = {"success": False, "message": errors[token]}
+        elif token in unsent:
+            results[token] = {"success": True, "message": f"{reviewed}, but the notification emails could not be sent."}
+        else:
+            results[token] = {"success": True, "message": f"{reviewed}, notification dispatched."}
+    done = len(tokens) - len(errors)
+    return {
+        "success": not errors,
+        "message": f"{done} of {len(tokens)} account requests were {'approved' if action == 'approve' else 'denied'}.",
+        "results": results,
+    }
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handler for the sampling profiler, for finding code that keeps the event loop busy (or blocked)"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asfquart
+import asfquart.auth
+import asfquart.utils
+from asfquart.auth import Requirements as R
+from ..lib import config, loopmonitor
+import asyncio
+import threading
+import quart
+
+DEFAULT_SECONDS = 10
+PROFILE_LOCK = asyncio.Lock()  # One profile at a time per worker
+
+
+@asfquart.APP.route(
+    "/api/profile",
+    methods=[
+        "GET",
+    ],
+)
+@asfquart.auth.require(any_of={R.root})
+async def profile_event_loop():
+    """Samples the stack of the event loop of this worker for a number of `seconds` (at most 60), every
+    `interval` milliseconds (5 by default), and returns the stacks in the collapsed format used by
+    flamegraph.pl and speedscope. Time spent waiting for I/O shows up under select."""
+    if not config.server.profiling:
+        return {"success": False, "message": "Profiling is not enabled on this server"}, 404
+    form_data = await asfquart.utils.formdata()
+    try:
+        seconds = float(form_data.get("seconds", DEFAULT_SECONDS))
+        interval = float(form_data.get("interval", loopmonitor.DEFAULT_SAMPLE_INTERVAL * 1000)) / 1000
+        assert 0 < seconds <= loopmonitor.MAX_SAMPLE_DURATION, f"seconds must be between 0 and {loopmonitor.MAX_SAMPLE_DURATION}"
+        assert interval >= 0.001, "interval must be at least 1 millisecond"
+    except (AssertionError, ValueError) as e:
+        return {"success": False, "message": str(e)}, 400
+    if PROFILE_LOCK.locked():
+        return {"success": False, "message": "A profile is already being taken, please try again later"}, 409
+    async with PROFILE_LOCK:
+        # Handlers run on the event loop thread, so this is the thread to sample
+        stacks = await asyncio.to_thread(loopmonitor.sample, threading.get_ident(), seconds, interval)
+    return quart.Response(loopmonitor.render_collapsed(stacks), content_type="text/plain; charset=utf-8")
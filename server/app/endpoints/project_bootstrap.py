@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Selfserve Portal for the Apache Software Foundation"""
+"""Handler for bootstrapping a (new) project: its mailing lists, Jira project and Confluence space in one go"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+from ..lib import config, email, forms, jobs, log, tracing
+from . import mailinglist, jira_create, confluence_create
+import asfquart
+import asfquart.auth
+import asfquart.session
+from asfquart.auth import Requirements as R
+import asyncio
+import quart
+
+MAX_LISTS = 20
+BOOTSTRAP_JOBS = jobs.JobTracker(config.shared, "project-bootstrap-jobs")
+
+# A project descriptor. Lists share the domain and moderators, Jira and Confluence are optional.
+#   {
+#     "project": "foo",
+#     "moderators": ["someone@apache.org", ...],
+#     "lists": [{"listpart": "dev", "muopts": "mu"}, {"listpart": "private", "private": true, "muopts": "mu"}, ...],
+#     "jira": {"project_key": "FOO", "project_name": ..., ...},  # As for /api/jira-project-create
+#     "confluence": {"space": "FOO", "admin": ..., "description": ...},  # As for /api/confluence-create
+#   }
+BOOTSTRAP_FORM = forms.Form(
+    sources=("args", "json"),
+    project=forms.Field(message="Please specify the project to bootstrap"),
+    domain=forms.Field(),  # Defaults to the mail domain of the project
+    moderators=forms.Field(list, default=[]),
+    lists=forms.Field(list, default=[], max_length=MAX_LISTS, message=f"Please specify a list of up to {MAX_LISTS} mailing lists"),
+    jira=forms.Field(dict),
+    confluence=forms.Field(dict),
+    job=forms.Field(pattern=r"[0-9a-f]{16}", message="Invalid job ID"),
+)
+
+
+async def validate(session, form_data: dict) -> dict:
+    """Checks the whole descriptor with the checks of the individual endpoints, returning the work to do:
+    the (parsed) request for each list, Jira project and Confluence space, by job item name"""
+    project = form_data["project"]
+    assert project in config.projects, "Please specify a valid, current apache project to bootstrap"
+    domain = form_data["domain"] or config.messaging.mail_mappings.get(project)
+    assert domain, "Could not find the mail domain of this project, please specify it"
+    assert form_data["lists"] or form_data["jira"] or form_data["confluence"], "There is nothing to bootstrap"
+    work = {}
+
+    for entry in form_data["lists"]:
+        assert isinstance(entry, dict), "Mailing lists must be given as objects"
+        request = mailinglist.MAILINGLIST_FORM.validate({"domainpart": domain, "moderators": form_data["moderators"], **entry})
+        mailinglist.validate_list(session, request)
+        item = f"list:{request['listpart']}@{request['domainpart']}"
+        assert item not in work, f"The {request['listpart']}@{request['domainpart']} list is requested more than once"
+        work[item] = request
+
+    lookups = []
+    if form_data["jira"]:
+        request = {**form_data["jira"], "ldap_project": project}
+        jira_create.validate_project(session, request)
+        lookups.append(jira_create.jira_user_exists(request["project_lead"]))
+        work[f"jira:{request['project_key']}"] = request
+
+    if form_data["confluence"]:
+        assert session.isMember or session.isChair, "Only Members and Chairs may create Confluence spaces"
+        request = confluence_create.SPACE_FORM.validate(form_data["confluence"])
+        confluence_create.validate_space(request)
+        lookups.append(confluence_create.confluence_user_exists(request["admin"]))
+        work[f"confluence:{request['space']}"] = request
+
+    # Make sure the Jira project lead and Confluence space admin exist, both at once
+    for result in await asyncio.gather(*lookups, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+    return work
+
+
+async def bootstrap(job: jobs.Job, work: dict, project: str, requester: str):
+    """Does all the work of a bootstrap job at once, then sends one notification of it all"""
+    tracing.start(job.id, "project-bootstrap")  # So that the ACLI audit log entries can be traced to the job
+
+    async def queue_list(request: dict):
+        mailinglist.queue_list(requester, request)
+
+    async def provision_space(request: dict):
+        await confluence_create.provision_space(request["space"], request["description"], request["admin"])
+
+    steps = {"list": queue_list, "jira": jira_create.provision_project, "confluence": provision_space}
+    await asyncio.gather(*(job.run(item, steps[item.split(":")[0]], request) for item, request in work.items()))
+    job.complete()
+
+    done = job.items_with("ok")
+    failed = job.items_with("failed")
+    summary = f"Project `{project}` has been bootstrapped as requested by {requester}@apache.org: "
+    summary += ", ".join(f"`{item}`" for item in done) or "nothing was set up"
+    if failed:
+        summary += f". Failed: {', '.join(f'`{item}`' for item in failed)}"
+    log.slack(summary + ".")
+
+    email.from_template(
+        "project_bootstrapped.txt",
+        recipient=("private@infra.apache.org", email.project_to_private(project), f"{requester}@apache.org"),
+        variables={
+            "project": project,
+            "done": "\n".join(done) or "(none)",
+            "failed": "\n".join(f"{item}: {job.items[item]['message']}" for item in failed) or "(none)",
+            "requester": requester,
+            "job": job.id,
+        },
+    )
+
+
+@asfquart.APP.route(
+    "/api/project-bootstrap",
+    methods=[
+        "GET",  # Status of a bootstrap job
+        "POST",  # Bootstrap a project
+    ],
+)
+@asfquart.auth.require({R.pmc_member})
+@forms.accepts(BOOTSTRAP_FORM)
+async def process_project_bootstrap(form_data: dict):
+    session = await asfquart.session.read()
+    if quart.request.method == "GET":
+        job = BOOTSTRAP_JOBS.get(form_data["job"] or "")
+        if not job or (job["owner"] != session.uid and not session.isRoot):
+            return quart.Response(status=404, response="No such job")
+        return job
+
+    try:
+        work = await validate(session, form_data)
+    except AssertionError as e:
+        return {"success": False, "message": str(e)}
+
+    job = BOOTSTRAP_JOBS.create("project-bootstrap", session.uid, list(work))
+    asfquart.APP.add_background_task(bootstrap, job, work, form_data["project"], session.uid)
+    return {
+        "success": True,
+        "message": f"Setting up {len(work)} items for {form_data['project']}",
+        "job": job.id,
+    }
@@ -28,9 +28,6 @@ from ..lib import middleware, config
     ],
 )
 async def process_public():
-    form_data = await asfquart.utils.formdata()
-    session = await asfquart.session.read()
-    return {
-        "projects": config.projects,
-        "mail_domains": config.messaging.mail_mappings
-    }
+    """Serves the list of projects and mail domains. This is encoded when the data is refreshed,
+    not per request, and conditional requests are answered with a 304."""
+    return middleware.snapshot_response(config.public_data)
@@ -24,13 +24,14 @@ if not __debug__:
 import asfquart
 import asfquart.auth
 from asfquart.auth import Requirements as R
-from ..lib import config
+from ..lib import config, forms
 import os
 import json
 import re
 import quart
 
 VALID_QUEUE_FILENAME = re.compile(r"^[-.a-z0-9]+\.json$")
+QUEUE_FORM = forms.Form(rm=forms.Field(pattern=VALID_QUEUE_FILENAME, message="Invalid queue item name"))
 
 
 @asfquart.APP.route(
@@ -40,13 +41,12 @@ VALID_QUEUE_FILENAME = re.compile(r"^[-.a-z0-9]+\.json$")
     ],
 )
 @asfquart.auth.require(any_of={R.roleacct, R.root})
-async def list_queue():
+@forms.accepts(QUEUE_FORM)
+async def list_queue(form_data: dict):
     """Lists the current selfserve request queue, or removes an item that has been processed"""
-    form_data = await asfquart.utils.formdata()
     # Externals can remove an item (mark it as processed) by using the `rm` key.
-    to_remove = form_data.get("rm")
+    to_remove = form_data["rm"]
     if to_remove:
-        assert VALID_QUEUE_FILENAME.match(to_remove)
         filepath = os.path.join(config.storage.queue_dir, to_remove)
         if os.path.isfile(filepath):
             os.unlink(filepath)
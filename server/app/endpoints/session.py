@@ -20,7 +20,10 @@
 import asfquart
 import asfquart.auth
 import asfquart.session
-from ..lib import config
+from ..lib import forms
+
+
+SESSION_FORM = forms.Form(action=forms.Field(max_length=32))
 
 
 @asfquart.APP.route(
@@ -29,10 +32,10 @@ from ..lib import config
         "GET",
     ],
 )
-async def process():
+@forms.accepts(SESSION_FORM)
+async def process(form_data: dict):
     session = await asfquart.session.read()
-    form_data = await asfquart.utils.formdata()
-    action = form_data.get("action")
+    action = form_data["action"]
     if action == "logout":  # Clear the session
         asfquart.session.clear()
         return "Logged out!"
@@ -42,6 +45,5 @@ async def process():
         "projects": session.projects,
         "pmcs": session.committees,
         "root": session.isRoot,
-        "all_projects": config.projects,
         "roleaccount": session.isRole,
     }
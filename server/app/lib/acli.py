@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+"""Runs the Atlassian command line interface (ACLI) against Jira and Confluence"""
+
+from . import audit, config, metrics, middleware, tracing
+import asyncio
+import os
+import time
+import typing
+
+DEFAULT_ACLI_CMD = "/opt/latest-cli/acli.sh"
+ACLI_CMD = config.cfg_yaml.get("acli_cmd", DEFAULT_ACLI_CMD)
+
+# Every ACLI invocation, with its (redacted) arguments, outcome, duration, output, request ID and actor
+AUDIT_LOG = audit.AuditLog(
+    os.path.join(config.storage.db_dir, "acli-audit.log"),
+    max_bytes=config.storage.acli_audit_max_size,
+    backups=config.storage.acli_audit_backups,
+)
+
+
+class Result(typing.NamedTuple):
+    returncode: int
+    stdout: bytes  # Empty unless the output was captured
+    stderr: bytes
+
+
+def action_of(arguments: typing.Sequence[str]) -> str:
+    """Returns the --action of an ACLI command line, for labelling metrics"""
+    try:
+        return arguments[arguments.index("--action") + 1]
+    except (ValueError, IndexError):
+        return "unknown"
+
+
+async def run(*arguments: str, capture: bool = True) -> Result:
+    """Runs ACLI with the given arguments, the first of which is the product (jira or confluence).
+    Unless `capture` is set, the output of ACLI goes straight to the journal, as it does for the
+    rest of the portal."""
+    product = arguments[0]
+    action = action_of(arguments)
+    pipe = asyncio.subprocess.PIPE if capture else None
+    returncode = None
+    stdout = stderr = b""
+    start = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(ACLI_CMD, *arguments, stdout=pipe, stderr=pipe)
+        stdout, stderr = await proc.communicate()
+        returncode = proc.returncode
+    except BaseException:
+        metrics.ACLI_CALLS.inc(product, action, "error")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.ACLI_DURATION.observe(elapsed, product, action)
+        tracing.record("acli", elapsed, product=product, action=action)
+        AUDIT_LOG.record(
+            product=product,
+            action=action,
+            arguments=audit.redact(arguments),
+            returncode=returncode,  # None if ACLI could not be run (or the request was cancelled)
+            duration_ms=round(elapsed * 1000, 1),
+            stdout=audit.truncate(stdout or b""),
+            stderr=audit.truncate(stderr or b""),
+            request_id=tracing.request_id(),
+            actor=middleware.request_actor(),
+        )
+    metrics.ACLI_CALLS.inc(product, action, "ok" if returncode == 0 else "failed")
+    return Result(returncode, stdout or b"", stderr or b"")
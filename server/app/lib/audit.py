@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Structured audit log (one JSON object per line), buffered in memory and written out by a background task,
+so recording an entry never blocks the event loop. The log is rotated by size, keeping gzipped backups."""
+
+import asyncio
+import collections
+import fcntl
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+import typing
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # Rotate once the log grows past this
+DEFAULT_BACKUPS = 5  # Gzipped backups kept: log.1.gz (newest) to log.5.gz
+DEFAULT_FLUSH_INTERVAL = 1.0  # Seconds between writes, at most
+MAX_BUFFERED = 10_000  # Entries kept in memory if the disk cannot keep up, after which the oldest are dropped
+MAX_OUTPUT = 4096  # Characters of stdout/stderr kept per entry
+READ_BLOCK = 65536
+
+# Command line options whose values are never logged, and inline secrets (password=..., token: ...)
+SECRET_OPTIONS = {"--password", "-p", "--token", "--userPassword", "--apiToken", "--secret"}
+INLINE_SECRET = re.compile(r"((?:password|passwd|token|secret)\s*[=:]\s*)\S+", re.IGNORECASE)
+REDACTED = "********"
+
+
+def redact(arguments: typing.Sequence[str]) -> typing.List[str]:
+    """Returns a copy of a command line with secrets blanked out"""
+    redacted = []
+    hide_next = False
+    for argument in arguments:
+        if hide_next:
+            redacted.append(REDACTED)
+            hide_next = False
+            continue
+        option, equals, _value = argument.partition("=")
+        if option in SECRET_OPTIONS:
+            if equals:
+                redacted.append(f"{option}={REDACTED}")
+            else:
+                redacted.append(argument)
+                hide_next = True
+            continue
+        redacted.append(INLINE_SECRET.sub(rf"\g<1>{REDACTED}", argument))
+    return redacted
+
+
+def truncate(output: typing.Union[bytes, str], limit: int = MAX_OUTPUT) -> str:
+    """Decodes and shortens process output for logging, keeping the end (where errors usually are)"""
+    if isinstance(output, bytes):
+        output = output.decode("utf-8", errors="replace")
+    output = INLINE_SECRET.sub(rf"\g<1>{REDACTED}", output)
+    if len(output) > limit:
+        return f"[{len(output) - limit} characters cut]..." + output[-limit:]
+    return output
+
+
+class AuditLog:
+    def __init__(
+        self,
+        filepath: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.filepath = filepath
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.buffer: collections.deque = collections.deque(maxlen=MAX_BUFFERED)
+        self.dropped = 0  # Entries lost because the buffer overflowed
+        self.wakeup: typing.Optional[asyncio.Event] = None
+
+    def record(self, **entry):
+        """Queues an entry for writing. This is just an append to a list, the writer task does the I/O."""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        entry.setdefault("timestamp", round(time.time(), 3))
+        self.buffer.append(json.dumps(entry, default=str))
+
+    def flush(self):
+        """Writes out everything buffered so far. Blocking, so the writer task runs it in a thread."""
+        if not self.buffer:
+            return
+        lines = []
+        while self.buffer:
+            lines.append(self.buffer.popleft())
+        # Workers share the log file, so writing and rotating happen under an exclusive lock
+        with open(self.filepath + ".lock", "a") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            with open(self.filepath, "a") as f:
+                f.write("\n".join(lines) + "\n")
+                size = f.tell()
+            if size >= self.max_bytes:
+                self.rotate()
+
+    def rotate(self):
+        """Moves the log to log.1.gz (compressing it), log.1.gz to log.2.gz and so on, dropping the oldest"""
+        for generation in range(self.backups - 1, 0, -1):
+            older = f"{self.filepath}.{generation}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.filepath}.{generation + 1}.gz")
+        rotated = f"{self.filepath}.rotating"
+        os.replace(self.filepath, rotated)
+        with open(rotated, "rb") as source, gzip.open(f"{self.filepath}.1.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.unlink(rotated)
+
+    async def writer(self):
+        """Background task writing buffered entries to disk, at most every `flush_interval` seconds"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await asyncio.to_thread(self.flush)
+            except asyncio.CancelledError:  # Shutting down, write out what we have before leaving
+                self.flush()
+                raise
+            except OSError as e:
+                print(f"Could not write to audit log {self.filepath}: {e}")
+
+    def recent(self, limit: int = 100, match: typing.Optional[typing.Callable[[dict], bool]] = None) -> typing.List[dict]:
+        """Returns the newest `limit` entries (newest first) of the current log file that `match` accepts,
+        reading the file backwards, so only as much of it is read as is needed"""
+        entries: typing.List[dict] = []
+        try:
+            f = open(self.filepath, "rb")
+        except FileNotFoundError:
+            return entries
+        with f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b""
+            while position > 0 and len(entries) < limit:
+                step = min(READ_BLOCK, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + remainder).split(b"\n")
+                remainder = lines.pop(0) if position > 0 else b""  # Possibly partial, completed by the next block
+                for line in reversed(lines):
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # Partially written line
+                        continue
+                    if match is None or match(entry):
+                        entries.append(entry)
+                        if len(entries) == limit:
+                            break
+        return entries
@@ -27,9 +27,9 @@ import asyncio
 
 import yaml
 import os
-from . import log
+from . import log, snapshot, sharedstate, ldapsync, metrics, credstore, datasets, userdirectory
 import uuid
-import asfpy.clitools
+import asfpy.messaging
 import aiohttp
 import json
 
@@ -38,6 +38,7 @@ PIPSERVICE_CONFIG = os.path.join(os.path.realpath(".."), "selfserve-portal.yaml"
 CONFIG_FILE = PIPSERVICE_CONFIG if os.path.isfile(PIPSERVICE_CONFIG) else "config.yaml"
 WEBMOD_MAILING_LIST_URL = "https://webmod.apache.org/lists"
 WHIMSY_COMMITTEE_URL = "https://whimsy.apache.org/public/committee-info.json"
+DEFAULT_ROLEACCOUNTS_FILE = os.path.normpath(os.path.join("..", "roleaccounts.txt"))
 
 # The two mail domain bases - apache.org for the foundation, apachecon.com for apachecon
 BASE_MAIL_DOMAINS = {
@@ -81,6 +82,15 @@ class ServerConfiguration:
         assert self.max_form_size >= 1024, "Max form size needs to be at least 1kb!"
         self.max_content_length = int(self.max_form_size * 1.34)  # Max plus b64 overhead
         self.rate_limit_per_ip = int(yml.get("rate_limit_per_ip", 0))
+        self.rate_limit_store = yml.get("rate_limit_store", "memory")  # memory or sqlite (shared between workers)
+        assert self.rate_limit_store in ("memory", "sqlite"), "rate_limit_store must be either memory or sqlite"
+        self.rate_limit_max_keys = int(yml.get("rate_limit_max_keys", 100000))
+        self.trace_log = yml.get("trace_log", "slow")  # Log request traces: off, slow (requests above trace_slow_ms) or all
+        assert self.trace_log in ("off", "slow", "all"), "trace_log must be one of off, slow or all"
+        self.trace_slow_ms = int(yml.get("trace_slow_ms", 1000))
+        self.otlp_endpoint = yml.get("otlp_endpoint", "")  # Optional OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+        self.loop_stall_ms = int(yml.get("loop_stall_ms", 250))  # Dump the stack when the event loop is blocked this long
+        self.profiling = bool(yml.get("profiling", False))  # Enables the sampling profiler at /api/profile (root only)
 
 
 class LDAPConfiguration:
@@ -91,16 +101,14 @@ class LDAPConfiguration:
         self.userbase = yml["userbase"]
         self.ldapbase = yml["ldapbase"]
         self.servicebase = yml["servicebase"]
-        self.roleaccounts = {}
-        # API role accounts for external services in a file
-        # user:pwd, one per line, use # for comment lines
-        ra_path = yml.get("roleaccounts")
-        if ra_path and os.path.isfile(ra_path):
-            with open(ra_path) as f:
-                for line in f.readlines():
-                    if ":" in line and not line.startswith("#"):
-                        user, pwd = line.strip().split(":", 1)
-                        self.roleaccounts[user] = pwd
+        # The project directory sync binds with these (or anonymously if not set)
+        self.binddn = yml.get("binddn", "")
+        self.bindpw = yml.get("bindpw", "")
+        # API role accounts for external services in a file, used as bearer tokens
+        # user:token, one per line, use # for comment lines. Re-read automatically if the file changes.
+        self.roleaccounts = credstore.CredentialStore(
+            datasets.FileDataset(yml.get("roleaccounts", DEFAULT_ROLEACCOUNTS_FILE), parser=credstore.parse, default={})
+        )
 
 
 class StorageConfiguration:
@@ -114,6 +122,8 @@ class StorageConfiguration:
         if not os.path.isdir(self.db_dir):
             log.log(f"Database directory {self.db_dir} does not exist, will attempt to create it")
             os.makedirs(self.db_dir, exist_ok=True, mode=0o700)
+        self.acli_audit_max_size = text_to_int(yml.get("acli_audit_max_size", "50mb"))  # Rotate the ACLI audit log at this size
+        self.acli_audit_backups = int(yml.get("acli_audit_backups", 5))  # Gzipped audit logs to keep
 
 
 class MessagingConfiguration:
@@ -121,11 +131,20 @@ class MessagingConfiguration:
         self.sender = yml["sender"]
         self.template_dir = yml["template_dir"]
         self.mailing_lists = []
+        self.mailing_list_index = frozenset()  # The same, for lookups
         self.mail_mappings = {}
         self.slack_url = yml.get("slack_url")  # Incoming webhook style
         self.slack_token = yml.get("slack_token")  # restricted token style
         self.slack_channel = yml.get("slack_channel")  # token style, cont'd.
+        self.slack_window = float(yml.get("slack_window", 2))  # Seconds to gather a burst of notifications into one post
+        self.slack_timeout = float(yml.get("slack_timeout", 10))  # Seconds a post to slack may take
         self.mail_relay = yml.get("mail_relay", asfpy.messaging.DEFAULT_MSA)
+        self.digest_projects = frozenset(yml.get("digest_projects") or ())  # Projects that get their notifications as a digest
+        self.digest_interval = int(yml.get("digest_interval", 3600))  # Seconds between digests
+
+    def set_mailing_lists(self, mailing_lists: list):
+        self.mailing_lists = mailing_lists
+        self.mailing_list_index = frozenset(mailing_lists)
 
 
 class JiraPSQLConfiguration:
@@ -150,65 +169,102 @@ class CwikiMySQLConfiguration:
 
 
 async def get_projects_from_ldap():
-    """Reads and sets the current list of projects from LDAP"""
+    """Reads and sets the current list of projects (and their PMC/committer counts) from LDAP"""
     ldap_search_timeout = 30  # Wait no more than 30 sec for ldap data...
     while True:
-        ldap_base = ldap.groupbase.replace("cn=%s,", "")
         try:
-            ldap_data = await asyncio.wait_for(
-                asfpy.clitools.ldapsearch_cli_async(ldap_base, "children", "cn=*"), ldap_search_timeout
-            )
-            if ldap_data and len(ldap_data) > 100:
-                project_list = set([x["cn"][0] for x in ldap_data])
-            projects.clear()
+            with metrics.Refresh("ldap"):
+                await asyncio.wait_for(project_directory.refresh(), ldap_search_timeout)
+            project_list = set(project_directory.groups)
             project_list.add("infra")  # Add infra for testing
             project_list.add("tooling")  # INFRA-26363: one-off for tooling while the org finds a place for it in LDAP
-            projects.extend(sorted(project_list))
+            projects[:] = sorted(project_list)
+            project_counts.clear()
+            project_counts.update(project_directory.groups)
             # Grab the mailing list hostname mappings for our projects
             await fetch_committee_mappings()
+            update_public_data()
+            shared.publish(
+                "projects", {"projects": projects, "counts": project_counts, "mail_mappings": messaging.mail_mappings}
+            )
         except asyncio.exceptions.TimeoutError:
             print("LDAP lookup for list of projects timed out, retrying in 10 minutes")
+        except AssertionError as e:
+            print(e)
+        except Exception as e:  # Generic LDAP exception, we will reconnect next time
+            print(f"LDAP lookup for list of projects failed, retrying in 10 minutes: {e}")
         await asyncio.sleep(600)
 
 
+def update_public_data():
+    """Re-encodes the public data feed (projects and mail domains) after a refresh"""
+    if public_data.update({"projects": projects, "mail_domains": messaging.mail_mappings}):
+        log.log(f"Public data feed updated to version {public_data.version}")
+
+
+async def follow_projects():
+    """Picks up the list of projects and mail mappings from the worker that refreshes them"""
+    changed, value = shared.read_if_changed("projects")
+    if changed:
+        projects[:] = value["projects"]
+        project_counts.clear()
+        project_counts.update(value.get("counts", {}))
+        messaging.mail_mappings = value["mail_mappings"]
+        update_public_data()
+
+
 async def fetch_valid_lists():
     """Fetches the current list of active mailing lists"""
     while True:
+        with metrics.Refresh("webmod") as refresh:
+            async with aiohttp.ClientSession() as client:
+                async with client.get(cfg_yaml.get("webmod_list_url", WEBMOD_MAILING_LIST_URL)) as resp:
+                    if resp.status == 200:
+                        try:
+                            messaging.set_mailing_lists(await resp.json())
+                            shared.publish("mailing_lists", messaging.mailing_lists)
+                        except json.JSONDecodeError as e:
+                            refresh.failed()
+                            print(f"Could not decode JSON from webmod: {e}")
+                    else:
+                        refresh.failed()
+                        txt = await resp.text()
+                        print(f"Could not fetch mailing lists from webmod.apache.org: {txt}")
+        await asyncio.sleep(3600)  # Wait an hour
+
+
+async def follow_valid_lists():
+    """Picks up the list of mailing lists from the worker that refreshes it"""
+    changed, value = shared.read_if_changed("mailing_lists")
+    if changed:
+        messaging.set_mailing_lists(value)
+
+
+async def fetch_committee_mappings():
+    """Fetches the committee info from Whimsy, in order to create project-to-hostname mappings"""
+    with metrics.Refresh("whimsy") as refresh:
         async with aiohttp.ClientSession() as client:
-            async with client.get(cfg_yaml.get("webmod_list_url", WEBMOD_MAILING_LIST_URL)) as resp:
+            async with client.get(cfg_yaml.get("whimsy_committee_url", WHIMSY_COMMITTEE_URL)) as resp:
                 if resp.status == 200:
                     try:
-                        messaging.mailing_lists = await resp.json()
+                        committee_json = await resp.json()
+                        if "committees" in committee_json:
+                            committees = committee_json["committees"]
+                            mail_mappings = BASE_MAIL_DOMAINS.copy()
+                            for project in projects:
+                                if project in committees:
+                                    project_domain = committees[project].get("mail_list", project)
+                                else:
+                                    project_domain = project
+                                mail_mappings[project] = f"{project_domain}.apache.org"
+                            messaging.mail_mappings = mail_mappings
                     except json.JSONDecodeError as e:
-                        print(f"Could not decode JSON from webmod: {e}")
+                        refresh.failed()
+                        print(f"Could not decode JSON from whimsy: {e}")
                 else:
+                    refresh.failed()
                     txt = await resp.text()
-                    print(f"Could not fetch mailing lists from webmod.apache.org: {txt}")
-        await asyncio.sleep(3600)  # Wait an hour
-
-
-async def fetch_committee_mappings():
-    """Fetches the committee info from Whimsy, in order to create project-to-hostname mappings"""
-    async with aiohttp.ClientSession() as client:
-        async with client.get(WHIMSY_COMMITTEE_URL) as resp:
-            if resp.status == 200:
-                try:
-                    committee_json = await resp.json()
-                    if "committees" in committee_json:
-                        committees = committee_json["committees"]
-                        mail_mappings = BASE_MAIL_DOMAINS.copy()
-                        for project in projects:
-                            if project in committees:
-                                project_domain = committees[project].get("mail_list", project)
-                            else:
-                                project_domain = project
-                            mail_mappings[project] = f"{project_domain}.apache.org"
-                        messaging.mail_mappings = mail_mappings
-                except json.JSONDecodeError as e:
-                    print(f"Could not decode JSON from whimsy: {e}")
-            else:
-                txt = await resp.text()
-                print(f"Could not fetch committee info from whimsy.apache.org: {txt}")
+                    print(f"Could not fetch committee info from whimsy.apache.org: {txt}")
 
 cfg_yaml = yaml.safe_load(open(CONFIG_FILE, "r"))
 server = ServerConfiguration(cfg_yaml.get("server", {}))
@@ -217,5 +273,13 @@ storage = StorageConfiguration(cfg_yaml.get("storage", {}))
 messaging = MessagingConfiguration(cfg_yaml.get("messaging", {}))
 jirapsql = JiraPSQLConfiguration(cfg_yaml.get("jirapsql", {}))
 cwikimysql = CwikiMySQLConfiguration(cfg_yaml.get("cwikimysql", {}))
+user_directory = userdirectory.UserDirectory(jirapsql.yaml, cwikimysql.yaml)
 projects = []  # Filled every 10 min by get_projects_from_ldap
-rate_limits = {}  # Tracks IPs and their usage, resets every day
+project_counts = {}  # project -> {"committers": n, "pmc": n}, also filled by get_projects_from_ldap
+project_directory = ldapsync.ProjectDirectory(ldap.uri, ldap.binddn, ldap.bindpw, ldap.groupbase.replace("cn=%s,", ""))
+# State shared between workers, and leader election for background refreshers
+shared = sharedstate.SharedState(os.path.join(storage.db_dir, "shared.db"))
+# Pre-serialized public data feed (projects and mail domains), re-encoded whenever a refresh changes it
+public_data = snapshot.JSONSnapshot(
+    {"projects": projects, "mail_domains": messaging.mail_mappings}, cache_control="public, max-age=60, must-revalidate"
+)
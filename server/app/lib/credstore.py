@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Role account bearer tokens: one file with an `account:token` line per account, where the token is best
+stored as its SHA-256 digest (sha256$hash, as printed by `python3 credstore.py`). Tokens are long random
+strings, so a fast digest is enough for them, and it lets a token be looked up without trying it against
+every account. Plain tokens still work, but are hashed as soon as they are read, so they do not linger in
+memory. The file is read through a datasets.FileDataset (or anything else with get() and a generation),
+so changes take effect without a restart."""
+
+import base64
+import hashlib
+import hmac
+import os
+import typing
+
+TOKEN_SCHEME = "sha256"
+# Salted password hashes, as this file once held. They cannot be looked up by token, so they are refused.
+PASSWORD_SCHEMES = ("pbkdf2_sha256",)
+
+
+class Credential(typing.NamedTuple):
+    account: str
+    token: bytes  # The SHA-256 digest of the token
+
+
+def token_digest(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode()).digest()
+
+
+def hash_token(secret: str) -> str:
+    """The hashed form of a bearer token, for the credentials file"""
+    return f"{TOKEN_SCHEME}${base64.b64encode(token_digest(secret)).decode()}"
+
+
+def parse_credential(account: str, value: str) -> Credential:
+    if value.startswith(f"{TOKEN_SCHEME}$"):
+        return Credential(account, base64.b64decode(value.split("$", 1)[1]))
+    return Credential(account, token_digest(value))  # A plain token
+
+
+def parse(f) -> typing.Dict[str, Credential]:
+    """Parses a credentials file (account:token, one per line, # for comments) into an account->credential dict"""
+    credentials = {}
+    plain = []
+    refused = []
+    for line in f:
+        if not line.startswith("#") and ":" in line:
+            account, value = line.split(":", 1)
+            account = account.strip().lower()
+            value = value.strip()
+            if value.startswith(tuple(f"{scheme}$" for scheme in PASSWORD_SCHEMES)):
+                refused.append(account)
+                continue
+            credentials[account] = parse_credential(account, value)
+            if not value.startswith(f"{TOKEN_SCHEME}$"):
+                plain.append(account)
+    print(f"Loaded {len(credentials)} role accounts")
+    if refused:
+        print(
+            f"Role accounts with a password hash, which can never match a bearer token, were not loaded: "
+            f"{', '.join(refused)}. Please hash their tokens with credstore.py instead."
+        )
+    if plain:
+        print(f"Role accounts with an unhashed token, please hash them with credstore.py: {', '.join(plain)}")
+    return credentials
+
+
+class CredentialStore:
+    def __init__(self, source):
+        self.source = source
+        self.key = os.urandom(32)  # Per-process key, so the index says nothing about the tokens outside of it
+        self.tokens: typing.Dict[str, str] = {}  # keyed digest of a token's SHA-256 -> account
+        self.generation = None
+
+    def keyed(self, value: bytes) -> str:
+        return hmac.new(self.key, value, hashlib.sha256).hexdigest()
+
+    def credentials(self) -> typing.Dict[str, Credential]:
+        """The current credentials. The tokens are indexed again when the file changes."""
+        credentials = self.source.get() or {}
+        if self.source.generation != self.generation:
+            self.generation = self.source.generation
+            self.tokens = {self.keyed(credential.token): credential.account for credential in credentials.values()}
+        return credentials
+
+    def identify(self, secret: str) -> typing.Optional[str]:
+        """The account a bearer token belongs to, if any. This is one lookup, however many accounts there
+        are, and the keyed digest keeps the lookup from telling anything about the stored tokens."""
+        credentials = self.credentials()
+        token = token_digest(secret)
+        account = self.tokens.get(self.keyed(token))
+        if account is None:
+            return None
+        credential = credentials.get(account)
+        if credential is None or not hmac.compare_digest(token, credential.token):
+            return None
+        return account
+
+
+if __name__ == "__main__":
+    import getpass
+
+    print(hash_token(getpass.getpass("Bearer token to hash: ")))
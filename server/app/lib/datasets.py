@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""File-backed datasets: parsed once, re-read only when the file on disk changes"""
+
+import json
+import os
+import time
+import typing
+
+from . import snapshot
+
+REVALIDATE_INTERVAL = 5  # Look at the file's mtime at most every five seconds
+
+
+def parse_json(f: typing.TextIO):
+    return json.load(f)
+
+
+class FileDataset:
+    """A file on disk, parsed into a python object. The file is stat'ed at most once per revalidation
+    interval, and only re-parsed when its mtime or size changed. If a changed file cannot be parsed
+    (for instance if an external job is halfway through writing it), the last good copy is kept."""
+
+    def __init__(
+        self,
+        filepath: str,
+        parser: typing.Callable[[typing.TextIO], typing.Any] = parse_json,
+        default=None,
+        revalidate_interval: float = REVALIDATE_INTERVAL,
+    ):
+        self.filepath = filepath
+        self.parser = parser
+        self.default = default
+        self.revalidate_interval = revalidate_interval
+        self.generation = 0  # Bumped every time the data changes
+        self._data = default
+        self._stat = None
+        self._checked = 0.0
+
+    def _revalidate(self):
+        now = time.monotonic()
+        if now - self._checked < self.revalidate_interval:
+            return
+        self._checked = now
+        try:
+            st = os.stat(self.filepath)
+            file_stat = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            file_stat = None
+        if file_stat == self._stat:
+            return
+        if file_stat is None:  # File was removed
+            self._data = self.default
+        else:
+            try:
+                with open(self.filepath) as f:
+                    self._data = self.parser(f)
+            except (ValueError, OSError) as e:  # JSONDecodeError is a ValueError
+                print(f"Could not parse dataset file {self.filepath}, keeping the previous copy: {e}")
+                if self._stat is None:
+                    self._data = self.default
+        self._stat = file_stat
+        self.generation += 1
+
+    def get(self):
+        """Returns the current data, re-reading the file first if it has changed"""
+        self._revalidate()
+        return self._data
+
+    def invalidate(self):
+        """Forces a stat of the file on next access, for when we know we just changed it"""
+        self._checked = 0.0
+
+
+class DatasetBundle:
+    """A named collection of file-backed datasets, served together as one pre-encoded JSON document.
+    Datasets that have no data (missing file) are left out of the document."""
+
+    def __init__(self, datasets: typing.Dict[str, FileDataset], cache_control: str = "no-cache"):
+        self.datasets = datasets
+        self._snapshot = snapshot.JSONSnapshot(cache_control=cache_control)
+        self._generations = None
+
+    def get(self) -> dict:
+        return {key: data for key, data in ((key, ds.get()) for key, ds in self.datasets.items()) if data is not None}
+
+    def snapshot(self) -> snapshot.JSONSnapshot:
+        """Returns the pre-encoded document, re-encoding it only if one of the datasets changed"""
+        data = self.get()
+        generations = tuple(ds.generation for ds in self.datasets.values())
+        if generations != self._generations:
+            self._snapshot.update(data)
+            self._generations = generations
+        return self._snapshot
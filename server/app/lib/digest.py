@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""A durable outbox for notifications that go out as a digest: one summary email per interval, rather than
+an email per notification. Notifications are rendered when they are added, and kept in a sqlite file
+(which may be shared by several workers) until the digest they are part of has been sent."""
+
+import json
+import sqlite3
+import time
+import typing
+
+OUTBOX_CREATE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS outbox (
+     id integer PRIMARY KEY AUTOINCREMENT,
+     digest text NOT NULL,
+     recipients text NOT NULL,
+     subject text NOT NULL,
+     body text NOT NULL,
+     created integer NOT NULL
+    );
+CREATE INDEX IF NOT EXISTS outbox_by_digest ON outbox (digest, id);
+"""
+
+
+class Notification(typing.NamedTuple):
+    id: int
+    recipients: typing.List[str]
+    subject: str
+    body: str
+    created: int
+
+
+class Outbox:
+    """Notifications waiting to be sent, per digest (e.g. a project). A digest goes to the recipients of
+    the notifications in it; if those differ, there is a digest email for each set of recipients."""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.connector = sqlite3.connect(filepath, isolation_level=None, timeout=5)
+        self.connector.execute("PRAGMA journal_mode=WAL")
+        self.connector.executescript(OUTBOX_CREATE_STATEMENT)
+
+    def add(self, digest: str, recipients: typing.Sequence[str], subject: str, body: str, now: typing.Optional[float] = None):
+        self.connector.execute(
+            "INSERT INTO outbox (digest, recipients, subject, body, created) VALUES (?, ?, ?, ?, ?)",
+            (digest, json.dumps(sorted(recipients)), subject, body, int(time.time() if now is None else now)),
+        )
+
+    def pending(self) -> typing.Dict[typing.Tuple[str, typing.Tuple[str, ...]], typing.List[Notification]]:
+        """All notifications waiting, oldest first, by (digest, recipients)"""
+        digests: typing.Dict[typing.Tuple[str, typing.Tuple[str, ...]], typing.List[Notification]] = {}
+        rows = self.connector.execute("SELECT id, digest, recipients, subject, body, created FROM outbox ORDER BY digest, id")
+        for notification_id, digest, recipients, subject, body, created in rows:
+            recipients = json.loads(recipients)
+            notification = Notification(notification_id, recipients, subject, body, created)
+            digests.setdefault((digest, tuple(recipients)), []).append(notification)
+        return digests
+
+    def remove(self, notifications: typing.Iterable[Notification]):
+        """Removes notifications, once they have been sent"""
+        ids = [(notification.id,) for notification in notifications]
+        with self.connector:  # A single transaction
+            self.connector.execute("BEGIN")
+            self.connector.executemany("DELETE FROM outbox WHERE id = ?", ids)
+
+    def __len__(self):
+        (count,) = self.connector.execute("SELECT COUNT(*) FROM outbox").fetchone()
+        return count
+
+
+def summarize(notifications: typing.Sequence[Notification]) -> typing.Tuple[str, str]:
+    """The list of subjects, and the full notifications one after the other, for the body of a digest"""
+    summary = "\n".join(f"- {notification.subject}" for notification in notifications)
+    details = "\n\n".join(
+        f"{notification.subject}\n{'-' * len(notification.subject)}\n{notification.body}" for notification in notifications
+    )
+    return summary, details
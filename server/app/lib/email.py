@@ -20,9 +20,16 @@
 if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
-from . import config
+from . import config, datasets, digest, metrics, tracing
 import asfpy.messaging
+import asyncio
+import email.message
+import email.policy
+import email.utils
 import os
+import smtplib
+import time
+import typing
 
 """Simple lib for sending emails based on templates"""
 
@@ -30,23 +37,172 @@ import os
 DEFAULT_MAIL_HOST = "infra.apache.org"
 
 
+# Parsed templates, keyed by filename. Each is re-read only if the file changes.
+TEMPLATES = {}
+
+# Notifications for projects in digest mode, until their next digest goes out
+OUTBOX = digest.Outbox(os.path.join(config.storage.db_dir, "outbox.db"))
+DIGEST_TEMPLATE = "project_digest.txt"
+
+
+def parse_template(f):
+    """Splits a template file into its subject and body parts"""
+    subject, body = f.read().split("--", maxsplit=1)
+    return subject, body
+
+
+def get_template(template_filename: str):
+    """Returns the (subject, body) of a template"""
+    if template_filename not in TEMPLATES:
+        template_path = os.path.join(config.messaging.template_dir, template_filename)
+        TEMPLATES[template_filename] = datasets.FileDataset(template_path, parser=parse_template)
+    template = TEMPLATES[template_filename].get()
+    assert template, f"Could not find template {TEMPLATES[template_filename].filepath}"
+    return template
+
+
+def render(template_filename: str, variables: dict):
+    """Returns the (subject, body) of an email from a template"""
+    subject, body = get_template(template_filename)
+    return subject.strip().format(**variables), body.strip().format(**variables)
+
+
 def from_template(template_filename: str, recipient: str, variables: dict, thread_start: bool=False, thread_key: str=None):
     """generate and send email from template"""
-    template_path = os.path.join(config.messaging.template_dir, template_filename)
-    assert os.path.isfile(template_path), f"Could not find template {template_path}"
-    template_data = open(template_path).read()
-    subject, body = template_data.split("--", maxsplit=1)
+    subject, body = render(template_filename, variables)
     host = config.messaging.mail_relay
-    asfpy.messaging.mail(
-        sender=config.messaging.sender,
-        recipient=recipient,
-        subject=subject.strip().format(**variables),
-        message=body.strip().format(**variables),
-        thread_start=thread_start,
-        thread_key=thread_key,
-        headers={},
-        host=host,
-    )
+    # Tag the email with the request that sent it, so it can be matched with the request trace.
+    # asfpy.messaging does not allow extra headers on threaded emails, so those go without.
+    request_id = tracing.request_id()
+    headers = {"X-Request-ID": request_id} if request_id and not (thread_start or thread_key) else {}
+    start = time.perf_counter()
+    try:
+        asfpy.messaging.mail(
+            sender=config.messaging.sender,
+            recipient=recipient,
+            subject=subject,
+            message=body,
+            thread_start=thread_start,
+            thread_key=thread_key,
+            headers=headers,
+            host=host,
+        )
+    except Exception:
+        metrics.EMAILS.inc(template_filename, "failed")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.EMAIL_DURATION.observe(elapsed, template_filename)
+        tracing.record("smtp", elapsed, template=template_filename)
+    metrics.EMAILS.inc(template_filename, "sent")
+
+
+class Batch:
+    """Emails from templates, sent together over a single SMTP session, where from_template connects (and
+    does a TLS handshake) for every email. For bulk operations. Sending blocks, so do it in a thread:
+
+        batch = email.Batch()
+        for entry in entries:
+            batch.from_template("jira_account_welcome.txt", recipient=entry["email"], variables=entry, tag=entry["token"])
+        failed = await asyncio.to_thread(batch.send)
+    """
+
+    def __init__(self):
+        self.messages: typing.List[typing.Tuple[str, typing.List[str], email.message.EmailMessage, typing.Any]] = []
+
+    def from_template(self, template_filename: str, recipient, variables: dict, thread_start: bool=False, thread_key: str=None, tag=None):
+        """Adds an email, as from_template would send it. `tag` identifies it in the outcome of send()."""
+        subject, body = render(template_filename, variables)
+        recipients = [recipient] if isinstance(recipient, str) else list(recipient)
+        message = email.message.EmailMessage()
+        message["From"] = config.messaging.sender
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message["Date"] = email.utils.formatdate()
+        if thread_start:
+            message["Message-ID"] = asfpy.messaging.thread_msgid(thread_key)
+        else:
+            message["Message-ID"] = email.utils.make_msgid("asfpy")
+            if thread_key:
+                message["In-Reply-To"] = asfpy.messaging.thread_msgid(thread_key)
+        request_id = tracing.request_id()
+        if request_id:
+            message["X-Request-ID"] = request_id
+        message.set_content(body)
+        self.messages.append((template_filename, recipients, message, tag))
+
+    def send(self) -> typing.Set:
+        """Sends all emails, returning the tags of those that could not be sent"""
+        failed = set()
+        if not self.messages:
+            return failed
+        host = config.messaging.mail_relay
+        try:
+            smtp = smtplib.SMTP(host) if ":" in host else smtplib.SMTP(host, asfpy.messaging.SMTP_PORT)
+            smtp.starttls()
+        except (OSError, smtplib.SMTPException) as e:
+            print(f"Could not connect to {host} to send {len(self.messages)} emails: {e!r}")
+            for template_filename, _recipients, _message, tag in self.messages:
+                metrics.EMAILS.inc(template_filename, "failed")
+                failed.add(tag)
+            return failed
+        with smtp:
+            for template_filename, recipients, message, tag in self.messages:
+                start = time.perf_counter()
+                try:
+                    smtp.sendmail(config.messaging.sender, recipients, message.as_bytes(policy=email.policy.SMTP))
+                    metrics.EMAILS.inc(template_filename, "sent")
+                except (OSError, smtplib.SMTPException) as e:
+                    print(f"Could not send {template_filename} to {recipients}: {e!r}")
+                    metrics.EMAILS.inc(template_filename, "failed")
+                    failed.add(tag)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    metrics.EMAIL_DURATION.observe(elapsed, template_filename)
+                    tracing.record("smtp", elapsed, template=template_filename)
+        return failed
+
+
+def notify_project(project: str, template_filename: str, recipient, variables: dict, thread_start: bool=False, thread_key: str=None, batch: Batch=None, tag=None):
+    """Sends a notification meant for a project (its private list, and infra). Projects in digest mode get it
+    with their next digest instead. Given a Batch, the email is added to that rather than sent right away."""
+    if project in config.messaging.digest_projects:
+        subject, body = render(template_filename, variables)
+        OUTBOX.add(project, [recipient] if isinstance(recipient, str) else recipient, subject, body)
+        metrics.NOTIFICATIONS_DIGESTED.inc(template_filename)
+    elif batch is not None:
+        batch.from_template(template_filename, recipient, variables, thread_start=thread_start, thread_key=thread_key, tag=tag)
+    else:
+        from_template(template_filename, recipient, variables, thread_start=thread_start, thread_key=thread_key)
+
+
+async def flush_digests():
+    """Sends a digest of the notifications in the outbox, per project. Notifications stay in the outbox
+    until their digest has been sent, so failed digests are retried the next time."""
+    waiting = OUTBOX.pending()
+    if not waiting:
+        return
+    batch = Batch()
+    for (project, recipients), notifications in waiting.items():
+        summary, details = digest.summarize(notifications)
+        variables = {"project": project, "count": len(notifications), "summary": summary, "details": details}
+        batch.from_template(DIGEST_TEMPLATE, recipient=recipients, variables=variables, tag=(project, recipients))
+    unsent = await asyncio.to_thread(batch.send)
+    for key, notifications in waiting.items():
+        if key not in unsent:
+            OUTBOX.remove(notifications)
+
+
+async def send_digests():
+    """Background task sending the digests every digest_interval seconds"""
+    while True:
+        await asyncio.sleep(config.messaging.digest_interval)
+        with metrics.Refresh("email-digests") as refresh:
+            try:
+                await flush_digests()
+            except Exception as e:  # The notifications stay in the outbox, so the next pass retries them
+                refresh.failed()
+                print(f"Could not send the project digests, retrying later: {e}")
 
 
 def project_to_private(project: str):
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+"""Declarative request input. A Form lists the fields an endpoint takes, and where they may come from (the
+query string, form data and/or a JSON body). Only those sources are read, oversized bodies are turned
+away before anything is buffered, and the fields are checked against rules compiled when the form is
+defined, rather than on every request:
+
+    LIST_FORM = forms.Form(
+        sources=("json",),
+        listpart=forms.Field(required=True, pattern=VALID_LISTPART_RE, message="Invalid list name"),
+        moderators=forms.Field(list, required=True, max_length=50),
+    )
+
+    @forms.accepts(LIST_FORM)
+    async def process_lists(form_data: dict):
+        ...
+
+Validation failures are reported the way endpoints report their own: {"success": False, "message": ...}"""
+
+import copy
+import functools
+import re
+import typing
+
+import quart
+
+SOURCES = ("args", "form", "json")
+FORM_CONTENT_TYPES = ("multipart/form-data", "application/x-www-form-urlencoded", "application/x-url-encoded")
+DEFAULT_MAX_SIZE = 64 * 1024  # Bytes. Our forms are small, anything bigger is a mistake or abuse.
+TRUE_VALUES = ("true", "1", "yes", "on")
+FALSE_VALUES = ("false", "0", "no", "off", "")
+MISSING = object()
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class Field:
+    """A single input field: its type (str, int, float, bool, or list or dict for JSON), whether it is required,
+    its default, and optional constraints (length, for str, list and dict values; the type of the items, for
+    list values; a regex, for str values; a set of choices).
+    `message` replaces the default error message if the value does not pass."""
+
+    __slots__ = ("kind", "required", "default", "min_length", "max_length", "items", "pattern", "choices", "message")
+
+    def __init__(
+        self,
+        kind: type = str,
+        required: bool = False,
+        default=None,
+        min_length: int = 0,
+        max_length: typing.Optional[int] = None,
+        items: typing.Optional[type] = None,
+        pattern: typing.Union[str, re.Pattern, None] = None,
+        choices: typing.Optional[typing.Iterable] = None,
+        message: str = "",
+    ):
+        assert kind in (str, int, float, bool, list, dict), f"Unsupported field type {kind.__name__}"
+        assert items is None or kind is list, "Only list fields have items"
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.min_length = min_length
+        self.max_length = max_length
+        self.items = items
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.choices = frozenset(choices) if choices is not None else None
+        self.message = message
+
+    def convert(self, name: str, value):
+        """Converts a value to the type of the field. Query strings and form data are all text, JSON is not."""
+        if self.kind is str:
+            assert isinstance(value, str), self.message or f"{name} must be a text value"
+        elif self.kind is bool:
+            if isinstance(value, str) and value.lower() in TRUE_VALUES + FALSE_VALUES:
+                value = value.lower() in TRUE_VALUES
+            assert isinstance(value, bool), self.message or f"{name} must be true or false"
+        elif self.kind is list:
+            assert isinstance(value, list), self.message or f"{name} must be a list"
+            assert self.items is None or all(isinstance(item, self.items) for item in value), (
+                self.message or f"{name} may only contain {self.items.__name__} values"
+            )
+        elif self.kind is dict:
+            assert isinstance(value, dict), self.message or f"{name} must be an object"
+        else:
+            assert not isinstance(value, bool), self.message or f"{name} must be a number"
+            try:
+                value = self.kind(value)
+            except (TypeError, ValueError):
+                raise AssertionError(self.message or f"{name} must be a number")
+        return value
+
+    def validate(self, name: str, value):
+        if value is MISSING or value is None or value == "":
+            assert not self.required, self.message or f"{name} is required"
+            # Every request gets its own copy of a list or dict default, not one object shared by all
+            return copy.copy(self.default) if isinstance(self.default, (list, dict)) else self.default
+        value = self.convert(name, value)
+        if self.kind in (str, list, dict):
+            assert len(value) >= self.min_length, self.message or f"{name} must be at least {self.min_length} long"
+            assert self.max_length is None or len(value) <= self.max_length, (
+                self.message or f"{name} must be no more than {self.max_length} long"
+            )
+        if self.pattern is not None:
+            assert self.pattern.fullmatch(value), self.message or f"Invalid {name}"
+        if self.choices is not None:
+            assert value in self.choices, self.message or f"Invalid {name}"
+        return value
+
+
+class Form:
+    def __init__(self, sources: typing.Sequence[str] = ("args",), max_size: int = DEFAULT_MAX_SIZE, **fields: Field):
+        assert sources and all(source in SOURCES for source in sources), f"Form sources must be any of {SOURCES}"
+        self.sources = tuple(sources)
+        self.max_size = max_size
+        self.fields = fields
+        self.reads_body = "form" in self.sources or "json" in self.sources
+
+    async def buffer_body(self):
+        """Reads a body of unknown length, giving up as soon as it grows past the limit. What was read is
+        put back in the request, where request.form and request.get_json look for it."""
+        body = quart.request.body
+        received = bytearray()
+        async for chunk in body:
+            received.extend(chunk)
+            if len(received) > self.max_size:
+                raise RequestTooLarge(f"Request body is larger than what is permitted here ({self.max_size} bytes)!")
+        body.append(bytes(received))
+
+    async def read(self) -> dict:
+        """Collects the raw values of the declared fields from the declared sources, later sources winning.
+        The request body is only read if the form takes form data or JSON, and the request has that."""
+        request = quart.request
+        raw: dict = {}
+        if "args" in self.sources:
+            args = request.args
+            for name in self.fields:
+                if name in args:
+                    raw[name] = args[name] if self.fields[name].kind is not list else args.getlist(name)
+        if not self.reads_body:
+            return raw
+        content_type = request.mimetype
+        is_form = "form" in self.sources and content_type in FORM_CONTENT_TYPES
+        is_json = "json" in self.sources and request.is_json
+        if not (is_form or is_json):
+            return raw
+        if request.content_length is None:  # Chunked, so we only know once we have counted
+            await self.buffer_body()
+        elif request.content_length > self.max_size:
+            raise RequestTooLarge(
+                f"Request content length ({request.content_length} bytes) is larger than what is permitted here ({self.max_size} bytes)!"
+            )
+        if is_form:
+            form = await request.form
+            for name in self.fields:
+                if name in form:
+                    raw[name] = form[name] if self.fields[name].kind is not list else form.getlist(name)
+        if is_json:
+            body = await request.get_json(silent=True)
+            assert isinstance(body, dict), "The request body must be a JSON object"
+            for name in self.fields:
+                if name in body:
+                    raw[name] = body[name]
+        return raw
+
+    def validate(self, raw: dict) -> dict:
+        """Returns the validated fields (all of them, with defaults for those not given) of a dict of
+        raw values, or raises AssertionError. For forms nested in a JSON body, say."""
+        return {name: field.validate(name, raw.get(name, MISSING)) for name, field in self.fields.items()}
+
+    async def parse(self) -> dict:
+        """Returns the validated fields of the current request, or raises AssertionError (or RequestTooLarge)"""
+        return self.validate(await self.read())
+
+
+def accepts(form: Form):
+    """Decorator parsing and validating a form before calling the endpoint, which gets the values as its
+    first argument. Invalid input gets the usual {"success": False, "message": ...} response, oversized
+    bodies a 413, without being buffered."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def form_wrapper(*args, **kwargs):
+            try:
+                form_data = await form.parse()
+            except RequestTooLarge as e:
+                async for _data in quart.request.body:  # Drain what is sent, so the proxy does not see a broken connection
+                    pass
+                return quart.Response(status=413, response=str(e))
+            except AssertionError as e:
+                return {"success": False, "message": str(e)}
+            return await func(form_data, *args, **kwargs)
+
+        return form_wrapper
+
+    return decorator
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Progress of long-running jobs (bulk operations run as background tasks). A job is a list of items,
+each of which is pending, running, ok or failed. Every change is written to the shared state, so the
+progress can be read from any worker, not just the one running the job. Jobs are forgotten a while after
+they were last updated."""
+
+import secrets
+import time
+import traceback
+import typing
+
+DEFAULT_MAX_AGE = 7 * 86400  # Seconds to keep jobs around after their last update
+ITEM_STATUSES = ("pending", "running", "ok", "failed")
+INTERNAL_ERROR = "Failed due to an internal server error."
+
+
+class Job:
+    def __init__(self, tracker: "JobTracker", kind: str, owner: str, items: typing.Sequence[str]):
+        self.tracker = tracker
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.owner = owner
+        self.created = int(time.time())
+        self.finished: typing.Optional[int] = None
+        self.items: typing.Dict[str, dict] = {item: {"status": "pending", "message": ""} for item in items}
+        self.started: typing.Dict[str, float] = {}
+
+    def start(self, item: str):
+        self.items[item]["status"] = "running"
+        self.started[item] = time.perf_counter()
+        self.publish()
+
+    def finish(self, item: str, status: str = "ok", message: str = ""):
+        assert status in ITEM_STATUSES, f"Invalid job item status {status}"
+        duration = time.perf_counter() - self.started.pop(item, time.perf_counter())
+        self.items[item] = {"status": status, "message": message, "duration_ms": round(duration * 1000, 1)}
+        self.publish()
+
+    async def run(self, item: str, func: typing.Callable[..., typing.Awaitable], *args, **kwargs):
+        """Runs func(*args, **kwargs) as the work for an item. The item fails if it raises AssertionError
+        (with its message) or any other exception (which is logged, as it should not happen)."""
+        self.start(item)
+        try:
+            await func(*args, **kwargs)
+            self.finish(item, "ok")
+        except AssertionError as e:
+            self.finish(item, "failed", str(e))
+        except Exception:  # Must not leave the job hanging
+            traceback.print_exc()
+            self.finish(item, "failed", INTERNAL_ERROR)
+
+    def complete(self):
+        self.finished = int(time.time())
+        self.publish()
+
+    def counts(self) -> typing.Dict[str, int]:
+        counts = dict.fromkeys(ITEM_STATUSES, 0)
+        for entry in self.items.values():
+            counts[entry["status"]] += 1
+        return counts
+
+    def items_with(self, status: str) -> typing.List[str]:
+        return [item for item, entry in self.items.items() if entry["status"] == status]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "owner": self.owner,
+            "created": self.created,
+            "finished": self.finished,
+            "status": "done" if self.finished else "running",
+            "total": len(self.items),
+            "counts": self.counts(),
+            "items": self.items,
+        }
+
+    def publish(self):
+        self.tracker.state.publish(self.tracker.prefix + self.id, self.to_dict())
+
+
+class JobTracker:
+    """Jobs, kept in a sharedstate.SharedState under the given name"""
+
+    def __init__(self, state, name: str = "jobs", max_age: int = DEFAULT_MAX_AGE):
+        self.state = state
+        self.prefix = f"{name}:"
+        self.max_age = max_age
+
+    def create(self, kind: str, owner: str, items: typing.Sequence[str]) -> Job:
+        job = Job(self, kind, owner, items)
+        job.publish()
+        return job
+
+    def get(self, job_id: str) -> typing.Optional[dict]:
+        return self.state.read(self.prefix + job_id)
+
+    def recent(self, kind: typing.Optional[str] = None) -> typing.List[dict]:
+        """All jobs (of a kind) that have not expired yet, newest first. Expired jobs are removed."""
+        jobs = self.state.collect(self.prefix, self.max_age).values()
+        return sorted((job for job in jobs if kind is None or job["kind"] == kind), key=lambda job: job["created"], reverse=True)
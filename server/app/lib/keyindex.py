@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Which Jira project keys and Confluence space keys are taken. Creating a project or space through ACLI
+only finds out that the key exists after starting a JVM; the index answers right away, and suggests free
+keys to use instead. One worker loads the keys from the database (periodically, and the index is added to
+on every successful create), and all workers pick them up through a sharedstate.SharedState. Until the
+keys have been loaded, whether a key is available is unknown, and it is up to the create action to tell."""
+
+import re
+import time
+import typing
+
+DEFAULT_REFRESH_INTERVAL = 3600  # Seconds between reloads of the keys from the database
+DEFAULT_SUGGESTIONS = 5
+MAX_KEY_LENGTH = 10  # Jira's default limit. Confluence allows longer keys, but nobody wants to type those.
+NOISE_WORDS = frozenset(("APACHE", "THE", "FOR", "OF", "AND", "PROJECT"))
+
+
+class KeyIndex:
+    def __init__(self, state, name: str):
+        self.state = state
+        self.name = name
+        self.keys: typing.FrozenSet[str] = frozenset()
+        self.updated: typing.Optional[int] = None  # When the keys were loaded, None until then
+
+    def load(self, value: dict):
+        self.keys = frozenset(value["keys"])
+        self.updated = value["updated"]
+
+    def replace(self, keys: typing.Iterable[str], now: typing.Optional[float] = None):
+        """Sets the keys in use (all of them), for all workers"""
+        value = {"keys": sorted({key.upper() for key in keys}), "updated": int(time.time() if now is None else now)}
+        self.load(value)
+        self.state.publish(self.name, value)
+
+    def add(self, key: str):
+        """Marks a key as taken, once it has been created"""
+        self.sync()
+        if self.updated is not None:
+            self.replace(self.keys | {key.upper()}, self.updated)
+
+    def sync(self):
+        """Picks up the keys, if they were changed by another worker"""
+        changed, value = self.state.read_if_changed(self.name)
+        if changed:
+            self.load(value)
+
+    async def follow(self):
+        self.sync()
+
+    def available(self, key: str) -> typing.Optional[bool]:
+        """Whether a key is free, or None if the keys have not been loaded (yet)"""
+        self.sync()
+        if self.updated is None:
+            return None
+        return key.upper() not in self.keys
+
+    def suggest(self, name: str, count: int = DEFAULT_SUGGESTIONS, max_length: int = MAX_KEY_LENGTH) -> typing.List[str]:
+        """Free keys based on a (project) name: the name itself, its first word, its initials, shorter
+        versions of the name, and finally the name with a number"""
+        words = [word for word in re.findall(r"[A-Z0-9]+", name.upper()) if word not in NOISE_WORDS]
+        if not words or self.updated is None:
+            return []
+        joined = "".join(words)
+        candidates = [joined, words[0]]
+        if len(words) > 1:
+            candidates.append("".join(word[0] for word in words))
+        candidates.extend(joined[:length] for length in range(min(len(joined), max_length), 1, -1))
+        candidates.extend(f"{joined[:max_length - 1]}{number}" for number in range(2, 10))
+        suggestions: typing.List[str] = []
+        for candidate in candidates:
+            candidate = candidate[:max_length]
+            if len(candidate) > 1 and candidate[0].isalpha() and candidate not in self.keys and candidate not in suggestions:
+                suggestions.append(candidate)
+                if len(suggestions) == count:
+                    break
+        return suggestions
+
+    def unavailable_message(self, what: str, key: str, name: str) -> str:
+        """The error message for a key that is taken, with suggestions for free keys based on the name"""
+        suggestions = self.suggest(name or key)
+        message = f"{what} with the key {key} already exists."
+        if suggestions:
+            message += f" These keys are free: {', '.join(suggestions)}"
+        return message
+
+    def check(self, key: str, name: str) -> dict:
+        """The response of the key availability endpoints"""
+        return {
+            "success": True,
+            "key": key.upper(),
+            "available": self.available(key) if key else None,
+            "suggestions": self.suggest(name or key),
+        }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+"""Incremental discovery of project groups (and their PMC/committer counts) over a persistent LDAP connection"""
+
+import asyncio
+import contextlib
+import threading
+import time
+import typing
+
+import asfpy.aioldap
+
+PAGE_SIZE = 500  # Entries per page in paged searches
+FULL_RESYNC_INTERVAL = 86400  # Do a full pass once a day, in case anything slipped past the incremental ones
+MIN_PROJECTS = 100  # If LDAP returns fewer project groups than this, something is wrong, keep what we have
+GROUP_ATTRIBUTES = ["cn", "member", "owner", "modifyTimestamp"]
+
+
+class PagedLDAPConnection(asfpy.aioldap.ASF_LDAPConnection):
+    """An aioldap connection that can do filtered, paged, one-level searches. The bonsai connection is not
+    thread-safe, and the client's executor has several threads, so it is only used while holding `busy`."""
+
+    def __init__(self, client, executor):
+        self.busy = threading.Lock()
+        super().__init__(client, executor)
+
+    async def paged_search(self, base: str, filter_exp: str, attrs: list, page_size: int = PAGE_SIZE, loop=None):
+        async def collect_pages():
+            with self.busy:
+                entries = []
+                async for entry in await self.conn.paged_search(
+                    base, asfpy.aioldap.SCOPE.ONELEVEL, filter_exp, attrlist=attrs, page_size=page_size
+                ):
+                    entries.append(entry)
+                return entries
+
+        return await self.use_loop(loop, collect_pages)
+
+    def close(self):
+        with self.busy:  # Blocks until a search still running in another executor thread is done
+            super().close()
+
+
+class PagedLDAPClient(asfpy.aioldap.ASF_LDAPClient):
+    CONNECTION_CLASS = PagedLDAPConnection
+
+
+def first(entry, attr: str, default=None):
+    values = entry.get(attr)
+    return values[0] if values else default
+
+
+class ProjectDirectory:
+    """The project groups under `base`, with the number of committers (member) and PMC members (owner)
+    in each. The first refresh (and one a day after that) reads everything. The others list only the cn
+    of each group, to pick up new and removed projects, and fetch members and owners only for the groups
+    whose modifyTimestamp is at or after the newest one we have already seen."""
+
+    def __init__(self, uri: str, binddn: str, bindpw: str, base: str):
+        self.client = PagedLDAPClient(uri, binddn, bindpw)
+        self.base = base
+        self.conn = None
+        self.stack: typing.Optional[contextlib.AsyncExitStack] = None  # Holds the connection until it is closed
+        self.closing: typing.Optional[asyncio.Future] = None
+        self.groups: typing.Dict[str, dict] = {}  # cn -> {"committers": n, "pmc": n}
+        self.watermark = ""  # Newest modifyTimestamp seen, in LDAP GeneralizedTime (sorts as a string)
+        self.last_full = 0.0
+
+    async def search(self, filter_exp: str, attrs: list):
+        """Searches on the persistent connection, (re)connecting as needed"""
+        if self.conn is None:
+            stack = contextlib.AsyncExitStack()
+            self.conn = await stack.enter_async_context(self.client.connect())
+            self.stack = stack  # The connection stays open between refreshes
+        try:
+            return await self.conn.paged_search(self.base, filter_exp, attrs)
+        except BaseException:  # Including timeouts: start over on a new connection next time
+            self.closing = self.close()
+            raise
+
+    def close(self) -> typing.Optional[asyncio.Future]:
+        """Closes the connection, if open, returning the future of that. A search that timed out here may
+        still be running on the connection in an executor thread, so it is closed in the executor as well,
+        once that search is done. Errors while closing are not worth more than a line in the log."""
+        stack, self.stack, self.conn = self.stack, None, None
+        if stack is None:
+            return None
+
+        def close_connection():
+            try:
+                asyncio.run(stack.aclose())
+            except Exception as e:
+                print(f"Could not close the LDAP connection cleanly: {e}")
+
+        return asyncio.get_running_loop().run_in_executor(self.client.executor, close_connection)
+
+    def apply(self, names: typing.Iterable[str], entries: list, full: bool) -> bool:
+        """Merges a listing of group names and a set of (changed) group entries into what we know.
+        Returns True if anything changed."""
+        names = set(names)
+        assert len(names) >= MIN_PROJECTS, f"Only {len(names)} project groups found in LDAP, keeping the current list"
+        groups = {} if full else {cn: counts for cn, counts in self.groups.items() if cn in names}
+        watermark = "" if full else self.watermark
+        for entry in entries:
+            cn = first(entry, "cn")
+            if cn not in names:  # Removed again since the listing
+                continue
+            groups[cn] = {"committers": len(entry.get("member") or []), "pmc": len(entry.get("owner") or [])}
+            watermark = max(watermark, str(first(entry, "modifyTimestamp", "")))
+        for cn in names.difference(groups):  # Not seen in full yet, counts are filled in by the next full pass
+            groups[cn] = {"committers": 0, "pmc": 0}
+        changed = groups != self.groups
+        self.groups = groups
+        self.watermark = watermark
+        return changed
+
+    async def refresh(self) -> bool:
+        """Refreshes the list of project groups, returning True if anything changed"""
+        now = time.time()
+        if not self.watermark or now - self.last_full > FULL_RESYNC_INTERVAL:
+            entries = await self.search("(cn=*)", GROUP_ATTRIBUTES)
+            changed = self.apply((first(entry, "cn") for entry in entries), entries, full=True)
+            self.last_full = now
+            return changed
+        names = [first(entry, "cn") for entry in await self.search("(cn=*)", ["cn"])]
+        entries = await self.search(f"(&(cn=*)(modifyTimestamp>={self.watermark}))", GROUP_ATTRIBUTES)
+        return self.apply(names, entries, full=False)
@@ -19,26 +19,29 @@
 """generic logging for the portal"""
 
 import asfpy.syslog
-import aiohttp
-from . import config
+from . import config, metrics, slackqueue
 
 log = asfpy.syslog.Printer(stdout=True, identity="selfserve-platform")
 
+# Posts to #asfinfra in slack, in the background. Configured when its task is started (by app.main)
+SLACK = slackqueue.SlackDispatcher(
+    on_post=lambda elapsed, result: metrics.SLACK_DURATION.observe(elapsed, result),
+    on_queue=metrics.SLACK_QUEUE_DEPTH.set,
+    on_drop=metrics.SLACK_DROPPED.inc,
+)
 
-async def slack(message: str):
-    """Logs a message to #asfinfra in slack"""
-    # Incoming webhook style
-    if config.messaging.slack_url:
-        async with aiohttp.ClientSession() as client:
-            await client.post(config.messaging.slack_url, json={"text": message})
-    # Token style
-    elif config.messaging.slack_token and config.messaging.slack_channel:
-        async with aiohttp.ClientSession() as client:
-            resp = await client.post(
-                "https://slack.com/api/chat.postMessage",
-                headers={"Authorization": f"Bearer {config.messaging.slack_token}"},
-                json={"channel": config.messaging.slack_channel, "text": message},
-            )
-    # Nothing defined? just print
-    else:
-        print(message)
+
+def slack(message: str):
+    """Logs a message to #asfinfra in slack. The message is queued, so this returns right away.
+    If nothing is configured, it is printed instead."""
+    SLACK.enqueue(message)
+
+
+async def slack_dispatcher():
+    """Background task posting the queued slack messages"""
+    SLACK.url = config.messaging.slack_url  # Incoming webhook style
+    SLACK.token = config.messaging.slack_token  # Token style
+    SLACK.channel = config.messaging.slack_channel
+    SLACK.window = config.messaging.slack_window
+    SLACK.timeout = config.messaging.slack_timeout
+    await SLACK.run()
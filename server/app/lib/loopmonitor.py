@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Finding blocking code on the event loop: a monitor measuring how late the loop runs a periodic callback
+(scheduling lag), with a watchdog thread that dumps the stack of the loop thread while it is stuck, and a
+sampling profiler producing collapsed stacks, which flamegraph.pl, speedscope and the like can render."""
+
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+import typing
+
+DEFAULT_INTERVAL = 0.1  # Seconds between checks of the loop
+DEFAULT_THRESHOLD = 0.25  # Seconds the loop may be blocked before its stack is dumped
+DEFAULT_SAMPLE_INTERVAL = 0.005
+MAX_SAMPLE_DURATION = 60
+
+
+def print_stall(blocked: float, stack: str):
+    print(f"Event loop blocked for more than {blocked * 1000:.0f} ms, currently at:\n{stack}", flush=True)
+
+
+class LoopMonitor:
+    """Runs as a task on the loop it monitors. `on_lag` is called with the scheduling lag (in seconds)
+    of every check, `on_stall` with how long the loop has been blocked and the stack of the loop thread,
+    once per stall, from the watchdog thread, while the loop is still blocked."""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        threshold: float = DEFAULT_THRESHOLD,
+        on_lag: typing.Optional[typing.Callable[[float], None]] = None,
+        on_stall: typing.Callable[[float, str], None] = print_stall,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.on_stall = on_stall
+        self.heartbeat = time.monotonic()
+        self.thread_id: typing.Optional[int] = None
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    def watchdog(self):
+        reported = None  # The heartbeat of the stall we have already reported
+        while self.thread_id is not None:
+            time.sleep(self.interval)
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat
+            if blocked > self.threshold + self.interval and reported != heartbeat:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    reported = heartbeat
+                    self.stalls += 1
+                    self.on_stall(blocked, "".join(traceback.format_stack(frame)))
+
+    async def run(self):
+        self.thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        threading.Thread(target=self.watchdog, name="loop-watchdog", daemon=True).start()
+        try:
+            while True:
+                start = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self.heartbeat = time.monotonic()
+                lag = max(0.0, self.heartbeat - start - self.interval)
+                self.max_lag = max(self.max_lag, lag)
+                if self.on_lag is not None:
+                    self.on_lag(lag)
+        finally:
+            self.thread_id = None  # Stops the watchdog
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.split(os.sep)
+    return f"{code.co_name} ({'/'.join(path[-2:])})"
+
+
+def collapsed_stack(frame) -> str:
+    """The stack of a frame as semicolon-separated function names, outermost first"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample(thread_id: int, duration: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> typing.Counter[str]:
+    """Samples the stack of a thread every `interval` seconds for `duration` seconds. Blocking, so
+    call it from another thread (asyncio.to_thread) to profile the event loop."""
+    assert thread_id != threading.get_ident(), "A thread cannot sample itself"
+    stacks: typing.Counter[str] = collections.Counter()
+    deadline = time.monotonic() + min(duration, MAX_SAMPLE_DURATION)
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:  # The thread has gone
+            break
+        stacks[collapsed_stack(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+def render_collapsed(stacks: typing.Counter[str]) -> str:
+    """Renders sampled stacks in the collapsed format: one "stack count" line per distinct stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Counters, gauges and histograms, rendered in the Prometheus text exposition format.
+Label values are passed positionally, in the order of the metric's label names, and kept as tuple keys,
+so recording an event is a dict lookup and an addition or two."""
+
+import bisect
+import inspect
+import time
+import typing
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Timer:
+    """Context manager observing the time spent in its block (in seconds) in a histogram"""
+
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram: "Histogram", labelvalues: tuple):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+
+class Refresh:
+    """Context manager for one pass of a background refresh: times it, and counts it as failed if
+    it raises, or if failed() is called. Otherwise, it records when the source last refreshed successfully."""
+
+    __slots__ = ("source", "start", "ok")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.ok = True
+
+    def failed(self):
+        self.ok = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        REFRESH_DURATION.observe(time.perf_counter() - self.start, self.source)
+        if exc_type is None and self.ok:
+            REFRESH_LAST_SUCCESS.set(time.time(), self.source)
+        else:
+            REFRESH_FAILURES.inc(self.source)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), aggregate: str = "sum"):
+        assert aggregate in ("sum", "max"), "Metrics from different workers are either added up or the maximum is used"
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.aggregate = aggregate
+        self.series: dict = {}  # label values -> value
+
+    def dump(self) -> dict:
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labels": self.labelnames,
+            "aggregate": self.aggregate,
+            "series": [[list(labelvalues), value] for labelvalues, value in self.series.items()],
+        }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        self.series[labelvalues] = value
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.series[labelvalues] = self.series.get(labelvalues, 0) - amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            # Per-bucket (not yet cumulative) counts, with a final +Inf bucket, then the sum of observations
+            series = self.series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labelvalues) -> Timer:
+        return Timer(self, labelvalues)
+
+    def dump(self) -> dict:
+        dumped = super().dump()
+        dumped["buckets"] = self.buckets
+        return dumped
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: typing.Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        assert metric.name not in self.metrics, f"Metric {metric.name} is already registered"
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), aggregate: str = "sum") -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name: str, documentation: str, labelnames: typing.Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def dump(self) -> dict:
+        """All metrics as a JSON-serializable dict, for merging with the metrics of other workers"""
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+
+def merge(dumps: typing.Iterable[dict]) -> dict:
+    """Combines the dumped metrics of several workers, adding them up (or taking the highest value, for
+    gauges such as timestamps)"""
+    merged: dict = {}
+    for dump in dumps:
+        for name, metric in dump.items():
+            target = merged.setdefault(name, {**metric, "series": {}})
+            for labelvalues, value in metric["series"]:
+                key = tuple(labelvalues)
+                if key not in target["series"]:
+                    target["series"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["series"][key] = [a + b for a, b in zip(target["series"][key], value)]
+                elif metric.get("aggregate") == "max":
+                    target["series"][key] = max(target["series"][key], value)
+                else:
+                    target["series"][key] += value
+    for metric in merged.values():
+        metric["series"] = [[list(key), value] for key, value in metric["series"].items()]
+    return merged
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: typing.Sequence[str], values: typing.Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(dump: dict) -> str:
+    """Renders dumped metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name, metric in sorted(dump.items()):
+        lines.append(f"# HELP {name} {escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labelvalues, value in sorted(metric["series"], key=lambda series: series[0]):
+            if metric["kind"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[:-1]):
+                    cumulative += count
+                    labels = format_labels(metric["labels"], labelvalues, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = format_labels(metric["labels"], labelvalues)
+                lines.append(f"{name}_sum{labels} {value[-1]}")
+                lines.append(f"{name}_count{labels} {cumulative}")
+            else:
+                lines.append(f"{name}{format_labels(metric['labels'], labelvalues)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class InstrumentedDB:
+    """Wraps an asfpy.sqlite database, timing every call (and the full iteration of fetch results).
+    If given, `record` is also called with ("sqlite", seconds, db=name, call=method) for each of them,
+    which is how the calls end up as spans in request traces."""
+
+    def __init__(self, db, name: str, histogram: Histogram, record: typing.Optional[typing.Callable] = None):
+        self.db = db
+        self.name = name
+        self.histogram = histogram
+        self.record = record
+
+    def observe(self, elapsed: float, call: str):
+        self.histogram.observe(elapsed, self.name, call)
+        if self.record is not None:
+            self.record("sqlite", elapsed, db=self.name, call=call)
+
+    def fetch(self, table: str, limit: int = 1, **params):
+        rows = self.db.fetch(table, limit=limit, **params)
+        elapsed = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield row
+        self.observe(elapsed, "fetch")
+
+    def query(self, statement: str, *args) -> typing.List[dict]:
+        """Runs a SELECT statement, returning all rows as dicts. For what asfpy.sqlite has no call for,
+        such as ranges, ordering and grouping."""
+        start = time.perf_counter()
+        try:
+            cursor = self.db.connector.execute(statement, args)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            self.observe(time.perf_counter() - start, "query")
+
+    def transaction(self, statements: typing.Sequence[typing.Tuple[str, typing.Sequence]]):
+        """Runs a list of (statement, arguments) in a single transaction: all of them, or if one fails, none"""
+        connector = self.db.connector
+        start = time.perf_counter()
+        try:
+            connector.execute("BEGIN")
+            try:
+                for statement, args in statements:
+                    connector.execute(statement, args)
+            except BaseException:
+                connector.execute("ROLLBACK")
+                raise
+            connector.execute("COMMIT")
+        finally:
+            self.observe(time.perf_counter() - start, "transaction")
+
+    def __getattr__(self, attr):
+        value = getattr(self.db, attr)
+        if not inspect.ismethod(value):  # Only calls into the database object get timed
+            return value
+
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - start, attr)
+
+        return timed_call
+
+
+# The portal's metrics
+REGISTRY = Registry()
+HTTP_REQUESTS = REGISTRY.counter("selfserve_http_requests_total", "HTTP requests served", ("endpoint", "method", "status"))
+HTTP_DURATION = REGISTRY.histogram("selfserve_http_request_duration_seconds", "Time spent serving HTTP requests", ("endpoint", "method"))
+ACLI_CALLS = REGISTRY.counter("selfserve_acli_calls_total", "ACLI invocations", ("product", "action", "result"))
+ACLI_DURATION = REGISTRY.histogram("selfserve_acli_duration_seconds", "Time spent in ACLI invocations", ("product", "action"))
+EMAILS = REGISTRY.counter("selfserve_emails_total", "Emails sent via SMTP", ("template", "result"))
+NOTIFICATIONS_DIGESTED = REGISTRY.counter(
+    "selfserve_notifications_digested_total", "Notifications put in the outbox for a digest instead of emailed", ("template",)
+)
+EMAIL_DURATION = REGISTRY.histogram("selfserve_email_duration_seconds", "Time spent sending emails via SMTP", ("template",))
+SLACK_DURATION = REGISTRY.histogram("selfserve_slack_duration_seconds", "Time spent posting messages to Slack", ("result",))
+SLACK_QUEUE_DEPTH = REGISTRY.gauge("selfserve_slack_queue_depth", "Slack messages waiting to be posted")
+SLACK_DROPPED = REGISTRY.counter("selfserve_slack_dropped_total", "Slack messages dropped because the queue was full")
+SQLITE_DURATION = REGISTRY.histogram("selfserve_sqlite_duration_seconds", "Time spent in SQLite calls", ("db", "call"))
+LOOP_LAG = REGISTRY.histogram("selfserve_event_loop_lag_seconds", "How late the event loop ran a periodic check")
+LOOP_STALLS = REGISTRY.counter("selfserve_event_loop_stalls_total", "Times the event loop was blocked for longer than the stall threshold")
+REFRESH_DURATION = REGISTRY.histogram("selfserve_refresh_duration_seconds", "Time spent in background refreshes", ("source",))
+REFRESH_FAILURES = REGISTRY.counter("selfserve_refresh_failures_total", "Failed background refreshes", ("source",))
+REFRESH_LAST_SUCCESS = REGISTRY.gauge(
+    "selfserve_refresh_last_success_timestamp_seconds", "When each background refresh last succeeded", ("source",), aggregate="max"
+)
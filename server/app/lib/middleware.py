@@ -21,13 +21,15 @@ if not __debug__:
     raise RuntimeError("This code requires assert statements to be enabled")
 
 import sys
+import time
 import traceback
 import typing
 import uuid
+import asfquart
 import quart
-from . import config
+from . import config, snapshot, ratelimit, metrics, tracing
 import werkzeug.routing
-import asyncio
+import os
 import functools
 
 async def consume_body():
@@ -82,8 +84,9 @@ def glued(func: typing.Callable) -> typing.Callable:
             # error ID for the client to report back to the admin. Every line of the traceback
             # will have this error ID at the beginning of the line, for easy grepping.
             else:
-                # We only need a short ID here, let's pick 18 chars.
-                eid = str(uuid.uuid4())[:18]
+                # Use the request ID where we have one, so the error can be matched with the request trace.
+                # Otherwise, we only need a short ID here, let's pick 18 chars.
+                eid = tracing.request_id() or str(uuid.uuid4())[:18]
                 sys.stderr.write("API Endpoint %s got into trouble (%s): \n" % (quart.request.path, eid))
                 for line in err.split("\n"):
                     sys.stderr.write("%s: %s\n" % (eid, line))
@@ -103,6 +106,61 @@ def glued(func: typing.Callable) -> typing.Callable:
     return call
 
 
+async def start_request_timer():
+    """Notes when a request started, for the request duration metrics, and starts tracing it"""
+    quart.g.request_start = time.perf_counter()
+    tracing.start(quart.request.headers.get("X-Request-ID"), f"{quart.request.method} {quart.request.path}")
+
+
+async def record_request(response):
+    """Records the duration and outcome of a request, by route (not by path, to keep the number of series bounded),
+    and adds its request ID and a summary of where the time went (Server-Timing) to the response"""
+    start = quart.g.get("request_start")
+    if start is not None:
+        rule = quart.request.url_rule
+        endpoint = rule.rule if rule else "unmatched"
+        metrics.HTTP_DURATION.observe(time.perf_counter() - start, endpoint, quart.request.method)
+        metrics.HTTP_REQUESTS.inc(endpoint, quart.request.method, str(response.status_code))
+    trace = tracing.current()
+    if trace is not None:
+        duration = trace.finish()
+        response.headers["X-Request-ID"] = trace.request_id
+        response.headers["Server-Timing"] = trace.server_timing()
+        if config.server.trace_log == "all" or (config.server.trace_log == "slow" and duration * 1000 >= config.server.trace_slow_ms):
+            tracing.log_json(trace, method=quart.request.method, path=quart.request.path, status=response.status_code)
+        if config.server.otlp_endpoint:
+            tracing.export_otlp(trace, config.server.otlp_endpoint)
+    return response
+
+
+def request_actor() -> str:
+    """Who the current request was made by, for audit logs: the user of the session cookie, or the user
+    given in the Authorization header (which the auth checks of the endpoint have verified by then).
+    Outside of requests (background tasks), this is the portal itself."""
+    if not quart.has_request_context():
+        return "system"
+    session = quart.session.get(asfquart.APP.app_id)
+    if isinstance(session, dict) and session.get("uid"):
+        return session["uid"]
+    authorization = quart.request.authorization
+    if authorization is not None:
+        if authorization.type == "basic":
+            return authorization.parameters.get("username") or "anonymous"
+        return f"{authorization.type} token"
+    return "anonymous"
+
+
+def snapshot_response(snap: snapshot.JSONSnapshot):
+    """Serves a pre-serialized JSON snapshot, answering conditional requests with a 304. Requests for a
+    specific version (?v=<etag>, as handed out by /api/bootstrap) can be cached by the browser for good."""
+    status, headers, body = snap.response(
+        if_none_match=quart.request.headers.get("If-None-Match", ""),
+        accept_encoding=quart.request.headers.get("Accept-Encoding", ""),
+        version=quart.request.args.get("v", ""),
+    )
+    return quart.Response(status=status, response=body, headers=headers)
+
+
 def auth_failed():
     """Returns the appropriate authorization failure response, depending on auth mechanism supplied."""
     if "x-artifacts-webui" not in quart.request.headers:  # Not done via Web UI, standard 401 response
@@ -126,26 +184,47 @@ class FilenameConverter(werkzeug.routing.BaseConverter):
         return filename, extension
 
 
-async def reset_rate_limits():
-    """Reset daily rate limits for lookups"""
-    while True:
-        await asyncio.sleep(86400)
-        config.rate_limits.clear()
+def rate_limit_store():
+    """Returns the backing store for rate limits, as configured"""
+    if config.server.rate_limit_store == "sqlite":  # Shared between all workers
+        return ratelimit.SQLiteStore(os.path.join(config.storage.db_dir, "ratelimits.db"))
+    return ratelimit.MemoryStore(max_keys=config.server.rate_limit_max_keys)
+
 
+RATE_LIMIT_STORE = rate_limit_store()
 
-def rate_limited(func):
+
+def rate_limited(func=None, *, limit: typing.Optional[int] = None, window: int = 86400):
     """Decorator for calls that are rate-limited for anonymous users.
-    Once the number of requests per day has been exceeded, this decorator
-    will return a 429 HTTP response to the client instead.
+    Once the number of requests per window (by default, the configured number per day) has been
+    exceeded, this decorator will return a 429 HTTP response to the client instead. Each endpoint
+    has its own policy and counters. Can be used as either @rate_limited or @rate_limited(limit=10, window=60).
     """
 
-    @functools.wraps(func)
-    async def session_wrapper(*args):
-        ip = quart.request.headers.get("X-Forwarded-For", quart.request.remote_addr).split(",")[-1].strip()
-        usage = config.rate_limits.get(ip, 0) + 1
-        if config.server.rate_limit_per_ip and usage > config.server.rate_limit_per_ip:
-            return quart.Response(status=429, response="Your request has been rate-limited. Please check back tomorrow!")
-        config.rate_limits[ip] = usage
-        print(ip, usage)
-        return await func(*args)
-    return session_wrapper
+    def decorator(func):
+        limiter = ratelimit.RateLimiter(
+            ratelimit.Policy(config.server.rate_limit_per_ip if limit is None else limit, window), RATE_LIMIT_STORE
+        )
+
+        @functools.wraps(func)
+        async def session_wrapper(*args, **kwargs):
+            if not limiter.policy.limit:  # Rate limiting disabled
+                return await func(*args, **kwargs)
+            ip = quart.request.headers.get("X-Forwarded-For", quart.request.remote_addr).split(",")[-1].strip()
+            decision = limiter.hit(f"{func.__name__}:{ip}")
+            if not decision.allowed:
+                return quart.Response(
+                    status=429,
+                    response="Your request has been rate-limited. Please check back later!",
+                    headers=decision.headers(),
+                )
+
+            @quart.after_this_request
+            def add_headers(response):
+                response.headers.update(decision.headers())
+                return response
+
+            return await func(*args, **kwargs)
+        return session_wrapper
+
+    return decorator(func) if func else decorator
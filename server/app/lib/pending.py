@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Listing the account requests awaiting review (validated by the requester, not denied) in the pending
+tables of Jira and Confluence. The tables are indexed on (project, validated, created), so the requests
+for a reviewer's projects are a range scan per project rather than a scan of the whole table. Pages are
+read with a cursor (the created timestamp and userid of the last request of the previous page) instead of
+an offset, so later pages cost no more than the first, and do not shift as requests are reviewed.
+`db` is a metrics.InstrumentedDB in all of these."""
+
+import typing
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# What reviewers get to see of a request. The token is how they act on it.
+REVIEW_KEYS = ("token", "created", "project", "userid", "realname", "userip", "why")
+
+
+def create_index(db, table: str):
+    db.runc(f"CREATE INDEX IF NOT EXISTS {table}_review ON {table} (project, validated, created)")
+
+
+def encode_cursor(entry: dict) -> str:
+    return f"{entry['created']}:{entry['userid']}"
+
+
+def decode_cursor(cursor: str) -> typing.Tuple[int, str]:
+    created, _, userid = cursor.partition(":")
+    assert created.isdigit() and userid, "Invalid cursor"
+    return int(created), userid
+
+
+def awaiting_filter(projects: typing.Optional[typing.Sequence[str]]) -> typing.Tuple[str, list]:
+    """The WHERE clause (and its arguments) for requests awaiting review, for the given projects, or all
+    projects if None"""
+    clause = "validated = 1 AND denied_ts = 0"
+    if projects is None:
+        return clause, []
+    placeholders = ", ".join("?" * len(projects))
+    return f"project IN ({placeholders}) AND {clause}", list(projects)
+
+
+def awaiting_review(
+    db,
+    table: str,
+    projects: typing.Optional[typing.Sequence[str]],
+    after: typing.Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> typing.Tuple[typing.List[dict], typing.Optional[str]]:
+    """Returns a page of requests awaiting review, oldest first, and the cursor of the next page (None
+    if this is the last one)"""
+    if projects is not None and not projects:
+        return [], None
+    assert 0 < limit <= MAX_PAGE_SIZE, f"The page size must be between 1 and {MAX_PAGE_SIZE}"
+    where, args = awaiting_filter(projects)
+    if after:
+        where += " AND (created, userid) > (?, ?)"
+        args.extend(decode_cursor(after))
+    rows = db.query(
+        f"SELECT {', '.join(REVIEW_KEYS)} FROM {table} WHERE {where} ORDER BY created, userid LIMIT ?", *args, limit + 1
+    )
+    if len(rows) > limit:  # There is at least one more page
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def counts(db, table: str, projects: typing.Optional[typing.Sequence[str]]) -> typing.Dict[str, int]:
+    """The number of requests awaiting review, per project (only those with any)"""
+    if projects is not None and not projects:
+        return {}
+    where, args = awaiting_filter(projects)
+    rows = db.query(f"SELECT project, COUNT(*) AS requests FROM {table} WHERE {where} GROUP BY project", *args)
+    return {row["project"]: row["requests"] for row in rows}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Provisioning workflows: a set of steps (coroutine functions, typically ACLI calls) with dependencies
+between them. Steps run as soon as the steps they depend on have succeeded, at most `concurrency` at a
+time, as each ACLI call is a JVM of its own:
+
+    workflow = provisioning.Workflow("default access for FOO")
+    workflow.step("admin", add_permissions, "FOO", "@all", user="humbedooh")
+    workflow.step("anonymous", add_permissions, "FOO", "VIEWSPACE", user="Anonymous")
+    workflow.step("infrabot", remove_permissions, "FOO", "@all", user="infrabot", after=("admin", "anonymous"))
+    result = await workflow.run()
+
+A step fails by raising AssertionError, as the rest of the portal does. That does not stop the steps
+that do not depend on it, and the outcome of every step ends up in the result, with its timing.
+Any other exception is a bug: the remaining steps are cancelled, and it is raised as usual."""
+
+import asyncio
+import json
+import time
+import typing
+
+DEFAULT_CONCURRENCY = 4
+
+
+class StepResult(typing.NamedTuple):
+    name: str
+    status: str  # ok, failed, or skipped (because a step it depends on did not succeed)
+    duration: float  # Seconds, not counting the wait for dependencies or a free slot
+    error: str = ""
+
+
+class Result(typing.NamedTuple):
+    name: str
+    steps: typing.List[StepResult]
+    duration: float
+
+    @property
+    def success(self) -> bool:
+        return all(step.status == "ok" for step in self.steps)
+
+    @property
+    def message(self) -> str:
+        """The errors of the failed steps, in the order the steps were declared"""
+        errors = []
+        for step in self.steps:
+            if step.status == "failed" and step.error not in errors:
+                errors.append(step.error)
+        return " ".join(errors)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "success": self.success,
+            "duration_ms": round(self.duration * 1000, 1),
+            "steps": [
+                {"name": step.name, "status": step.status, "duration_ms": round(step.duration * 1000, 1), "error": step.error}
+                for step in self.steps
+            ],
+        }
+
+
+class Step(typing.NamedTuple):
+    name: str
+    func: typing.Callable[..., typing.Awaitable]
+    args: tuple
+    kwargs: dict
+    after: typing.Tuple[str, ...]
+
+
+class Workflow:
+    def __init__(self, name: str, concurrency: int = DEFAULT_CONCURRENCY):
+        assert concurrency > 0, "Concurrency must be at least 1"
+        self.name = name
+        self.concurrency = concurrency
+        self.steps: typing.Dict[str, Step] = {}
+
+    def step(self, name: str, func: typing.Callable[..., typing.Awaitable], *args, after: typing.Sequence[str] = (), **kwargs):
+        """Adds a step, calling func(*args, **kwargs) once the steps named in `after` have succeeded.
+        Dependencies must be declared before the steps depending on them, which rules out cycles."""
+        assert name not in self.steps, f"Step {name} is already part of {self.name}"
+        for dependency in after:
+            assert dependency in self.steps, f"Step {name} depends on unknown step {dependency}"
+        self.steps[name] = Step(name, func, args, kwargs, tuple(after))
+
+    async def run(self) -> Result:
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: typing.Dict[str, StepResult] = {}
+        tasks: typing.Dict[str, asyncio.Task] = {}
+
+        async def execute(step: Step):
+            if step.after:
+                await asyncio.gather(*(tasks[dependency] for dependency in step.after))
+                if any(results[dependency].status != "ok" for dependency in step.after):
+                    results[step.name] = StepResult(step.name, "skipped", 0.0)
+                    return
+            async with semaphore:
+                step_start = time.perf_counter()
+                try:
+                    await step.func(*step.args, **step.kwargs)
+                    results[step.name] = StepResult(step.name, "ok", time.perf_counter() - step_start)
+                except AssertionError as e:
+                    results[step.name] = StepResult(step.name, "failed", time.perf_counter() - step_start, str(e))
+
+        for step in self.steps.values():
+            tasks[step.name] = asyncio.create_task(execute(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        result = Result(self.name, [results[name] for name in self.steps], time.perf_counter() - start)
+        if not result.success:
+            print(f"Provisioning workflow failed: {json.dumps(result.to_dict())}")
+        return result
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Sliding-window rate limiting with bounded memory, optionally shared between processes via sqlite"""
+
+import collections
+import math
+import sqlite3
+import time
+import typing
+
+DEFAULT_MAX_KEYS = 100_000  # Max number of clients tracked in memory before the least recently seen are evicted
+
+SQLITE_CREATE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS ratelimits (
+     key text PRIMARY KEY,
+     window integer NOT NULL,
+     prev integer NOT NULL,
+     curr integer NOT NULL,
+     updated integer NOT NULL
+    );
+"""
+
+
+class Decision(typing.NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int  # Seconds until the current window ends
+    retry_after: int  # Seconds until a new request would be allowed (0 if allowed)
+
+    def headers(self) -> dict:
+        """Standard RateLimit-* (and Retry-After) headers for this decision"""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def roll(entry: typing.Optional[tuple], window_index: int) -> typing.Tuple[int, int]:
+    """Given a stored (window_index, previous_count, current_count) entry, returns the (previous, current)
+    counts as seen from the window we are in now."""
+    if entry is None:
+        return 0, 0
+    stored_index, prev, curr = entry
+    if stored_index == window_index:
+        return prev, curr
+    if stored_index == window_index - 1:
+        return curr, 0
+    return 0, 0  # Idle for more than a full window, nothing carries over
+
+
+class Policy:
+    """A sliding-window policy: at most `limit` requests per `window` seconds. The sliding window is
+    approximated by weighting the previous fixed window's count by how much of it still overlaps,
+    which avoids the 2x burst that fixed windows allow across a reset boundary."""
+
+    def __init__(self, limit: int, window: int = 86400):
+        assert limit >= 0 and window > 0, "Rate limit policies need a non-negative limit and a positive window"
+        self.limit = limit
+        self.window = window
+
+    def decide(self, prev: int, curr: int, now: float) -> Decision:
+        window_index = int(now // self.window)
+        elapsed = now - window_index * self.window
+        weight = 1 - elapsed / self.window
+        estimate = prev * weight + curr
+        reset = math.ceil(self.window - elapsed)
+        if estimate + 1 <= self.limit:
+            return Decision(True, self.limit, int(self.limit - estimate - 1), reset, 0)
+        # How long until the weighted count has decayed enough to allow one more request?
+        if curr + 1 <= self.limit:  # Within this window, once enough of the previous window slides out
+            retry_after = math.ceil((estimate + 1 - self.limit) / prev * self.window)
+        elif self.limit and curr:  # Into the next window, once enough of this window slides out
+            retry_after = reset + math.ceil((curr + 1 - self.limit) / curr * self.window)
+        else:  # A limit of zero never allows anything, just point at the next window
+            retry_after = reset
+        return Decision(False, self.limit, 0, reset, max(1, retry_after))
+
+
+class MemoryStore:
+    """Per-process counters, kept in LRU order and capped at `max_keys` entries."""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.entries: collections.OrderedDict = collections.OrderedDict()
+
+    def hit(self, key: str, policy: Policy, now: float) -> Decision:
+        window_index = int(now // policy.window)
+        prev, curr = roll(self.entries.get(key), window_index)
+        decision = policy.decide(prev, curr, now)
+        if decision.allowed:
+            curr += 1
+        self.entries[key] = (window_index, prev, curr)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_keys:
+            self.entries.popitem(last=False)  # Evict the client we have not seen for the longest time
+        return decision
+
+    def clear(self):
+        self.entries.clear()
+
+
+class SQLiteStore:
+    """Counters shared by all processes using the same sqlite file (e.g. multiple hypercorn workers)."""
+
+    def __init__(self, filepath: str, max_age: int = 2 * 86400):
+        self.filepath = filepath
+        self.max_age = max_age
+        self.connector = sqlite3.connect(filepath, isolation_level=None, timeout=5)
+        self.connector.execute("PRAGMA journal_mode=WAL")
+        self.connector.execute(SQLITE_CREATE_STATEMENT)
+        self.last_purge = 0.0
+
+    def hit(self, key: str, policy: Policy, now: float) -> Decision:
+        window_index = int(now // policy.window)
+        cursor = self.connector.cursor()
+        cursor.execute("BEGIN IMMEDIATE")  # Serialize read-modify-write across processes
+        try:
+            row = cursor.execute("SELECT window, prev, curr FROM ratelimits WHERE key = ?", (key,)).fetchone()
+            prev, curr = roll(row, window_index)
+            decision = policy.decide(prev, curr, now)
+            if decision.allowed:
+                curr += 1
+            cursor.execute(
+                "INSERT OR REPLACE INTO ratelimits (key, window, prev, curr, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, window_index, prev, curr, int(now)),
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        if now - self.last_purge > 3600:
+            self.purge(now)
+        return decision
+
+    def purge(self, now: float):
+        """Removes entries that have been idle for longer than max_age seconds"""
+        self.last_purge = now
+        self.connector.execute("DELETE FROM ratelimits WHERE updated < ?", (int(now - self.max_age),))
+
+    def clear(self):
+        self.connector.execute("DELETE FROM ratelimits")
+
+
+class RateLimiter:
+    """Applies a policy to a store"""
+
+    def __init__(self, policy: Policy, store=None):
+        self.policy = policy
+        self.store = store if store is not None else MemoryStore()
+
+    def hit(self, key: str, now: typing.Optional[float] = None) -> Decision:
+        return self.store.hit(key, self.policy, time.time() if now is None else now)
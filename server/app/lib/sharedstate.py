@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""State shared between worker processes: a sqlite-backed store, and leader election for background tasks"""
+
+import asyncio
+import fcntl
+import json
+import os
+import sqlite3
+import time
+import typing
+
+SHARED_CREATE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS shared (
+     key text PRIMARY KEY,
+     value text NOT NULL,
+     version integer NOT NULL,
+     updated integer NOT NULL
+    );
+"""
+
+FOLLOWER_INTERVAL = 30  # How often followers pick up new results (and check whether the leader is gone)
+
+
+class SharedState:
+    """A small key/value store in sqlite, which all workers on the host read from and write to.
+    Values are JSON documents, each with a version number that is bumped on every write, so readers
+    can cheaply tell whether they need to decode it again."""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.lockdir = os.path.dirname(filepath)
+        self.connector = sqlite3.connect(filepath, isolation_level=None, timeout=5)
+        self.connector.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer, and vice versa
+        self.connector.execute(SHARED_CREATE_STATEMENT)
+        self.versions: typing.Dict[str, int] = {}  # The last version of each key seen by this process
+
+    def publish(self, key: str, value):
+        """Writes a value for all workers to see"""
+        self.connector.execute(
+            "INSERT INTO shared (key, value, version, updated) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = version + 1, updated = excluded.updated",
+            (key, json.dumps(value), int(time.time())),
+        )
+
+    def read(self, key: str, default=None):
+        """Reads the current value of a key"""
+        row = self.connector.execute("SELECT value FROM shared WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def read_if_changed(self, key: str):
+        """Returns (True, value) if the key changed since this process last read it, else (False, None)"""
+        row = self.connector.execute("SELECT version FROM shared WHERE key = ?", (key,)).fetchone()
+        if not row or row[0] == self.versions.get(key):
+            return False, None
+        value_row = self.connector.execute("SELECT value, version FROM shared WHERE key = ?", (key,)).fetchone()
+        self.versions[key] = value_row[1]
+        return True, json.loads(value_row[0])
+
+    def delete(self, key: str):
+        self.connector.execute("DELETE FROM shared WHERE key = ?", (key,))
+
+    def collect(self, prefix: str, max_age: int) -> dict:
+        """Returns all values whose key starts with `prefix` (keyed by the rest of the key), removing
+        any that have not been written to for more than `max_age` seconds"""
+        key_range = (prefix, prefix + "\uffff")
+        self.connector.execute(
+            "DELETE FROM shared WHERE key >= ? AND key < ? AND updated < ?", (*key_range, int(time.time()) - max_age)
+        )
+        rows = self.connector.execute("SELECT key, value FROM shared WHERE key >= ? AND key < ?", key_range)
+        return {key[len(prefix):]: json.loads(value) for key, value in rows}
+
+    def leader_only(self, name: str, follow: typing.Optional[typing.Callable] = None, interval: int = FOLLOWER_INTERVAL):
+        """Decorator for background refresh loops, ensuring that only one worker on the host runs the
+        refresher. Leadership is an flock() on a file in the database directory, which the OS releases if
+        the leader dies, at which point another worker takes over. Until then, the other workers call
+        the (optional) `follow` coroutine every `interval` seconds to pick up the leader's results."""
+
+        def decorator(refresher: typing.Callable[[], typing.Awaitable]):
+            async def leader_task():
+                lockfile = open(os.path.join(self.lockdir, f"leader-{name}.lock"), "a")
+                while True:
+                    try:
+                        fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:  # Another worker is the leader
+                        if follow:
+                            try:
+                                await follow()
+                            except Exception as e:  # Never let a bad read kill the follower loop
+                                print(f"Could not pick up shared results for {name}: {e}")
+                        await asyncio.sleep(interval)
+                        continue
+                    print(f"Worker {os.getpid()} is now the leader for {name}")
+                    try:
+                        return await refresher()
+                    finally:
+                        fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+            leader_task.__name__ = refresher.__name__
+            return leader_task
+
+        return decorator
+
+
+class SharedDict:
+    """A dict-like view on a namespace of the shared store, for small state that all workers need to
+    see (such as pending confirmation tokens)."""
+
+    def __init__(self, state: SharedState, name: str):
+        self.state = state
+        self.prefix = f"{name}:"
+
+    def __contains__(self, key: str):
+        row = self.state.connector.execute("SELECT 1 FROM shared WHERE key = ?", (self.prefix + key,)).fetchone()
+        return row is not None
+
+    def __getitem__(self, key: str):
+        value = self.state.read(self.prefix + key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self.state.publish(self.prefix + key, value)
+
+    def __delitem__(self, key: str):
+        self.state.delete(self.prefix + key)
+
+    def pop(self, key: str, default=None):
+        """Atomically removes and returns a value, so that only one worker can ever claim it"""
+        cursor = self.state.connector.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            row = cursor.execute("SELECT value FROM shared WHERE key = ?", (self.prefix + key,)).fetchone()
+            cursor.execute("DELETE FROM shared WHERE key = ?", (self.prefix + key,))
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return json.loads(row[0]) if row else default
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Posting to Slack in the background. Handlers queue messages and move on; a dispatcher task waits for a
+short window after the first message of a burst, then posts everything queued as one multi-line message
+per channel, over a single pooled HTTP session, with a timeout, retrying server errors and rate limits
+(honoring Slack's Retry-After) with backoff. If Slack is down for long, the queue fills up and new
+messages are dropped (and counted) rather than piling up in memory."""
+
+import asyncio
+import time
+import typing
+
+import aiohttp
+
+SLACK_API_URL = "https://slack.com/api/chat.postMessage"
+DEFAULT_WINDOW = 2.0  # Seconds to wait for more messages after the first of a burst
+DEFAULT_TIMEOUT = 10.0  # Seconds a post may take, in all
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # Seconds before the first retry, doubled for each retry after that
+MAX_RETRY_AFTER = 60  # We will not wait longer than this, no matter what Slack asks for
+MAX_QUEUED = 1000
+MAX_POST_LENGTH = 3500  # Characters per post. Slack truncates long messages, so bigger bursts are split up.
+
+
+class SlackDispatcher:
+    """Posts either to an incoming webhook (`url`) or with a bot token to `channel`. Without either,
+    messages are printed. `on_post` is called with the duration and result (sent/failed/printed) of
+    every post, `on_queue` with the queue depth whenever it changes, and `on_drop` for every message
+    dropped because the queue is full."""
+
+    def __init__(
+        self,
+        url: typing.Optional[str] = None,
+        token: typing.Optional[str] = None,
+        channel: typing.Optional[str] = None,
+        window: float = DEFAULT_WINDOW,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_queued: int = MAX_QUEUED,
+        on_post: typing.Optional[typing.Callable[[float, str], None]] = None,
+        on_queue: typing.Optional[typing.Callable[[int], None]] = None,
+        on_drop: typing.Optional[typing.Callable[[], None]] = None,
+    ):
+        self.url = url
+        self.token = token
+        self.channel = channel
+        self.window = window
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_queued = max_queued
+        self.on_post = on_post
+        self.on_queue = on_queue
+        self.on_drop = on_drop
+        self.queue: typing.List[typing.Tuple[typing.Optional[str], str]] = []  # (channel, message)
+        self.dropped = 0
+        self.wakeup: typing.Optional[asyncio.Event] = None
+
+    def changed(self):
+        if self.on_queue is not None:
+            self.on_queue(len(self.queue))
+
+    def enqueue(self, message: str, channel: typing.Optional[str] = None):
+        """Queues a message for posting, to the given or the default channel. Never blocks."""
+        if len(self.queue) >= self.max_queued:
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop()
+            return
+        self.queue.append((channel or self.channel, message))
+        if self.wakeup is not None:
+            self.wakeup.set()
+        self.changed()
+
+    def batches(self) -> typing.List[typing.Tuple[typing.Optional[str], str]]:
+        """Takes everything queued, combined into as few posts as possible per channel, in order"""
+        per_channel: typing.Dict[typing.Optional[str], typing.List[str]] = {}
+        for channel, message in self.queue:
+            per_channel.setdefault(channel, []).append(message)
+        self.queue = []
+        self.changed()
+        posts = []
+        for channel, messages in per_channel.items():
+            text = ""
+            for message in messages:
+                if text and len(text) + len(message) + 1 > MAX_POST_LENGTH:
+                    posts.append((channel, text))
+                    text = ""
+                text = f"{text}\n{message}" if text else message
+            posts.append((channel, text))
+        return posts
+
+    async def post(self, client: aiohttp.ClientSession, channel: typing.Optional[str], text: str) -> str:
+        """Posts a message, retrying rate limits, server errors and timeouts. Returns the result."""
+        if self.url:
+            url, headers, payload = self.url, {}, {"text": text}
+        else:
+            url, headers, payload = SLACK_API_URL, {"Authorization": f"Bearer {self.token}"}, {"channel": channel, "text": text}
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2**attempt
+            try:
+                async with client.post(url, headers=headers, json=payload) as response:
+                    if response.status < 400:
+                        if self.url:
+                            return "sent"
+                        # The Web API reports most errors (bad token, unknown channel...) with a 200 and ok=false
+                        try:
+                            result = await response.json(content_type=None)
+                        except ValueError:
+                            result = {"error": "invalid JSON response"}
+                        if isinstance(result, dict) and result.get("ok"):
+                            return "sent"
+                        error = result.get("error") if isinstance(result, dict) else result
+                        print(f"Slack refused a message: {error}")
+                        return "failed"
+                    if response.status != 429 and response.status < 500:  # Our mistake, trying again will not help
+                        print(f"Slack refused a message ({response.status}): {await response.text()}")
+                        return "failed"
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = min(int(retry_after), MAX_RETRY_AFTER)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Could not post to Slack: {e!r}")
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+        return "failed"
+
+    async def send(self, client: aiohttp.ClientSession):
+        for channel, text in self.batches():
+            start = time.perf_counter()
+            if self.url or (self.token and channel):
+                result = await self.post(client, channel, text)
+            else:
+                result = "printed"
+                print(text)
+            if self.on_post is not None:
+                self.on_post(time.perf_counter() - start, result)
+
+    async def run(self):
+        """The dispatcher task"""
+        self.wakeup = asyncio.Event()
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as client:
+            try:
+                while True:
+                    if not self.queue:
+                        await self.wakeup.wait()
+                    self.wakeup.clear()
+                    await asyncio.sleep(self.window)  # Let the rest of the burst arrive
+                    await self.send(client)
+            except asyncio.CancelledError:  # Shutting down, make one (retry-less) attempt at what is left
+                self.retries = 0
+                await self.send(client)
+                raise
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Pre-serialized, versioned JSON documents for serving data that rarely changes"""
+
+import gzip
+import hashlib
+import json
+
+# For requests naming the version (?v=<etag>) they want: that URL will always serve the same content
+VERSIONED_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class JSONSnapshot:
+    """A JSON document that is encoded (and gzip-compressed) once when it changes, rather than on every
+    request. Each change bumps the version number, and the ETag is derived from the encoded content,
+    so it is stable across restarts and worker processes."""
+
+    def __init__(self, data=None, cache_control: str = "no-cache"):
+        self.version = 0
+        self.cache_control = cache_control
+        self.data = None
+        self.body = b""
+        self.gzipped = b""
+        self.etag = ""
+        self.update(data if data is not None else {})
+
+    def update(self, data) -> bool:
+        """Re-encodes the document. Returns True if the content changed (and the version was bumped)"""
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if self.version and body == self.body:  # Unchanged, keep the current version and ETag
+            return False
+        self.data = data
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.version += 1
+        return True
+
+    def response(self, if_none_match: str = "", accept_encoding: str = "", version: str = ""):
+        """Returns the (status, headers, body) triplet for serving this document, honoring conditional
+        requests and gzip content negotiation. If the requested version is the current one (the ETag),
+        browsers may keep the response for good, as the next version gets a URL of its own."""
+        headers = {
+            "ETag": f'"{self.etag}"',
+            "Cache-Control": VERSIONED_CACHE_CONTROL if version == self.etag else self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if if_none_match and (f'"{self.etag}"' in if_none_match or if_none_match.strip() == "*"):
+            return 304, headers, b""
+        headers["Content-Type"] = "application/json"
+        if "gzip" in accept_encoding:
+            headers["Content-Encoding"] = "gzip"
+            return 200, headers, self.gzipped
+        return 200, headers, self.body
@@ -20,26 +20,16 @@
 """Personal Access Token handler for selfserve"""
 
 import asfquart
-import os
-
-roleaccounts = {}
-ROLEACCOUNT_FILE = os.path.normpath(os.path.join("..", "roleaccounts.txt"))
-
-if os.path.exists(ROLEACCOUNT_FILE):
-    print("Parsing role accounts list")
-    for line in open(ROLEACCOUNT_FILE).readlines():
-        if not line.startswith("#"):
-            k, v = line.split(":", 1)
-            k = k.strip().lower()
-            print(f"Found role account: {k}")
-            roleaccounts[v.strip()] = k
+from . import config
 
 
 async def token_handler(token):
-    if token in roleaccounts:
+    """Role accounts may use their secret as a bearer token"""
+    account = config.ldap.roleaccounts.identify(token)
+    if account:
         return {
-            "uid": roleaccounts[token],
-            "fullname": f"{roleaccounts[token]} role Account",
+            "uid": account,
+            "fullname": f"{account} role Account",
             "roleaccount": True,
         }
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Durable, expiring, single-use confirmation tokens (such as for account reactivation links)"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import typing
+import uuid
+
+DEFAULT_TTL = 86400  # Tokens are valid for a day
+DEFAULT_MAX_TOKENS = 10_000  # Max outstanding tokens per store, before the oldest are evicted
+SWEEP_INTERVAL = 600  # How often expired tokens are removed from the database
+DEFAULT_RESEND_AFTER = 600  # A repeat request may send the outstanding token out again after ten minutes
+
+TOKENS_CREATE_STATEMENT = """
+CREATE TABLE IF NOT EXISTS tokens (
+     token text PRIMARY KEY,
+     store text NOT NULL,
+     subject text NOT NULL,
+     value text NOT NULL,
+     created integer NOT NULL,
+     expires integer NOT NULL,
+     sent integer NOT NULL DEFAULT 0
+    );
+CREATE UNIQUE INDEX IF NOT EXISTS tokens_by_subject ON tokens (store, subject);
+CREATE INDEX IF NOT EXISTS tokens_by_expiry ON tokens (store, expires);
+"""
+
+
+class TokenStore:
+    """Outstanding tokens for one purpose (`name`), kept in a sqlite file that may be shared with other
+    stores and other workers. Each subject (e.g. a username) has at most one outstanding token, so
+    repeated requests get the same token back instead of minting new ones, and it is only sent out
+    again once `resend_after` seconds have passed, in case the first email got lost. The store never
+    holds more than `max_tokens` tokens: the oldest are evicted first."""
+
+    def __init__(
+        self,
+        filepath: str,
+        name: str,
+        ttl: int = DEFAULT_TTL,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        resend_after: int = DEFAULT_RESEND_AFTER,
+    ):
+        self.filepath = filepath
+        self.name = name
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.resend_after = resend_after
+        self.connector = sqlite3.connect(filepath, isolation_level=None, timeout=5)
+        self.connector.execute("PRAGMA journal_mode=WAL")
+        self.connector.execute("PRAGMA synchronous=NORMAL")  # Only a power cut can lose the latest tokens
+        self.connector.executescript(TOKENS_CREATE_STATEMENT)
+        columns = [row[1] for row in self.connector.execute("PRAGMA table_info(tokens)")]
+        if "sent" not in columns:  # A database from before tokens were sent out again
+            try:
+                self.connector.execute("ALTER TABLE tokens ADD COLUMN sent integer NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:  # Another worker got there first
+                pass
+
+    def issue(self, subject: str, value, now: typing.Optional[float] = None) -> typing.Tuple[str, bool]:
+        """Returns (token, send) for a subject. If the subject already has a valid token, that token is
+        returned, with send set only if it was last sent out more than `resend_after` seconds ago. The
+        caller should send the token out if send is set, and not otherwise."""
+        now = int(time.time() if now is None else now)
+        cursor = self.connector.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            row = cursor.execute(
+                "SELECT token, sent FROM tokens WHERE store = ? AND subject = ? AND expires > ?",
+                (self.name, subject, now),
+            ).fetchone()
+            if row:
+                token, sent = row
+                send = sent <= now - self.resend_after
+                if send:
+                    cursor.execute("UPDATE tokens SET sent = ? WHERE token = ?", (now, token))
+                cursor.execute("COMMIT")
+                return token, send
+            token = str(uuid.uuid4())
+            cursor.execute("DELETE FROM tokens WHERE store = ? AND (subject = ? OR expires <= ?)", (self.name, subject, now))
+            (count,) = cursor.execute("SELECT COUNT(*) FROM tokens WHERE store = ?", (self.name,)).fetchone()
+            if count >= self.max_tokens:
+                cursor.execute(
+                    "DELETE FROM tokens WHERE token IN "
+                    "(SELECT token FROM tokens WHERE store = ? ORDER BY expires, rowid LIMIT ?)",
+                    (self.name, count - self.max_tokens + 1),
+                )
+            cursor.execute(
+                "INSERT INTO tokens (token, store, subject, value, created, expires, sent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (token, self.name, subject, json.dumps(value), now, now + self.ttl, now),
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return token, True
+
+    def claim(self, token: str, now: typing.Optional[float] = None):
+        """Removes a token and returns its value, or None if it does not exist or has expired.
+        A token can only ever be claimed once, even with multiple workers racing for it."""
+        now = int(time.time() if now is None else now)
+        rows = self.connector.execute(
+            "DELETE FROM tokens WHERE token = ? AND store = ? RETURNING value, expires", (token, self.name)
+        ).fetchall()
+        if rows and rows[0][1] > now:
+            return json.loads(rows[0][0])
+        return None
+
+    def sweep(self, now: typing.Optional[float] = None) -> int:
+        """Removes all expired tokens, returning how many were removed"""
+        now = int(time.time() if now is None else now)
+        cursor = self.connector.execute("DELETE FROM tokens WHERE store = ? AND expires <= ?", (self.name, now))
+        return cursor.rowcount
+
+    async def sweeper(self, interval: int = SWEEP_INTERVAL):
+        """Background task that sweeps expired tokens every `interval` seconds"""
+        while True:
+            removed = self.sweep()
+            if removed:
+                print(f"Removed {removed} expired {self.name} tokens")
+            await asyncio.sleep(interval)
+
+    def __len__(self):
+        (count,) = self.connector.execute("SELECT COUNT(*) FROM tokens WHERE store = ?", (self.name,)).fetchone()
+        return count
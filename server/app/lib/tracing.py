@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+"""Lightweight per-request tracing: a request id and timed spans (ACLI, SQLite, SMTP, outgoing HTTP...),
+carried through the request via contextvars. Spans recorded outside of a request are simply dropped."""
+
+import asyncio
+import collections
+import contextvars
+import json
+import os
+import re
+import time
+import typing
+import uuid
+
+import aiohttp
+
+VALID_REQUEST_ID = re.compile(r"^[-_.a-zA-Z0-9]{8,64}$")  # Accepted from an upstream X-Request-ID header
+MAX_SPANS = 256  # Spans kept per request, so a runaway loop cannot eat all our memory
+
+
+class Span(typing.NamedTuple):
+    name: str
+    start: float  # Seconds since the start of the trace
+    duration: float  # Seconds
+    attributes: dict
+
+
+class Trace:
+    def __init__(self, request_id: typing.Optional[str] = None, name: str = ""):
+        self.request_id = request_id if request_id and VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans: typing.List[Span] = []
+        self.dropped = 0
+
+    def add(self, name: str, start: float, duration: float, attributes: dict):
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(Span(name, start - self.start, duration, attributes))
+        else:
+            self.dropped += 1
+
+    def finish(self) -> float:
+        self.duration = time.perf_counter() - self.start
+        return self.duration
+
+    def server_timing(self, top: int = 5) -> str:
+        """A Server-Timing header value: the total time of the request, and the time spent in the `top`
+        most expensive kinds of span (with how many there were)"""
+        totals: typing.Dict[str, float] = collections.defaultdict(float)
+        counts: typing.Dict[str, int] = collections.defaultdict(int)
+        for span in self.spans:
+            totals[span.name] += span.duration
+            counts[span.name] += 1
+        entries = [f"total;dur={self.duration * 1000:.1f}"]
+        for name, duration in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+            entries.append(f'{name};dur={duration * 1000:.1f};desc="{counts[name]}x"')
+        return ", ".join(entries)
+
+    def to_dict(self, **extra) -> dict:
+        """The trace as a structured (JSON) log entry"""
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 2),
+            **extra,
+            "spans": [
+                {"name": span.name, "start_ms": round(span.start * 1000, 2), "duration_ms": round(span.duration * 1000, 2), **span.attributes}
+                for span in self.spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+    def to_otlp(self, service_name: str = "selfserve-portal") -> dict:
+        """The trace in the OTLP/HTTP JSON format, with the request as the root span"""
+        trace_id = uuid.uuid5(uuid.NAMESPACE_OID, self.request_id).hex  # 32 hex chars, stable per request id
+        root_id = os.urandom(8).hex()
+
+        def otlp_span(span_id: str, name: str, start: float, duration: float, attributes: dict, parent: str = ""):
+            start_ns = self.start_ns + int(start * 1e9)
+            return {
+                "traceId": trace_id,
+                "spanId": span_id,
+                "parentSpanId": parent,
+                "name": name,
+                "kind": 2 if not parent else 3,  # SERVER for the request, CLIENT for what it called out to
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(duration * 1e9)),
+                "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in attributes.items()],
+            }
+
+        spans = [otlp_span(root_id, self.name, 0.0, self.duration, {"request_id": self.request_id})]
+        for span in self.spans:
+            spans.append(otlp_span(os.urandom(8).hex(), span.name, span.start, span.duration, span.attributes, root_id))
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                    "scopeSpans": [{"scope": {"name": "selfserve.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+
+current_trace: contextvars.ContextVar[typing.Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def start(request_id: typing.Optional[str] = None, name: str = "") -> Trace:
+    """Starts a new trace for the current request (or task)"""
+    trace = Trace(request_id, name)
+    current_trace.set(trace)
+    return trace
+
+
+def current() -> typing.Optional[Trace]:
+    return current_trace.get()
+
+
+def request_id() -> typing.Optional[str]:
+    trace = current_trace.get()
+    return trace.request_id if trace else None
+
+
+def record(name: str, duration: float, **attributes):
+    """Records a span that has already been timed, ending now"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, time.perf_counter() - duration, duration, attributes)
+
+
+class span:
+    """Context manager timing a block of code as a span of the current trace"""
+
+    __slots__ = ("name", "attributes", "start")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        trace = current_trace.get()
+        if trace is not None:
+            if exc_type is not None:
+                self.attributes["error"] = exc_type.__name__
+            trace.add(self.name, self.start, time.perf_counter() - self.start, self.attributes)
+
+
+def http_tracer() -> aiohttp.TraceConfig:
+    """An aiohttp trace config recording every outgoing request as an "http" span"""
+
+    async def on_request_start(_session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(_session, context, params):
+        record("http", time.perf_counter() - context.start, host=params.url.host, status=params.response.status)
+
+    async def on_request_exception(_session, context, params):
+        record("http", time.perf_counter() - context.start, host=params.url.host, error=type(params.exception).__name__)
+
+    tracer = aiohttp.TraceConfig()
+    tracer.on_request_start.append(on_request_start)
+    tracer.on_request_end.append(on_request_end)
+    tracer.on_request_exception.append(on_request_exception)
+    return tracer
+
+
+def log_json(trace: Trace, **extra):
+    """Writes a trace to the journal as a single line of JSON"""
+    print(json.dumps(trace.to_dict(**extra), default=str), flush=True)
+
+
+# Exports in flight, so they are not garbage collected before they are done
+pending_exports: typing.Set[asyncio.Task] = set()
+
+
+def export_otlp(trace: Trace, endpoint: str):
+    """Sends a trace to an OTLP/HTTP collector (e.g. http://localhost:4318/v1/traces) in the background"""
+
+    async def post():
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as client:
+                await client.post(endpoint, json=trace.to_otlp())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Could not export trace {trace.request_id} to {endpoint}: {e}")
+
+    task = asyncio.get_running_loop().create_task(post())
+    pending_exports.add(task)
+    task.add_done_callback(pending_exports.discard)
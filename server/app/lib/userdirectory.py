@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+"""User directory (and project/space key) lookups straight from the Jira (postgres) and Confluence (mysql) databases"""
+
+import asyncio
+import time
+import typing
+import aiomysql
+import psycopg
+import psycopg_pool
+
+POSITIVE_TTL = 60  # Cache found users for a minute
+NEGATIVE_TTL = 10  # ...but not-found users only briefly, as they may be about to be created
+QUERY_TIMEOUT = 5  # Give up on the database (and fall back to ACLI) after five seconds
+RETRY_INTERVAL = 30  # After failing to connect, fall back to ACLI right away for this many seconds
+MAX_CACHED = 10000
+
+JIRA_USER_QUERY = "SELECT active FROM cwd_user WHERE lower_user_name = %s ORDER BY active DESC LIMIT 1"
+CONFLUENCE_USER_QUERY = "SELECT active FROM cwd_user WHERE lower_user_name = %s ORDER BY active DESC LIMIT 1"
+JIRA_PROJECT_KEYS_QUERY = "SELECT pkey FROM project"
+CONFLUENCE_SPACE_KEYS_QUERY = "SELECT SPACEKEY FROM SPACES"
+
+
+class DirectoryUnavailable(Exception):
+    """Raised when the database cannot be asked, and the caller should fall back to ACLI"""
+
+
+class UserDirectory:
+    """Lookups in the Jira and Confluence databases, given the connection settings of each (empty if that
+    database is not configured). The connection pools are opened on first use."""
+
+    def __init__(self, jira_settings: dict, confluence_settings: dict):
+        self.jira_settings = jira_settings
+        self.confluence_settings = confluence_settings
+        self.pools: typing.Dict[str, typing.Any] = {}
+        self.failed: typing.Dict[str, float] = {}  # system -> when opening its pool last failed
+        self.pool_lock = asyncio.Lock()  # So concurrent first lookups do not each open a pool
+        # Cached lookups: (system, username) -> (expiry, status), where status is None (no such user), True (active) or False
+        self.cache: typing.Dict[typing.Tuple[str, str], typing.Tuple[float, typing.Optional[bool]]] = {}
+
+    async def open_jira_pool(self):
+        pool = psycopg_pool.AsyncConnectionPool(
+            psycopg.conninfo.make_conninfo(**self.jira_settings), min_size=1, max_size=4, open=False
+        )
+        try:  # Without wait, open() returns right away even if the database cannot be reached
+            await pool.open(wait=True, timeout=QUERY_TIMEOUT)
+        except BaseException:
+            await pool.close()
+            raise
+        return pool
+
+    async def open_confluence_pool(self):
+        # aiomysql waits a minute for a connection by default, which is far longer than we want to
+        settings = {"connect_timeout": QUERY_TIMEOUT, **self.confluence_settings}
+        return await aiomysql.create_pool(minsize=1, maxsize=4, pool_recycle=3600, **settings)
+
+    async def get_pool(self, system: str, settings: dict, opener: typing.Callable[[], typing.Awaitable]):
+        if not settings:
+            raise DirectoryUnavailable(f"No {system} database configured")
+        async with self.pool_lock:
+            if system not in self.pools:
+                if time.monotonic() - self.failed.get(system, -RETRY_INTERVAL) < RETRY_INTERVAL:
+                    raise DirectoryUnavailable(f"The {system} database could not be reached a moment ago")
+                try:
+                    self.pools[system] = await asyncio.wait_for(opener(), QUERY_TIMEOUT)
+                except BaseException:
+                    self.failed[system] = time.monotonic()
+                    raise
+        return self.pools[system]
+
+    async def get_jira_pool(self) -> psycopg_pool.AsyncConnectionPool:
+        return await self.get_pool("Jira", self.jira_settings, self.open_jira_pool)
+
+    async def get_confluence_pool(self) -> aiomysql.Pool:
+        return await self.get_pool("Confluence", self.confluence_settings, self.open_confluence_pool)
+
+    def cached(self, system: str, username: str):
+        entry = self.cache.get((system, username))
+        if entry and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    def remember(self, system: str, username: str, status: typing.Optional[bool]):
+        ttl = NEGATIVE_TTL if status is None else POSITIVE_TTL
+        self.cache[(system, username)] = (time.monotonic() + ttl, status)
+        if len(self.cache) > MAX_CACHED:  # Keep things tidy, drop anything expired
+            now = time.monotonic()
+            for key in [key for key, (expiry, _status) in self.cache.items() if expiry < now]:
+                del self.cache[key]
+        return status
+
+    async def jira_user_status(self, username: str) -> typing.Optional[bool]:
+        """Returns None if the user does not exist in Jira, otherwise whether the account is active.
+        Raises DirectoryUnavailable if the database could not be queried."""
+        username = username.lower()
+        found, status = self.cached("jira", username)
+        if found:
+            return status
+        try:
+            pool = await self.get_jira_pool()
+            async with pool.connection(timeout=QUERY_TIMEOUT) as conn:
+                async with conn.cursor() as cur:
+                    await asyncio.wait_for(cur.execute(JIRA_USER_QUERY, (username,)), QUERY_TIMEOUT)
+                    row = await cur.fetchone()
+        except (psycopg.Error, psycopg_pool.PoolTimeout, asyncio.TimeoutError, OSError) as e:
+            raise DirectoryUnavailable(f"Could not query the Jira database: {e}")
+        return self.remember("jira", username, None if row is None else bool(row[0]))
+
+    async def confluence_user_status(self, username: str) -> typing.Optional[bool]:
+        """Returns None if the user does not exist in Confluence, otherwise whether the account is active.
+        Raises DirectoryUnavailable if the database could not be queried."""
+        username = username.lower()
+        found, status = self.cached("confluence", username)
+        if found:
+            return status
+        try:
+            pool = await self.get_confluence_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await asyncio.wait_for(cur.execute(CONFLUENCE_USER_QUERY, (username,)), QUERY_TIMEOUT)
+                    row = await cur.fetchone()
+        except (aiomysql.Error, asyncio.TimeoutError, OSError) as e:
+            raise DirectoryUnavailable(f"Could not query the Confluence database: {e}")
+        # Confluence stores active as 'T'/'F'
+        return self.remember("confluence", username, None if row is None else row[0] in ("T", 1, True))
+
+    async def jira_project_keys(self) -> typing.List[str]:
+        """Returns the keys of all Jira projects. Raises DirectoryUnavailable if the database could not be queried."""
+        try:
+            pool = await self.get_jira_pool()
+            async with pool.connection(timeout=QUERY_TIMEOUT) as conn:
+                async with conn.cursor() as cur:
+                    await asyncio.wait_for(cur.execute(JIRA_PROJECT_KEYS_QUERY), QUERY_TIMEOUT)
+                    rows = await cur.fetchall()
+        except (psycopg.Error, psycopg_pool.PoolTimeout, asyncio.TimeoutError, OSError) as e:
+            raise DirectoryUnavailable(f"Could not query the Jira database: {e}")
+        return [row[0] for row in rows if row[0]]
+
+    async def confluence_space_keys(self) -> typing.List[str]:
+        """Returns the keys of all Confluence spaces. Raises DirectoryUnavailable if the database could not be queried."""
+        try:
+            pool = await self.get_confluence_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await asyncio.wait_for(cur.execute(CONFLUENCE_SPACE_KEYS_QUERY), QUERY_TIMEOUT)
+                    rows = await cur.fetchall()
+        except (aiomysql.Error, asyncio.TimeoutError, OSError) as e:
+            raise DirectoryUnavailable(f"Could not query the Confluence database: {e}")
+        return [row[0] for row in rows if row[0]]
+
+
+async def require_active_user(
+    lookup: typing.Callable[[str], typing.Awaitable[typing.Optional[bool]]],
+    fallback: typing.Callable[[str], typing.Awaitable[bool]],
+    username: str,
+    not_found: str,
+    deactivated: str,
+):
+    """Checks that a user exists and is active, with a UserDirectory lookup. If the database is unavailable,
+    asks the fallback (ACLI) instead, which can only tell whether the user exists.
+    Raises AssertionError with the matching message if the user does not pass."""
+    try:
+        status = await lookup(username)
+    except DirectoryUnavailable as e:
+        print(f"Falling back to ACLI for user lookup: {e}")
+        assert await fallback(username), not_found
+        return
+    assert status is not None, not_found
+    assert status is True, deactivated
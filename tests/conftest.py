@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+"""Fixtures for tests of the endpoints, which need the whole portal running"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+
+class Portal:
+    """The portal, booted with a throwaway configuration pointing at local stand-ins for everything
+    external (see benchmarks/bench_app.py). Tests run their coroutines on the loop the portal runs on."""
+
+    def __init__(self, application, loop: asyncio.AbstractEventLoop, workdir: str):
+        self.application = application
+        self.loop = loop
+        self.workdir = workdir
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    async def client(self, session: dict = None):
+        """A test client, logged in with the given session (or not at all)"""
+        import asfquart
+
+        client = self.application.test_client()
+        if session:
+            async with client.session_transaction() as cookie:
+                cookie[asfquart.APP.app_id] = {**session, "uts": time.time()}
+        return client
+
+
+@pytest.fixture(scope="session")
+def portal():
+    pytest.importorskip("asfpy.aioldap", reason="The portal needs asfpy.aioldap, which needs bonsai")
+    source_dir = os.path.realpath(".")
+    sys.path.extend(("benchmarks",))
+    import bench_app
+    import fakes
+
+    services = fakes.FakeServices(delay=0).start()
+    with tempfile.TemporaryDirectory(prefix="selfserve-test-") as workdir:
+        bench_app.write_config(workdir, services)
+        # The portal finds its configuration and static files relative to the working directory
+        os.chdir(os.path.join(workdir, "server"))
+        sys.path.insert(0, os.path.join(source_dir, "server"))
+        loop = asyncio.new_event_loop()
+        try:
+            import app
+
+            application = app.main()
+            context = application.test_app()
+            loop.run_until_complete(context.__aenter__())
+        finally:
+            os.chdir(source_dir)
+        try:
+            yield Portal(application, loop, workdir)
+        finally:
+            loop.run_until_complete(context.__aexit__(None, None, None))
+            loop.close()
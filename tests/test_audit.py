@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import gzip
+import json
+import os
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import audit
+
+def test_redact():
+    arguments = ("jira", "--action", "addUser", "--password", "hunter2", "--token=abc", "--userEmail", "a@b.c", "password=xyz")
+    redacted = audit.redact(arguments)
+    assert "hunter2" not in redacted and "--token=abc" not in redacted and "password=xyz" not in redacted
+    assert redacted[:4] == ["jira", "--action", "addUser", "--password"]
+    assert "a@b.c" in redacted
+    assert audit.truncate(b"x" * 10 + b"error at the end", limit=16).endswith("error at the end")
+
+def test_buffered_writes_and_history(tmp_path):
+    log = audit.AuditLog(str(tmp_path / "acli-audit.log"), flush_interval=0.01)
+
+    async def run():
+        writer = asyncio.create_task(log.writer())
+        for n in range(50):
+            log.record(product="jira", action="addUser" if n % 2 else "getUser", returncode=n % 5, duration_ms=n)
+        assert not os.path.exists(log.filepath)  # Recording does no I/O
+        await asyncio.sleep(0.1)
+        log.record(product="confluence", action="addUser", returncode=0, duration_ms=1)
+        writer.cancel()  # Shutting down still writes out the last entry
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert log.recent(limit=1)[0]["product"] == "confluence"
+    failed_adds = log.recent(limit=100, match=lambda entry: entry["action"] == "addUser" and entry["returncode"])
+    assert len(failed_adds) == 20 and failed_adds[0]["duration_ms"] == 49  # Newest first
+    assert len(log.recent(limit=1000)) == 51
+
+def test_rotation(tmp_path):
+    log = audit.AuditLog(str(tmp_path / "acli-audit.log"), max_bytes=2000, backups=2)
+    for n in range(200):
+        log.record(n=n, stdout="x" * 100)
+        log.flush()
+    backups = sorted(os.listdir(tmp_path))
+    assert backups == ["acli-audit.log", "acli-audit.log.1.gz", "acli-audit.log.2.gz", "acli-audit.log.lock"]
+    with gzip.open(tmp_path / "acli-audit.log.1.gz") as f:
+        rotated = [json.loads(line)["n"] for line in f]
+    newest = log.recent(limit=1000)
+    assert rotated[-1] + 1 == newest[-1]["n"] and newest[0]["n"] == 199  # Nothing lost between the two
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import hashlib
+import io
+import sys
+import time
+
+sys.path.extend(('server/app/lib',))
+
+import credstore
+
+
+class Source:  # Just enough of datasets.FileDataset
+    def __init__(self, text: str):
+        self.generation = 0
+        self.write(text)
+
+    def write(self, text: str):
+        self.data = credstore.parse(io.StringIO(text))
+        self.generation += 1
+
+    def get(self):
+        return self.data
+
+
+def test_hashed_and_plain_tokens():
+    token = credstore.hash_token("b3arer-t0ken")
+    assert "b3arer-t0ken" not in token
+    store = credstore.CredentialStore(Source(f"# Role accounts\nqueue-role:{token}\nMail-Role: thisisatoken\n"))
+    assert store.identify("b3arer-t0ken") == "queue-role"
+    assert store.identify("thisisatoken") == "mail-role"
+    assert store.identify("b3arer-t0ke") is None
+    assert store.identify("guess") is None
+    assert "thisisatoken" not in repr(store.credentials()), "plain tokens are hashed when read"
+
+
+def test_password_hashes_are_refused(capsys):
+    source = Source("mailreq:pbkdf2_sha256$10000$c2FsdA==$aGFzaA==\nqueue-role:token\n")
+    assert list(source.get()) == ["queue-role"]
+    assert "were not loaded: mailreq" in capsys.readouterr().out
+
+
+def test_tokens_are_indexed_again_when_the_file_changes():
+    source = Source(f"mailreq:{credstore.hash_token('token')}\n")
+    store = credstore.CredentialStore(source)
+    assert store.identify("token") == "mailreq"
+    source.write(f"mailreq:{credstore.hash_token('rotated')}\n")
+    assert store.identify("token") is None, "the old token no longer works"
+    assert store.identify("rotated") == "mailreq"
+
+
+def test_unknown_tokens_are_cheap():
+    """An unknown token costs a lookup, not a hash per account, so more accounts do not make it slower"""
+
+    def lookup_time(accounts: int) -> float:
+        store = credstore.CredentialStore(
+            Source("\n".join(f"role{n}:{credstore.hash_token(f'token{n}')}" for n in range(accounts)))
+        )
+        assert store.identify(f"token{accounts - 1}") == f"role{accounts - 1}"
+        timings = []
+        for attempt in range(5):
+            start = time.perf_counter()
+            for n in range(1000):
+                assert store.identify(f"guess{n}") is None
+            timings.append((time.perf_counter() - start) / 1000)
+        return min(timings)
+
+    few, many = lookup_time(5), lookup_time(500)
+    assert many < few * 3, f"{many * 1e6:.1f}us per lookup with 500 accounts, {few * 1e6:.1f}us with 5"
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"guess", b"salt", 10_000)  # What every account cost per unknown token before
+    assert many < (time.perf_counter() - start) / 10
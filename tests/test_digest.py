@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import os
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import digest
+
+RECIPIENTS = ["private@httpd.apache.org", "notifications@infra.apache.org"]
+
+
+def test_outbox_is_durable_and_grouped(tmp_path):
+    filepath = os.path.join(tmp_path, "outbox.db")
+    outbox = digest.Outbox(filepath)
+    outbox.add("httpd", RECIPIENTS, "New httpd Jira account requested: alice", "Review at https://example.org/1", now=100)
+    outbox.add("tomcat", ["private@tomcat.apache.org"], "New tomcat Jira account requested: bob", "Review at https://example.org/2", now=110)
+    outbox.add("httpd", list(reversed(RECIPIENTS)), "New Jira account created: alice", "Approved", now=120)
+
+    other_worker = digest.Outbox(filepath)  # Or the same worker, after a restart
+    assert len(other_worker) == 3
+    waiting = other_worker.pending()
+    httpd = waiting[("httpd", tuple(sorted(RECIPIENTS)))]
+    assert [notification.subject for notification in httpd] == [
+        "New httpd Jira account requested: alice",
+        "New Jira account created: alice",
+    ]
+    assert len(waiting[("tomcat", ("private@tomcat.apache.org",))]) == 1
+
+    other_worker.remove(httpd)
+    assert list(outbox.pending()) == [("tomcat", ("private@tomcat.apache.org",))]
+
+
+def test_summarize():
+    notifications = [
+        digest.Notification(1, RECIPIENTS, "First", "One", 100),
+        digest.Notification(2, RECIPIENTS, "Second", "Two", 110),
+    ]
+    summary, details = digest.summarize(notifications)
+    assert summary == "- First\n- Second"
+    assert details == "First\n-----\nOne\n\nSecond\n------\nTwo"
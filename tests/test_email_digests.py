@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+
+
+def test_failed_digest_is_retried(portal, monkeypatch):
+    """A digest pass that raises is counted as a failed refresh, and the next pass still runs"""
+    from app.lib import config, email, metrics
+
+    passes = []
+
+    async def flush_digests():
+        passes.append(len(passes))
+        if len(passes) == 1:
+            raise OSError("outbox is locked")
+
+    async def run_briefly():
+        task = asyncio.create_task(email.send_digests())
+        while len(passes) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    monkeypatch.setattr(email, "flush_digests", flush_digests)
+    monkeypatch.setattr(config.messaging, "digest_interval", 0)
+    failures = metrics.REFRESH_FAILURES.series.get(("email-digests",), 0)
+    portal.run(asyncio.wait_for(run_briefly(), 5))
+    assert metrics.REFRESH_FAILURES.series.get(("email-digests",), 0) == failures + 1
+    assert ("email-digests",) in metrics.REFRESH_LAST_SUCCESS.series
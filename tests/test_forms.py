@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import re
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import quart
+import forms
+
+app = quart.Quart(__name__)
+
+LIST_FORM = forms.Form(
+    sources=("args", "form", "json"),
+    max_size=1024,
+    listpart=forms.Field(required=True, pattern=re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$"), message="Invalid list name"),
+    moderators=forms.Field(list, required=True, max_length=3, items=str),
+    private=forms.Field(bool, default=False),
+    limit=forms.Field(int, default=10),
+)
+
+
+@app.route("/lists", methods=["GET", "POST"])
+@forms.accepts(LIST_FORM)
+async def create_list(form_data: dict):
+    return {"success": True, **form_data}
+
+
+def request(method: str, **kwargs):
+    async def run():
+        response = await app.test_client().open("/lists", method=method, **kwargs)
+        return response.status_code, await response.get_data(as_text=True)
+
+    return asyncio.run(run())
+
+
+def test_sources_and_types():
+    status, body = request("POST", json={"listpart": "dev", "moderators": ["a@b.c"], "private": True, "ignored": "x"})
+    assert status == 200 and '"private":true' in body and '"limit":10' in body and "ignored" not in body
+    status, body = request("POST", form={"listpart": "user-dev", "moderators": "a@b.c", "private": "false", "limit": "5"})
+    assert '"moderators":["a@b.c"]' in body and '"private":false' in body and '"limit":5' in body
+    status, body = request("GET", query_string={"listpart": "dev", "moderators": "a@b.c"})
+    assert '"success":true' in body
+
+
+def test_validation():
+    _status, body = request("POST", json={"listpart": "Not A List", "moderators": ["a@b.c"]})
+    assert '"message":"Invalid list name"' in body
+    _status, body = request("POST", json={"listpart": "dev", "moderators": ["a", "b", "c", "d"]})
+    assert "moderators must be no more than 3 long" in body
+    _status, body = request("POST", json={"listpart": "dev"})
+    assert "moderators is required" in body
+    _status, body = request("POST", json={"listpart": "dev", "moderators": [{"a": "b"}]})
+    assert "moderators may only contain str values" in body
+    _status, body = request("POST", json={"listpart": "dev", "moderators": ["a"], "limit": "many"})
+    assert "limit must be a number" in body
+
+
+def test_oversized_body_is_refused_unparsed():
+    status, body = request("POST", form={"listpart": "dev", "moderators": "a" * 2000})
+    assert status == 413 and "larger than what is permitted" in body
+    payload = b"listpart=dev&moderators=" + b"a" * 2000
+    status, body = request(
+        "POST", data=payload, headers={"Content-Type": "application/x-www-form-urlencoded", "Content-Length": str(len(payload))}
+    )
+    assert status == 413 and "content length (2024 bytes)" in body
+
+
+def test_body_not_read_for_query_string_forms():
+    query_form = forms.Form(listpart=forms.Field(required=True))
+
+    async def run():
+        async with app.test_request_context("/lists", method="POST", query_string={"listpart": "dev"}, json={"listpart": "other"}):
+            assert await query_form.parse() == {"listpart": "dev"}
+
+    asyncio.run(run())
+
+
+def test_nested_forms():
+    descriptor = forms.Form(sources=("json",), lists=forms.Field(list, default=[]), jira=forms.Field(dict))
+    parsed = descriptor.validate({"lists": [{"listpart": "dev", "moderators": ["a@b.c"]}], "jira": {"key": "FOO"}})
+    assert parsed["jira"] == {"key": "FOO"}
+    assert LIST_FORM.validate(parsed["lists"][0]) == {"listpart": "dev", "moderators": ["a@b.c"], "private": False, "limit": 10}
+    try:
+        descriptor.validate({"jira": ["FOO"]})
+        assert False, "A list is not an object"
+    except AssertionError as e:
+        assert str(e) == "jira must be an object"
+    first, second = descriptor.validate({}), descriptor.validate({})
+    first["lists"].append("dev")
+    assert second["lists"] == [] and descriptor.fields["lists"].default == [], "defaults must not be shared between requests"
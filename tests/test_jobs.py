@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import os
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import jobs
+import sharedstate
+
+
+def test_progress_is_visible_to_other_workers(tmp_path):
+    filepath = os.path.join(tmp_path, "shared.db")
+    tracker = jobs.JobTracker(sharedstate.SharedState(filepath), "archive-jobs")
+    other_worker = jobs.JobTracker(sharedstate.SharedState(filepath), "archive-jobs")
+
+    job = tracker.create("confluence-archive", "humbedooh", ["FOO", "BAR", "BAZ"])
+    assert other_worker.get(job.id)["counts"] == {"pending": 3, "running": 0, "ok": 0, "failed": 0}
+    job.start("FOO")
+    job.start("BAR")
+    job.finish("FOO")
+    job.finish("BAR", "failed", "Could not find this confluence space")
+    status = other_worker.get(job.id)
+    assert status["status"] == "running" and status["counts"] == {"pending": 1, "running": 0, "ok": 1, "failed": 1}
+    assert status["items"]["BAR"]["message"] == "Could not find this confluence space"
+    job.start("BAZ")
+    job.finish("BAZ")
+    job.complete()
+    assert other_worker.get(job.id)["status"] == "done"
+    assert job.items_with("ok") == ["FOO", "BAZ"]
+    assert other_worker.get("0123456789abcdef") is None
+
+
+def test_recent_jobs_expire(tmp_path):
+    tracker = jobs.JobTracker(sharedstate.SharedState(os.path.join(tmp_path, "shared.db")), max_age=-1)
+    tracker.create("confluence-archive", "humbedooh", ["FOO"])
+    assert tracker.recent() == []
+    tracker.max_age = 3600
+    first = tracker.create("confluence-archive", "humbedooh", ["FOO"])
+    tracker.create("podling-bootstrap", "humbedooh", ["jira"])
+    assert [job["id"] for job in tracker.recent("confluence-archive")] == [first.id]
+
+
+def test_run_records_outcomes(tmp_path):
+    tracker = jobs.JobTracker(sharedstate.SharedState(os.path.join(tmp_path, "shared.db")))
+    job = tracker.create("project-bootstrap", "humbedooh", ["list:dev@foo.apache.org", "jira:FOO", "confluence:FOO"])
+
+    async def works():
+        await asyncio.sleep(0.01)
+
+    async def refused():
+        raise AssertionError("Could not create new space, it may already exist")
+
+    async def broken():
+        raise KeyError("project_key")
+
+    async def run():
+        await asyncio.gather(
+            job.run("list:dev@foo.apache.org", works),
+            job.run("jira:FOO", broken),
+            job.run("confluence:FOO", refused),
+        )
+
+    asyncio.run(run())
+    status = tracker.get(job.id)
+    assert status["counts"] == {"pending": 0, "running": 0, "ok": 1, "failed": 2}
+    assert status["items"]["list:dev@foo.apache.org"]["duration_ms"] >= 10
+    assert status["items"]["jira:FOO"]["message"] == jobs.INTERNAL_ERROR
+    assert status["items"]["confluence:FOO"]["message"] == "Could not create new space, it may already exist"
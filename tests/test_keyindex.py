@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import os
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import keyindex
+import sharedstate
+
+
+def test_keys_are_shared_between_workers(tmp_path):
+    filepath = os.path.join(tmp_path, "shared.db")
+    leader = keyindex.KeyIndex(sharedstate.SharedState(filepath), "jira-project-keys")
+    follower = keyindex.KeyIndex(sharedstate.SharedState(filepath), "jira-project-keys")
+    assert follower.available("FOO") is None, "unknown until loaded"
+    leader.replace(["FOO", "bar"])
+    assert follower.available("foo") is False
+    assert follower.available("BAR") is False
+    assert follower.available("BAZ") is True
+    follower.add("BAZ")  # Created through the follower
+    assert leader.available("BAZ") is False
+
+
+def test_suggestions(tmp_path):
+    index = keyindex.KeyIndex(sharedstate.SharedState(os.path.join(tmp_path, "shared.db")), "confluence-space-keys")
+    assert index.suggest("Apache Foo Bar") == [], "no suggestions until loaded"
+    index.replace(["FOOBAR", "FOO", "FB"])
+    assert index.suggest("Apache Foo Bar", count=3) == ["FOOBA", "FOOB", "FO"]
+    index.replace(["HTTPD"])
+    assert index.suggest("httpd") == ["HTTP", "HTT", "HT", "HTTPD2", "HTTPD3"]
+    assert index.suggest("Apache Very Long Project Name")[0] == "VERYLONGNA"
+    assert index.suggest("1 2 3") == [], "keys must start with a letter"
+    assert index.unavailable_message("A Jira project", "HTTPD", "") == (
+        "A Jira project with the key HTTPD already exists. These keys are free: HTTP, HTT, HT, HTTPD2, HTTPD3"
+    )
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.extend(('server/app/lib',))
+
+pytest.importorskip("asfpy.aioldap", reason="asfpy.aioldap needs bonsai")
+
+import ldapsync
+
+class FakePagedResult:  # What bonsai's paged_search gives: an async iterator fetching a page at a time
+    def __init__(self, entries, page_size, pages):
+        self.entries = entries
+        self.page_size = page_size
+        self.pages = pages
+    def __aiter__(self):
+        return self.iterate()
+    async def iterate(self):
+        for start in range(0, len(self.entries), self.page_size):
+            self.pages.append(start)
+            for entry in self.entries[start:start + self.page_size]:
+                yield entry
+
+class FakeBonsaiConnection:
+    def __init__(self, entries):
+        self.entries = entries
+        self.pages = []
+    async def paged_search(self, base, scope, filter_exp, attrlist, page_size):
+        return FakePagedResult(self.entries, page_size, self.pages)
+
+class SlowBonsaiConnection(FakeBonsaiConnection):
+    def __init__(self, entries, delay):
+        super().__init__(entries)
+        self.delay = delay
+        self.events = []
+    async def paged_search(self, *args, **kwargs):
+        time.sleep(self.delay)  # Blocks its executor thread, like bonsai does
+        self.events.append("searched")
+        return await super().paged_search(*args, **kwargs)
+    def close(self):
+        self.events.append(("closed", threading.current_thread().name))
+
+def paged_connection(bonsai_connection, executor):
+    connection = object.__new__(ldapsync.PagedLDAPConnection)  # Without connecting to a server
+    connection.conn = bonsai_connection
+    connection.loop = asyncio.new_event_loop()
+    connection.executor = executor
+    connection.busy = threading.Lock()
+    return connection
+
+class FakeClient:  # Just enough of asfpy.aioldap.ASF_LDAPClient, handing out one connection
+    def __init__(self, connection, executor=None):
+        self.connection = connection
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(4, thread_name_prefix="aioldap")
+    def connect(self):
+        return self
+    async def __aenter__(self):
+        return self.connection
+    async def __aexit__(self, *args):
+        self.connection.close()
+
+def test_paged_search_reads_every_page():
+    connection = paged_connection(
+        FakeBonsaiConnection([{"cn": [f"project{i}"]} for i in range(5)]), concurrent.futures.ThreadPoolExecutor(1)
+    )
+    entries = asyncio.run(connection.paged_search("ou=project,ou=groups", "(cn=*)", ["cn"], page_size=2))
+    assert [entry["cn"][0] for entry in entries] == [f"project{i}" for i in range(5)]
+    assert len(connection.conn.pages) == 3
+    connection.loop.close()
+
+class FakeConnection:  # A PagedLDAPConnection answering from a dict of groups
+    def __init__(self, groups):
+        self.groups = groups  # cn -> {"member": [...], "owner": [...], "modifyTimestamp": [...]}
+        self.filters = []
+        self.closed = False
+        self.fail = False
+    async def paged_search(self, base, filter_exp, attrs):
+        if self.fail:
+            raise ConnectionError("Server went away")
+        self.filters.append(filter_exp)
+        since = filter_exp.partition("modifyTimestamp>=")[2].rstrip(")")
+        return [
+            {attr: ([cn] if attr == "cn" else group.get(attr, [])) for attr in attrs}
+            for cn, group in self.groups.items()
+            if group["modifyTimestamp"][0] >= since
+        ]
+    def close(self):
+        self.closed = True
+
+def group(timestamp, committers=3, pmc=2):
+    return {
+        "member": [f"committer{i}" for i in range(committers)],
+        "owner": [f"pmc{i}" for i in range(pmc)],
+        "modifyTimestamp": [timestamp],
+    }
+
+def test_incremental_refresh():
+    async def run():
+        groups = {f"project{i:03}": group("20240101000000Z") for i in range(ldapsync.MIN_PROJECTS)}
+        groups["project000"] = group("20240301000000Z")
+        directory = ldapsync.ProjectDirectory("ldaps://ldap.example.org", "", "", "ou=project,ou=groups")
+        connection = FakeConnection(groups)
+        directory.client = FakeClient(connection)
+
+        assert await directory.refresh() is True
+        assert connection.filters == ["(cn=*)"], "the first refresh reads everything"
+        assert directory.groups["project001"] == {"committers": 3, "pmc": 2}
+        assert directory.watermark == "20240301000000Z"
+
+        groups["project001"] = group("20240401000000Z", committers=4)
+        groups["newproject"] = group("20240402000000Z", committers=1, pmc=1)
+        del groups["project002"]
+        connection.filters.clear()
+        assert await directory.refresh() is True
+        assert connection.filters == ["(cn=*)", "(&(cn=*)(modifyTimestamp>=20240301000000Z))"]
+        assert directory.groups["project001"] == {"committers": 4, "pmc": 2}
+        assert directory.groups["newproject"] == {"committers": 1, "pmc": 1}
+        assert "project002" not in directory.groups
+        assert directory.groups["project003"] == {"committers": 3, "pmc": 2}, "unchanged groups are kept"
+        assert directory.watermark == "20240402000000Z"
+
+        assert await directory.refresh() is False, "nothing changed since"
+
+        connection.fail = True
+        with pytest.raises(ConnectionError):
+            await directory.refresh()
+        assert directory.conn is None
+        await directory.closing
+        assert connection.closed and directory.conn is None, "a failed search must drop the connection"
+    asyncio.run(run())
+
+def test_timed_out_search_is_closed_once_it_is_done():
+    """The connection must not be closed from under a search that is still running in another thread"""
+    async def run():
+        executor = concurrent.futures.ThreadPoolExecutor(4, thread_name_prefix="aioldap")
+        bonsai_connection = SlowBonsaiConnection([{"cn": ["project"]}], delay=0.3)
+        directory = ldapsync.ProjectDirectory("ldaps://ldap.example.org", "", "", "ou=project,ou=groups")
+        directory.client = FakeClient(paged_connection(bonsai_connection, executor), executor)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(directory.refresh(), 0.05)
+        assert directory.conn is None, "the next refresh starts over on a new connection"
+        assert bonsai_connection.events == [], "still searching"
+        await directory.closing
+        (searched, (closed, thread_name)) = bonsai_connection.events
+        assert searched == "searched" and closed == "closed"
+        assert thread_name.startswith("aioldap"), "closed in the client's executor, not on the event loop"
+    asyncio.run(run())
+
+def test_too_few_groups_keeps_the_list():
+    directory = ldapsync.ProjectDirectory("ldaps://ldap.example.org", "", "", "ou=project,ou=groups")
+    directory.groups = {"project": {"committers": 1, "pmc": 1}}
+    with pytest.raises(AssertionError):
+        directory.apply(["project"], [], full=True)
+    assert directory.groups == {"project": {"committers": 1, "pmc": 1}}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import sys
+import threading
+import time
+
+sys.path.extend(('server/app/lib',))
+
+import loopmonitor
+
+def blocking_call():
+    time.sleep(0.4)  # Like a synchronous SMTP or SQLite call in a handler
+
+def test_stall_is_caught_in_the_act():
+    lags = []
+    stalls = []
+    monitor = loopmonitor.LoopMonitor(interval=0.02, threshold=0.1, on_lag=lags.append, on_stall=lambda blocked, stack: stalls.append(stack))
+
+    async def run():
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(stalls) == 1  # Reported once, while it was happening
+    assert "blocking_call" in stalls[0]
+    assert max(lags) >= 0.3 and monitor.max_lag == max(lags)
+    assert sorted(lags)[len(lags) // 2] < 0.05  # Otherwise, the loop keeps up
+
+def test_sampling_profiler():
+    done = threading.Event()
+
+    def busy_loop():
+        while not done.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    try:
+        stacks = loopmonitor.sample(worker.ident, 0.2, 0.002)
+    finally:
+        done.set()
+        worker.join()
+    assert sum(stacks.values()) >= 20
+    output = loopmonitor.render_collapsed(stacks)
+    stack, count = output.splitlines()[0].rsplit(" ", 1)
+    assert "busy_loop (tests/test_loopmonitor.py)" in stack.split(";") and int(count) > 0
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import hashlib
+import json
+import os
+
+import pytest
+
+PMC_MEMBER = {"uid": "foolead", "fullname": "Foo Lead", "pmcs": ["foo"], "projects": ["foo"]}
+ROLE_ACCOUNT = {"uid": "mailreq", "roleaccount": True}
+BATCH = {
+    "domainpart": "foo.apache.org",
+    "listparts": ["dev", "private", "commits"],
+    "private": ["private"],
+    "moderators": ["moderator@example.org"],
+    "muopts": "mu",
+}
+
+
+def setup_portal(portal, monkeypatch) -> list:
+    """Seeds the project data, and records emails instead of sending them"""
+    from app.lib import config, email
+
+    config.projects[:] = ["foo"]
+    config.messaging.mail_mappings = {"foo": "foo.apache.org"}
+    config.messaging.set_mailing_lists(["users@foo.apache.org"])
+    emails = []
+    monkeypatch.setattr(email, "from_template", lambda template, **kwargs: emails.append(template))
+    return emails
+
+
+def test_batch_is_queued_as_one_entry(portal, monkeypatch):
+    from app.lib import config
+
+    emails = setup_portal(portal, monkeypatch)
+
+    async def run():
+        client = await portal.client(PMC_MEMBER)
+        result = await (await client.post("/api/mailinglist", json={**BATCH, "listpart": "issues", "private": False})).get_json()
+        assert result["success"] is True, result
+        result = await (await client.post("/api/mailinglist-batch", json=BATCH)).get_json()
+        assert result["success"] is True, result
+        assert emails == ["mailinglist_create.txt", "mailinglist_create_batch.txt"]
+
+        with open(os.path.join(config.storage.queue_dir, "mailinglist-issues-foo.apache.org.json")) as f:
+            single = json.load(f)
+        digest = hashlib.sha1(b"commits,dev,private").hexdigest()[:8]
+        filename = f"mailinglist-batch-foo.apache.org-{digest}.json"
+        with open(os.path.join(config.storage.queue_dir, filename)) as f:
+            batch = json.load(f)
+        assert {key: batch[key] for key in ("type", "id", "requester", "domain")} == {
+            "type": "mailinglist-batch",
+            "id": filename,
+            "requester": "foolead",
+            "domain": "foo.apache.org",
+        }
+        assert [entry["list"] for entry in batch["lists"]] == ["dev", "private", "commits"]
+        assert [entry["private"] for entry in batch["lists"]] == [False, True, False]
+        for entry in batch["lists"]:  # Each shaped just like a single mailinglist entry
+            assert set(entry) == set(single) - {"id"}
+            assert entry["type"] == "mailinglist" and entry["mods"] == ["moderator@example.org"]
+        assert batch["requested"] == min(entry["requested"] for entry in batch["lists"])
+
+        queue = await (await (await portal.client(ROLE_ACCOUNT)).get("/api/queue")).get_json()
+        assert filename in [entry["id"] for entry in queue]
+
+    portal.run(run())
+
+
+def test_batch_is_validated_up_front(portal, monkeypatch):
+    from app.lib import config
+
+    emails = setup_portal(portal, monkeypatch)
+
+    async def run():
+        client = await portal.client(PMC_MEMBER)
+        queued = set(os.listdir(config.storage.queue_dir))
+        cases = (
+            ({**BATCH, "listparts": ["dev", "dev"]}, "Each mailing list can only be requested once"),
+            ({**BATCH, "private": ["security"]}, "Private lists must be among the lists requested"),
+            ({**BATCH, "listparts": ["dev", "private"], "private": []}, "private@ and security@ lists MUST be marked as private"),
+            ({**BATCH, "listparts": ["dev", "users"], "private": []}, "This mailing already exists"),
+            ({**BATCH, "listparts": [{}]}, "Please specify a list of up to 20 mailing list names"),
+            ({**BATCH, "private": [["private"]]}, "Private lists must be given as a list of names"),
+        )
+        for body, message in cases:
+            result = await (await client.post("/api/mailinglist-batch", json=body)).get_json()
+            assert result == {"success": False, "message": message}
+        assert set(os.listdir(config.storage.queue_dir)) == queued and not emails, "nothing may be queued"
+
+    portal.run(run())
+
+
+def test_lists_need_moderators(portal, monkeypatch):
+    from app.lib import config
+
+    emails = setup_portal(portal, monkeypatch)
+
+    async def run():
+        client = await portal.client(PMC_MEMBER)
+        queued = set(os.listdir(config.storage.queue_dir))
+        single = {**BATCH, "listpart": "issues", "private": False}
+        for endpoint, body in (("/api/mailinglist", single), ("/api/mailinglist-batch", BATCH)):
+            for moderators in ([], None):
+                result = await (await client.post(endpoint, json={**body, "moderators": moderators})).get_json()
+                assert result == {"success": False, "message": "You need to provide a list of moderators"}
+        assert set(os.listdir(config.storage.queue_dir)) == queued and not emails, "nothing may be queued"
+
+    portal.run(run())
+
+
+def test_queue_entries_are_written_atomically(portal, monkeypatch):
+    from app.endpoints import mailinglist
+    from app.lib import config
+
+    def interrupted(payload, f):
+        f.write('{"type": "mailinglist-batch", ')
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(mailinglist.json, "dump", interrupted)
+    with pytest.raises(OSError):
+        mailinglist.write_queue_entry("mailinglist-halfway-foo.apache.org.json", {"type": "mailinglist"})
+    monkeypatch.undo()
+    assert not os.path.exists(os.path.join(config.storage.queue_dir, "mailinglist-halfway-foo.apache.org.json"))
+
+    async def run():
+        queue = await (await (await portal.client(ROLE_ACCOUNT)).get("/api/queue")).get_json()
+        assert "mailinglist-halfway-foo.apache.org.json" not in [entry.get("id") for entry in queue]
+
+    portal.run(run())
+    mailinglist.write_queue_entry("mailinglist-whole-foo.apache.org.json", {"type": "mailinglist"})
+    assert "mailinglist-whole-foo.apache.org.json" in os.listdir(config.storage.queue_dir)
+    assert not [filename for filename in os.listdir(config.storage.queue_dir) if filename.startswith("mailinglist-whole")][1:]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import sqlite3
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import metrics
+
+def test_render_and_merge():
+    registry = metrics.Registry()
+    calls = registry.counter("acli_calls_total", "ACLI calls", ("product", "action"))
+    duration = registry.histogram("acli_duration_seconds", "ACLI duration", ("product",), buckets=(1, 5))
+    last_run = registry.gauge("last_run", "Last run", aggregate="max")
+    calls.inc("jira", "getUser")
+    calls.inc("jira", "getUser")
+    duration.observe(0.5, "jira")
+    duration.observe(3, "jira")
+    duration.observe(7, "jira")
+    last_run.set(100)
+    text = metrics.render(registry.dump())
+    assert '# TYPE acli_calls_total counter' in text
+    assert 'acli_calls_total{product="jira",action="getUser"} 2' in text
+    assert 'acli_duration_seconds_bucket{product="jira",le="1"} 1' in text
+    assert 'acli_duration_seconds_bucket{product="jira",le="5"} 2' in text
+    assert 'acli_duration_seconds_bucket{product="jira",le="+Inf"} 3' in text
+    assert 'acli_duration_seconds_count{product="jira"} 3' in text
+    # Two workers: counters and histograms add up, max-gauges do not
+    other = metrics.Registry()
+    other.counter("acli_calls_total", "ACLI calls", ("product", "action")).inc("jira", "getUser")
+    other.gauge("last_run", "Last run", aggregate="max").set(50)
+    text = metrics.render(metrics.merge([registry.dump(), other.dump()]))
+    assert 'acli_calls_total{product="jira",action="getUser"} 3' in text
+    assert 'last_run 100' in text
+
+def test_instrumented_db():
+    class DB:  # Just enough of asfpy.sqlite.DB
+        def __init__(self):
+            self.connector = sqlite3.connect(":memory:")
+            self.connector.execute("CREATE TABLE users (userid text)")
+        def insert(self, table, document):
+            self.connector.execute(f"INSERT INTO {table} (userid) VALUES (?)", (document["userid"],))
+        def fetch(self, table, limit=1, **params):
+            for row in self.connector.execute(f"SELECT userid FROM {table}"):
+                yield {"userid": row[0]}
+    duration = metrics.Histogram("sqlite_duration_seconds", "SQLite calls", ("db", "call"))
+    db = metrics.InstrumentedDB(DB(), "jira", duration)
+    db.insert("users", {"userid": "humbedooh"})
+    assert [row["userid"] for row in db.fetch("users", limit=None)] == ["humbedooh"]
+    assert sum(duration.series[("jira", "insert")][:-1]) == 1
+    assert sum(duration.series[("jira", "fetch")][:-1]) == 1
+    assert db.connector is db.db.connector, "attributes are passed through"
+
+
+def test_instrumented_db_transaction():
+    class DB:
+        def __init__(self):
+            self.connector = sqlite3.connect(":memory:", isolation_level=None)  # Auto-commit, as asfpy.sqlite does
+            self.connector.execute("CREATE TABLE users (userid text PRIMARY KEY)")
+    duration = metrics.Histogram("sqlite_duration_seconds", "SQLite calls", ("db", "call"))
+    db = metrics.InstrumentedDB(DB(), "jira", duration)
+    db.transaction([("INSERT INTO users VALUES (?)", ("humbedooh",)), ("INSERT INTO users VALUES (?)", ("fluxo",))])
+    try:
+        db.transaction([("INSERT INTO users VALUES (?)", ("janedoe",)), ("INSERT INTO users VALUES (?)", ("humbedooh",))])
+    except sqlite3.IntegrityError:
+        pass
+    assert [row["userid"] for row in db.query("SELECT userid FROM users ORDER BY userid")] == ["fluxo", "humbedooh"]
+    assert sum(duration.series[("jira", "transaction")][:-1]) == 2
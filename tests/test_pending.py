@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import sqlite3
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import metrics
+import pending
+
+PENDING_STATEMENT = """
+CREATE TABLE pending (
+     userid text COLLATE NOCASE PRIMARY KEY,
+     token text NOT NULL,
+     realname text NOT NULL,
+     email text NOT NULL,
+     project text NOT NULL,
+     why text NOT NULL,
+     created integer NOT NULL,
+     userip text NOT NULL,
+     validated integer NOT NULL,
+     denied_ts integer DEFAULT 0
+    );
+"""
+
+
+class DB:  # Just enough of asfpy.sqlite.DB
+    def __init__(self):
+        self.connector = sqlite3.connect(":memory:")
+        self.connector.execute(PENDING_STATEMENT)
+
+    def runc(self, statement):
+        self.connector.execute(statement)
+
+    def add(self, userid, project, created, validated=1, denied_ts=0):
+        self.connector.execute(
+            "INSERT INTO pending VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (userid, f"token-{userid}", userid.title(), f"{userid}@example.org", project, "", created, "127.0.0.1", validated, denied_ts),
+        )
+
+
+def make_db():
+    db = DB()
+    db.add("alice", "httpd", 100)
+    db.add("bob", "httpd", 300)
+    db.add("carol", "tomcat", 200)
+    db.add("dave", "tomcat", 200)  # Same time as carol, the userid breaks the tie
+    db.add("erin", "httpd", 400, validated=0)  # Not verified by the requester yet
+    db.add("frank", "tomcat", 500, denied_ts=600)  # Already denied
+    db.add("grace", "kafka", 150)
+    instrumented = metrics.InstrumentedDB(db, "jira", metrics.Histogram("sqlite_duration_seconds", "SQLite calls", ("db", "call")))
+    pending.create_index(instrumented, "pending")
+    return instrumented
+
+
+def test_pages_follow_the_cursor():
+    db = make_db()
+    seen = []
+    cursor = None
+    while True:
+        requests, cursor = pending.awaiting_review(db, "pending", ["httpd", "tomcat"], cursor, limit=2)
+        seen.append([request["userid"] for request in requests])
+        if cursor is None:
+            break
+    assert seen == [["alice", "carol"], ["dave", "bob"]]
+    assert set(requests[0]) == set(pending.REVIEW_KEYS)
+    assert sum(db.histogram.series[("jira", "query")][:-1]) == 2
+
+
+def test_all_projects_and_counts():
+    db = make_db()
+    requests, cursor = pending.awaiting_review(db, "pending", None)
+    assert [request["userid"] for request in requests] == ["alice", "grace", "carol", "dave", "bob"]
+    assert cursor is None
+    assert pending.counts(db, "pending", None) == {"httpd": 2, "kafka": 1, "tomcat": 2}
+    assert pending.counts(db, "pending", ["tomcat"]) == {"tomcat": 2}
+    assert pending.awaiting_review(db, "pending", []) == ([], None)
+    assert pending.counts(db, "pending", []) == {}
+
+
+def test_the_index_is_used():
+    db = make_db()
+    plan = db.connector.execute(
+        "EXPLAIN QUERY PLAN SELECT userid FROM pending WHERE project IN ('httpd') AND validated = 1 AND denied_ts = 0 ORDER BY created"
+    ).fetchall()
+    assert any("pending_review" in row[-1] for row in plan)
+
+
+def test_invalid_cursor():
+    db = make_db()
+    try:
+        pending.awaiting_review(db, "pending", None, "yesterday")
+    except AssertionError as e:
+        assert str(e) == "Invalid cursor"
+    else:
+        raise AssertionError("an invalid cursor was accepted")
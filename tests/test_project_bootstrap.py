@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import json
+import os
+
+PMC_MEMBER = {"uid": "foolead", "fullname": "Foo Lead", "isMember": True, "pmcs": ["foo"], "projects": ["foo"]}
+OTHER_USER = {"uid": "someone", "fullname": "Someone Else", "pmcs": ["bar"], "projects": ["bar"]}
+ROOT = {"uid": "infra", "fullname": "Infra Root", "isRoot": True, "pmcs": ["infra"], "projects": ["infra"]}
+
+DESCRIPTOR = {
+    "project": "foo",
+    "moderators": ["moderator@example.org"],
+    "lists": [{"listpart": "dev", "muopts": "mu"}, {"listpart": "private", "private": True, "muopts": "mu"}],
+    "jira": {
+        "project_key": "FOO",
+        "project_name": "Apache Foo",
+        "project_lead": "foolead",
+        "description": "The Foo project",
+        "issue_scheme": "Apache Default",
+        "workflow_scheme": "Apache Default",
+        "homepage_url": "https://foo.apache.org/",
+    },
+    "confluence": {"space": "FOO", "admin": "foolead", "description": "The Foo wiki"},
+}
+
+
+def setup_portal(portal, monkeypatch) -> dict:
+    """Seeds the project data, and swaps the provisioning steps (and emails) for fakes. Returns what the fakes saw."""
+    from app.endpoints import jira_create, confluence_create
+    from app.lib import config, email
+
+    config.projects[:] = ["bar", "foo"]
+    config.messaging.mail_mappings = {"bar": "bar.apache.org", "foo": "foo.apache.org"}
+    config.messaging.set_mailing_lists(["users@foo.apache.org"])
+    seen = {"users": [], "jira": [], "confluence": [], "emails": []}
+
+    async def user_exists(username: str):
+        seen["users"].append(username)
+
+    async def provision_project(request: dict):
+        seen["jira"].append(request["project_key"])
+
+    async def provision_space(space: str, description: str, admin: str):
+        seen["confluence"].append(space)
+        raise AssertionError("Could not set the default space access")
+
+    monkeypatch.setattr(jira_create, "jira_user_exists", user_exists)
+    monkeypatch.setattr(confluence_create, "confluence_user_exists", user_exists)
+    monkeypatch.setattr(jira_create, "provision_project", provision_project)
+    monkeypatch.setattr(confluence_create, "provision_space", provision_space)
+    monkeypatch.setattr(email, "from_template", lambda template, **kwargs: seen["emails"].append((template, kwargs)))
+    return seen
+
+
+def test_bootstrap_job(portal, monkeypatch):
+    from app.lib import config
+
+    seen = setup_portal(portal, monkeypatch)
+
+    async def run():
+        client = await portal.client(PMC_MEMBER)
+        result = await (await client.post("/api/project-bootstrap", json=DESCRIPTOR)).get_json()
+        assert result["success"] is True, result
+        for _ in range(100):  # The work is done in the background
+            job = await (await client.get("/api/project-bootstrap", query_string={"job": result["job"]})).get_json()
+            if job["status"] == "done":
+                break
+            await asyncio.sleep(0.05)
+        assert job["status"] == "done"
+        assert {item: entry["status"] for item, entry in job["items"].items()} == {
+            "list:dev@foo.apache.org": "ok",
+            "list:private@foo.apache.org": "ok",
+            "jira:FOO": "ok",
+            "confluence:FOO": "failed",
+        }
+        assert job["items"]["confluence:FOO"]["message"] == "Could not set the default space access"
+        assert sorted(seen["users"]) == ["foolead", "foolead"], "the Jira lead and space admin are looked up up front"
+        assert seen["jira"] == ["FOO"] and seen["confluence"] == ["FOO"]
+        assert [template for template, _kwargs in seen["emails"]] == ["project_bootstrapped.txt"]
+
+        with open(os.path.join(config.storage.queue_dir, "mailinglist-private-foo.apache.org.json")) as f:
+            entry = json.load(f)
+        assert entry["private"] is True and entry["mods"] == ["moderator@example.org"] and entry["requester"] == "foolead"
+
+        # Only the owner of a job (and root) may follow it
+        other = await portal.client(OTHER_USER)
+        response = await other.get("/api/project-bootstrap", query_string={"job": result["job"]})
+        assert response.status_code == 404
+        root = await portal.client(ROOT)
+        response = await root.get("/api/project-bootstrap", query_string={"job": result["job"]})
+        assert response.status_code == 200
+
+    portal.run(run())
+
+
+def test_bootstrap_is_validated_up_front(portal, monkeypatch):
+    seen = setup_portal(portal, monkeypatch)
+
+    async def run():
+        client = await portal.client(PMC_MEMBER)
+        cases = (
+            ({**DESCRIPTOR, "lists": [{"listpart": "users", "muopts": "mu"}]}, "This mailing already exists"),
+            ({**DESCRIPTOR, "lists": [{"listpart": "private", "muopts": "mu"}]}, "private@ and security@ lists MUST be marked as private"),
+            ({"project": "foo"}, "There is nothing to bootstrap"),
+            ({**DESCRIPTOR, "moderators": []}, "You need to provide a list of moderators"),
+            ({key: value for key, value in DESCRIPTOR.items() if key != "moderators"}, "You need to provide a list of moderators"),
+            ({**DESCRIPTOR, "project": "bar"}, "You are not authorized to create mailing lists for this domain"),
+        )
+        for descriptor, message in cases:
+            result = await (await client.post("/api/project-bootstrap", json=descriptor)).get_json()
+            assert result == {"success": False, "message": message}
+        assert not seen["jira"] and not seen["confluence"], "nothing may be set up if any part is invalid"
+
+    portal.run(run())
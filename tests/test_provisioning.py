@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import sys
+import time
+
+sys.path.extend(('server/app/lib',))
+
+import provisioning
+
+
+def test_independent_steps_run_concurrently():
+    order = []
+
+    async def step(name: str, fail: bool = False):
+        order.append(f"{name} started")
+        await asyncio.sleep(0.1)
+        assert not fail, f"{name} failed"
+        order.append(f"{name} done")
+
+    async def run():
+        workflow = provisioning.Workflow("test")
+        workflow.step("a", step, "a")
+        workflow.step("b", step, "b")
+        workflow.step("c", step, "c")
+        workflow.step("d", step, "d", after=("a", "b", "c"))
+        start = time.perf_counter()
+        result = await workflow.run()
+        elapsed = time.perf_counter() - start
+        assert result.success and [step.status for step in result.steps] == ["ok"] * 4
+        assert 0.2 <= elapsed < 0.3  # Two rounds, not four
+        assert order.index("d started") > max(order.index(f"{name} done") for name in "abc")
+        assert all(0.1 <= step.duration < 0.2 for step in result.steps)
+
+        # With a cap of one, it is back to one step at a time
+        workflow.concurrency = 1
+        start = time.perf_counter()
+        await workflow.run()
+        assert time.perf_counter() - start >= 0.4
+
+    asyncio.run(run())
+
+
+def test_failures_skip_dependents():
+    async def step(fail: bool = False):
+        await asyncio.sleep(0.01)
+        if fail:  # As acli steps do (an assert here would get pytest's explanation added to the message)
+            raise AssertionError("Could not do it")
+
+    async def run():
+        workflow = provisioning.Workflow("test")
+        workflow.step("a", step, fail=True)
+        workflow.step("b", step)
+        workflow.step("c", step, fail=True)
+        workflow.step("d", step, after=("a", "b"))
+        workflow.step("e", step, after=("b",))
+        result = await workflow.run()
+        assert not result.success
+        assert [step.status for step in result.steps] == ["failed", "ok", "failed", "skipped", "ok"]
+        assert result.message == "Could not do it"
+        assert result.to_dict()["steps"][0] == {"name": "a", "status": "failed", "duration_ms": result.to_dict()["steps"][0]["duration_ms"], "error": "Could not do it"}
+
+    asyncio.run(run())
+
+
+def test_errors_cancel_the_rest():
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        finished.append("slow")
+
+    async def broken():
+        raise ValueError("bug")
+
+    async def run():
+        workflow = provisioning.Workflow("test")
+        workflow.step("slow", slow)
+        workflow.step("broken", broken)
+        try:
+            await workflow.run()
+            assert False, "The error should have been raised"
+        except ValueError:
+            pass
+        await asyncio.sleep(0.6)
+        assert not finished
+
+    asyncio.run(run())
+    try:
+        provisioning.Workflow("test").step("a", slow, after=("b",))
+        assert False, "Unknown dependencies should be refused"
+    except AssertionError:
+        pass
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import os
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import ratelimit
+
+def test_limit_and_retry_after():
+    limiter = ratelimit.RateLimiter(ratelimit.Policy(limit=10, window=100))
+    now = 1000.0  # Start of a window
+    for i in range(10):
+        decision = limiter.hit("foo", now=now)
+        assert decision.allowed and decision.remaining == 9 - i
+    decision = limiter.hit("foo", now=now)
+    assert not decision.allowed
+    assert decision.headers()["Retry-After"] == str(decision.retry_after)
+    # Once told to come back, the client should be allowed in again
+    assert limiter.hit("foo", now=now + decision.retry_after).allowed
+    # Other clients are unaffected
+    assert limiter.hit("bar", now=now).allowed
+
+def test_no_burst_across_window_boundary():
+    limiter = ratelimit.RateLimiter(ratelimit.Policy(limit=10, window=100))
+    allowed = 0
+    # Use up the limit at the very end of one window, then try again right after the boundary
+    for now in [1099.0] * 10 + [1100.5] * 10:
+        allowed += limiter.hit("foo", now=now).allowed
+    assert allowed == 10, "a fixed window would have allowed 20 requests here"
+
+def test_lru_eviction():
+    store = ratelimit.MemoryStore(max_keys=100)
+    limiter = ratelimit.RateLimiter(ratelimit.Policy(limit=10, window=100), store)
+    for i in range(1000):
+        limiter.hit(f"client{i}", now=1000.0)
+    assert len(store.entries) == 100
+    assert "client999" in store.entries and "client0" not in store.entries
+
+def test_shared_sqlite_store(tmp_path):
+    filepath = os.path.join(tmp_path, "ratelimits.db")
+    policy = ratelimit.Policy(limit=10, window=100)
+    worker_a = ratelimit.RateLimiter(policy, ratelimit.SQLiteStore(filepath))
+    worker_b = ratelimit.RateLimiter(policy, ratelimit.SQLiteStore(filepath))
+    allowed = sum(worker.hit("foo", now=1000.0).allowed for worker in (worker_a, worker_b) * 10)
+    assert allowed == 10
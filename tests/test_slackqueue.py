@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import aiohttp.web
+import slackqueue
+
+
+async def fake_slack(responses: list):
+    """A local webhook answering with the given (status, headers[, body]) in turn, recording what is posted"""
+    posted = []
+
+    async def webhook(request):
+        posted.append(await request.json())
+        status, headers, *body = responses.pop(0) if responses else (200, {})
+        return aiohttp.web.Response(status=status, headers=headers, text=body[0] if body else "ok")
+
+    app = aiohttp.web.Application()
+    app.router.add_post("/slack", webhook)
+    runner = aiohttp.web.AppRunner(app)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/slack", posted
+
+
+async def dispatch(dispatcher: slackqueue.SlackDispatcher, messages: list, wait: float = 0.3):
+    task = asyncio.create_task(dispatcher.run())
+    await asyncio.sleep(0)
+    for message in messages:
+        dispatcher.enqueue(message)
+    await asyncio.sleep(wait)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_bursts_are_coalesced():
+    async def run():
+        runner, url, posted = await fake_slack([])
+        results = []
+        dispatcher = slackqueue.SlackDispatcher(url=url, window=0.05, on_post=lambda elapsed, result: results.append(result))
+        await dispatch(dispatcher, ["one", "two", "three"])
+        await runner.cleanup()
+        assert posted == [{"text": "one\ntwo\nthree"}]
+        assert results == ["sent"]
+
+    asyncio.run(run())
+
+
+def test_retry_after_is_honored():
+    async def run():
+        runner, url, posted = await fake_slack([(429, {"Retry-After": "0"}), (503, {})])
+        results = []
+        dispatcher = slackqueue.SlackDispatcher(url=url, window=0, backoff=0.01, on_post=lambda elapsed, result: results.append(result))
+        await dispatch(dispatcher, ["hello"])
+        await runner.cleanup()
+        assert len(posted) == 3 and results == ["sent"]
+
+        runner, url, posted = await fake_slack([(400, {})])
+        dispatcher = slackqueue.SlackDispatcher(url=url, window=0, backoff=0.01, on_post=lambda elapsed, result: results.append(result))
+        await dispatch(dispatcher, ["hello"])
+        await runner.cleanup()
+        assert len(posted) == 1 and results[-1] == "failed"  # Client errors are not retried
+
+    asyncio.run(run())
+
+
+def test_api_errors_are_failures():
+    async def run():
+        runner, url, posted = await fake_slack(
+            [(200, {}, '{"ok": true}'), (200, {}, '{"ok": false, "error": "channel_not_found"}')]
+        )
+        results = []
+        slackqueue.SLACK_API_URL = url
+        try:
+            dispatcher = slackqueue.SlackDispatcher(
+                token="xoxb-test", channel="#infra", window=0, on_post=lambda elapsed, result: results.append(result)
+            )
+            await dispatch(dispatcher, ["hello"], wait=0.1)
+            dispatcher.enqueue("world", channel="#nowhere")
+            await dispatch(dispatcher, [])
+        finally:
+            slackqueue.SLACK_API_URL = "https://slack.com/api/chat.postMessage"
+            await runner.cleanup()
+        assert posted == [{"channel": "#infra", "text": "hello"}, {"channel": "#nowhere", "text": "world"}]
+        assert results == ["sent", "failed"], "ok=false with a 200 is a failure, and is not retried"
+
+    asyncio.run(run())
+
+
+def test_full_queue_drops_messages():
+    depths = []
+    dispatcher = slackqueue.SlackDispatcher(max_queued=2, on_queue=depths.append)
+    for message in ("one", "two", "three"):
+        dispatcher.enqueue(message)
+    assert dispatcher.dropped == 1 and depths == [1, 2]
+    assert dispatcher.batches() == [(None, "one\ntwo")]
+    assert depths[-1] == 0
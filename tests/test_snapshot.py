@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import gzip
+import json
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import snapshot
+
+def test_versioning():
+    snap = snapshot.JSONSnapshot({"projects": ["foo"]})
+    assert snap.version == 1
+    etag = snap.etag
+    assert snap.update({"projects": ["foo"]}) is False, "unchanged data should not bump the version"
+    assert snap.version == 1 and snap.etag == etag
+    assert snap.update({"projects": ["foo", "bar"]}) is True
+    assert snap.version == 2 and snap.etag != etag
+    assert json.loads(snap.body) == {"projects": ["foo", "bar"]}
+    assert gzip.decompress(snap.gzipped) == snap.body
+
+def test_conditional_response():
+    snap = snapshot.JSONSnapshot({"projects": ["foo"]})
+    status, headers, body = snap.response()
+    assert status == 200 and body == snap.body
+    assert headers["ETag"] == f'"{snap.etag}"'
+    status, headers, body = snap.response(accept_encoding="gzip, deflate")
+    assert status == 200 and headers["Content-Encoding"] == "gzip" and body == snap.gzipped
+    status, _headers, body = snap.response(if_none_match=f'"{snap.etag}"')
+    assert status == 304 and body == b""
+    status, _headers, _body = snap.response(if_none_match='"stale"')
+    assert status == 200
+
+def test_versioned_response():
+    snap = snapshot.JSONSnapshot({"projects": ["foo"]}, cache_control="public, max-age=60")
+    _status, headers, _body = snap.response()
+    assert headers["Cache-Control"] == "public, max-age=60"
+    _status, headers, _body = snap.response(version=snap.etag)
+    assert headers["Cache-Control"] == snapshot.VERSIONED_CACHE_CONTROL
+    etag = snap.etag
+    snap.update({"projects": ["foo", "bar"]})
+    status, headers, body = snap.response(version=etag)
+    assert status == 200 and body == snap.body, "an old version gets the current document..."
+    assert headers["Cache-Control"] == "public, max-age=60", "...but not for keeps"
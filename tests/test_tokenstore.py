@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import os
+import sqlite3
+import sys
+import tracemalloc
+
+sys.path.extend(('server/app/lib',))
+
+import tokenstore
+
+def test_single_use_and_expiry(tmp_path):
+    store = tokenstore.TokenStore(os.path.join(tmp_path, "tokens.db"), "jira-reactivation", ttl=100)
+    token, is_new = store.issue("humbedooh", "humbedooh", now=1000)
+    assert is_new
+    assert store.claim(token, now=1050) == "humbedooh"
+    assert store.claim(token, now=1050) is None, "tokens can only be claimed once"
+    token, is_new = store.issue("humbedooh", "humbedooh", now=2000)
+    assert store.claim(token, now=2100) is None, "expired tokens cannot be claimed"
+    store.issue("foo", "foo", now=3000)
+    assert store.sweep(now=3200) == 1 and len(store) == 0
+
+def test_dedup_and_durability(tmp_path):
+    filepath = os.path.join(tmp_path, "tokens.db")
+    store = tokenstore.TokenStore(filepath, "jira-reactivation")
+    token, is_new = store.issue("humbedooh", "humbedooh")
+    assert is_new
+    assert store.issue("humbedooh", "humbedooh") == (token, False), "repeat requests must not mint new tokens"
+    # Another store in the same file does not see (or dedup against) our tokens
+    other = tokenstore.TokenStore(filepath, "confluence-reactivation")
+    assert other.issue("humbedooh", "humbedooh")[1] and other.claim(token) is None
+    # Tokens survive a restart
+    restarted = tokenstore.TokenStore(filepath, "jira-reactivation")
+    assert restarted.claim(token) == "humbedooh"
+
+def test_outstanding_tokens_are_sent_again_after_a_while(tmp_path):
+    store = tokenstore.TokenStore(os.path.join(tmp_path, "tokens.db"), "jira-reactivation", resend_after=600)
+    token, send = store.issue("humbedooh", "humbedooh", now=1000)
+    assert send
+    assert store.issue("humbedooh", "humbedooh", now=1300) == (token, False), "not again right away"
+    assert store.issue("humbedooh", "humbedooh", now=1700) == (token, True), "the first email may have been lost"
+    assert store.issue("humbedooh", "humbedooh", now=1800) == (token, False), "the cooldown starts over"
+    assert store.claim(token, now=1900) == "humbedooh"
+
+def test_databases_without_a_sent_column_are_upgraded(tmp_path):
+    filepath = os.path.join(tmp_path, "tokens.db")
+    connector = sqlite3.connect(filepath)
+    connector.executescript(
+        "CREATE TABLE tokens (token text PRIMARY KEY, store text NOT NULL, subject text NOT NULL, "
+        "value text NOT NULL, created integer NOT NULL, expires integer NOT NULL);"
+        "INSERT INTO tokens VALUES ('abc', 'jira-reactivation', 'humbedooh', '\"humbedooh\"', 1000, 90000);"
+    )
+    connector.close()
+    store = tokenstore.TokenStore(filepath, "jira-reactivation")
+    assert store.issue("humbedooh", "humbedooh", now=2000) == ("abc", True), "never sent out again so far"
+
+def test_abusive_client_memory_growth(tmp_path):
+    """Simulates a client spamming /api/jira-account-activate, first with the same few accounts over and
+    over, then with a long tail of distinct ones. Neither the store nor our memory use should grow with it."""
+    store = tokenstore.TokenStore(os.path.join(tmp_path, "tokens.db"), "jira-reactivation", max_tokens=500)
+    emails_sent = 0
+    for i in range(1000):
+        emails_sent += store.issue(f"user{i % 10}", f"user{i % 10}")[1]
+    assert emails_sent == 10, "repeat requests for the same account must not mint new tokens or send more emails"
+    tracemalloc.start()
+    for i in range(2000):  # Warm up, so caches and the sqlite connection have settled
+        store.issue(f"spam{i}", f"spam{i}")
+    before, _peak = tracemalloc.get_traced_memory()
+    for i in range(2000, 12000):
+        store.issue(f"spam{i}", f"spam{i}")
+    after, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(store) == 500, "the store must stay within its size limit"
+    assert after - before < 256 * 1024, f"memory grew by {after - before} bytes"
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import json
+import sys
+import time
+
+sys.path.extend(('server/app/lib',))
+
+import tracing
+
+def test_spans_outside_a_request_are_dropped():
+    assert tracing.current() is None
+    with tracing.span("acli", action="getUser"):
+        pass
+    tracing.record("sqlite", 0.5)
+    assert tracing.request_id() is None
+
+def test_request_trace():
+    async def request():
+        trace = tracing.start("not a valid id!", "POST /api/jira-account")
+        with tracing.span("acli", action="addUser"):
+            time.sleep(0.02)
+        tracing.record("sqlite", 0.003, db="jira", call="insert")
+        tracing.record("sqlite", 0.002, db="jira", call="update")
+        try:
+            with tracing.span("smtp", template="jira_account_confirm.txt"):
+                raise ConnectionRefusedError()
+        except ConnectionRefusedError:
+            pass
+        trace.finish()
+        return trace
+
+    # Each request (task) gets its own context, so concurrent requests do not see each other's spans
+    async def both():
+        return await asyncio.gather(request(), request())
+
+    trace, other = asyncio.run(both())
+    assert tracing.current() is None
+    assert len(trace.request_id) == 32 and trace.request_id != other.request_id  # Invalid incoming IDs are replaced
+    assert [span.name for span in trace.spans] == ["acli", "sqlite", "sqlite", "smtp"]
+    assert trace.spans[-1].attributes["error"] == "ConnectionRefusedError"
+    timing = trace.server_timing()
+    assert timing.startswith("total;dur=")
+    assert timing.split(", ")[1].startswith("acli;dur=")  # The most expensive kind of span comes first
+    assert 'sqlite;dur=5.0;desc="2x"' in timing
+    logged = json.loads(json.dumps(trace.to_dict(status=200)))
+    assert logged["status"] == 200 and len(logged["spans"]) == 4
+    otlp = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp) == 5 and all(span["parentSpanId"] == otlp[0]["spanId"] for span in otlp[1:])
+
+def test_incoming_request_id_and_span_limit():
+    trace = tracing.Trace("abcdef0123456789")
+    assert trace.request_id == "abcdef0123456789"
+    for _ in range(tracing.MAX_SPANS + 10):
+        trace.add("sqlite", trace.start, 0.001, {})
+    assert len(trace.spans) == tracing.MAX_SPANS and trace.dropped == 10
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""SelfServe Platform for the Apache Software Foundation"""
+
+if not __debug__:
+    raise RuntimeError("This code requires assert statements to be enabled")
+
+import asyncio
+import sys
+
+sys.path.extend(('server/app/lib',))
+
+import userdirectory
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.row = None
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *args):
+        pass
+    async def execute(self, query, args=()):
+        self.pool.queries += 1
+        self.row = self.pool.users.get(args[0]) if args else None
+    async def fetchone(self):
+        return self.row
+
+class FakePool:  # Just enough of psycopg_pool and aiomysql pools
+    def __init__(self, users: dict):
+        self.users = users
+        self.queries = 0
+    def cursor(self):
+        return FakeCursor(self)
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *args):
+        pass
+    def connection(self, timeout=None):
+        return self
+    def acquire(self):
+        return self
+
+class FakeDirectory(userdirectory.UserDirectory):
+    def __init__(self, open_delay: float = 0.0, unreachable: bool = False):
+        super().__init__({"host": "jira-db"}, {"host": "cwiki-db"})
+        self.pool = FakePool({"active": (True,), "retired": (False,), "wiki-active": ("T",), "wiki-retired": ("F",)})
+        self.open_delay = open_delay
+        self.unreachable = unreachable
+        self.opened = 0
+    async def open_jira_pool(self):
+        self.opened += 1
+        if self.unreachable:
+            await asyncio.sleep(3600)  # Like connecting to a host that never answers
+        await asyncio.sleep(self.open_delay)
+        return self.pool
+    open_confluence_pool = open_jira_pool
+
+def test_lookups_are_cached():
+    async def run():
+        directory = FakeDirectory()
+        assert await directory.jira_user_status("Active") is True
+        assert await directory.jira_user_status("retired") is False
+        assert await directory.jira_user_status("nobody") is None
+        assert await directory.confluence_user_status("wiki-active") is True
+        assert await directory.confluence_user_status("wiki-retired") is False
+        queries = directory.pool.queries
+        assert await directory.jira_user_status("active") is True
+        assert await directory.jira_user_status("nobody") is None
+        assert directory.pool.queries == queries, "repeat lookups must come from the cache"
+        directory.cache[("jira", "nobody")] = (0, None)  # Expired
+        assert await directory.jira_user_status("nobody") is None
+        assert directory.pool.queries == queries + 1
+    asyncio.run(run())
+
+def test_one_pool_for_concurrent_first_lookups():
+    async def run():
+        directory = FakeDirectory(open_delay=0.05)
+        results = await asyncio.gather(*(directory.jira_user_status(f"user{i}") for i in range(10)))
+        assert results == [None] * 10
+        assert directory.opened == 1, "concurrent lookups must not each open a pool"
+    asyncio.run(run())
+
+def test_unreachable_database_falls_back():
+    async def run():
+        userdirectory.QUERY_TIMEOUT = 0.1
+        directory = FakeDirectory(unreachable=True)
+        started = asyncio.get_running_loop().time()
+        results = await asyncio.gather(
+            *(directory.confluence_user_status(f"user{i}") for i in range(5)), return_exceptions=True
+        )
+        assert all(isinstance(result, userdirectory.DirectoryUnavailable) for result in results)
+        assert asyncio.get_running_loop().time() - started < 1, "only the first lookup waits for the timeout"
+        assert directory.opened == 1
+        unconfigured = userdirectory.UserDirectory({}, {})
+        try:
+            await unconfigured.jira_user_status("active")
+            assert False, "an unconfigured database is unavailable"
+        except userdirectory.DirectoryUnavailable:
+            pass
+    try:
+        asyncio.run(run())
+    finally:
+        userdirectory.QUERY_TIMEOUT = 5
+
+def test_unreachable_jira_database_falls_back():
+    async def run():
+        userdirectory.QUERY_TIMEOUT = 0.5
+        # Nothing listens on port 9 here, so connections are refused
+        directory = userdirectory.UserDirectory({"host": "127.0.0.1", "port": 9, "connect_timeout": 1}, {})
+        for _ in range(2):
+            try:
+                await directory.jira_user_status("active")
+                assert False, "an unreachable database is unavailable"
+            except userdirectory.DirectoryUnavailable:
+                pass
+        assert "Jira" in directory.failed, "the failure is remembered, so the next lookups fall back right away"
+        started = asyncio.get_running_loop().time()
+        try:
+            await directory.jira_user_status("retired")
+        except userdirectory.DirectoryUnavailable:
+            pass
+        assert asyncio.get_running_loop().time() - started < 0.1
+    try:
+        asyncio.run(run())
+    finally:
+        userdirectory.QUERY_TIMEOUT = 5
+
+def test_require_active_user():
+    async def run():
+        directory = FakeDirectory()
+        acli_users = {"active", "retired"}
+        async def acli_user_exists(username):
+            return username in acli_users
+        check = lambda username, lookup=directory.jira_user_status: userdirectory.require_active_user(
+            lookup, acli_user_exists, username, "not found", "deactivated"
+        )
+        await check("active")
+        for username, message in (("nobody", "not found"), ("retired", "deactivated")):
+            try:
+                await check(username)
+                assert False, f"{username} must be refused"
+            except AssertionError as e:
+                assert str(e) == message
+        # Without a database, ACLI decides, which only knows whether the user exists
+        unconfigured = userdirectory.UserDirectory({}, {})
+        await check("retired", unconfigured.jira_user_status)
+        try:
+            await check("nobody", unconfigured.jira_user_status)
+            assert False, "unknown users must be refused by the fallback too"
+        except AssertionError as e:
+            assert str(e) == "not found"
+    asyncio.run(run())